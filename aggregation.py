@@ -0,0 +1,458 @@
+import numpy as np
+import pandas as pd
+
+RATING_LABELS = ['Exceptional', 'Exceeds', 'Meets', 'Needs Improvement', 'Unsatisfactory']
+AGE_GROUPS = ['18-25', '26-35', '36-45', '46-55', '56+']
+AGE_EDGES = [26, 36, 46, 56]
+TENURE_RANGES = ['0-1 year', '1-2 years', '2-3 years', '3-5 years', '5+ years']
+TENURE_EDGES = [1, 2, 3, 5]
+TERM_CATEGORIES = ['Voluntary', 'Involuntary', 'Retirement', 'Internal Transfer']
+# Leavers with less tenure than this (in years) count as early exits
+EARLY_EXIT_TENURE = 90 / 365.25
+
+# HRIS event columns needed to build the employee-month snapshot and the
+# employment history
+EVENT_COLUMNS = ['employee_id', 'event_date', 'event_type', 'department', 'team', 'level', 'salary',
+                 'gender', 'birth_date', 'rating', 'satisfaction', 'category', 'reason', 'source', 'fte']
+STATE_COLUMNS = ['department', 'team', 'level', 'salary', 'gender', 'birth_date', 'rating', 'satisfaction']
+
+# One row per employee per employed month
+SNAPSHOT_COLUMNS = ['month', 'employee_id', 'department', 'team', 'level', 'gender', 'age', 'tenure', 'salary',
+                    'rating', 'satisfaction', 'hired', 'terminated', 'term_category', 'term_reason', 'source']
+
+# Months of snapshot history the dashboard tables look back over
+SNAPSHOT_MONTHS = 24
+
+# Titles of the tables returned by tables_from_summary(), in order
+TABLE_NAMES = ['Headcount Trend', 'Departments', 'Gender Diversity', 'Age Distribution',
+               'Turnover', 'Performance', 'Engagement', 'Recruitment Funnel', 'Skills Gap',
+               'Compensation', 'Recruitment Metrics', 'Turnover Breakdown', 'Turnover Reasons',
+               'Tenure Analysis']
+
+# Tables that don't come from the HRIS event log. They are read from the
+# store's reference area when present; these are the demo fallbacks.
+REFERENCE_DEFAULTS = {
+    'industry_turnover': lambda: pd.DataFrame({
+        'Department': ['Engineering', 'Sales', 'Marketing', 'HR', 'Finance', 'Operations'],
+        'Industry Avg': [10.5, 15.0, 12.0, 8.0, 9.0, 13.0]
+    }),
+    'open_positions': lambda: pd.DataFrame({
+        'Department': ['Engineering', 'Sales', 'Marketing', 'HR', 'Finance', 'Operations'],
+        'Open Positions': [8, 5, 2, 1, 2, 4]
+    }),
+    # Division of each department for the org drill-down (orgchart.py)
+    'org_structure': lambda: pd.DataFrame({
+        'Department': ['Engineering', 'Sales', 'Marketing', 'HR', 'Finance', 'Operations'],
+        'Division': ['Technology', 'Commercial', 'Commercial', 'Corporate', 'Corporate', 'Delivery']
+    }),
+    # Salary band of each job level, for compa-ratios (payequity.py)
+    'pay_bands': lambda: pd.DataFrame({
+        'Level': ['Associate', 'Professional', 'Senior', 'Lead', 'Manager', 'Director'],
+        'Band Min': [48000, 58000, 70000, 81000, 86000, 113000],
+        'Band Max': [72000, 88000, 105000, 122000, 130000, 170000]
+    }),
+    # Engagement survey questions and the dimension each scores (surveys.py)
+    'survey_questions': lambda: pd.DataFrame({
+        'Question': ['recognition_1', 'recognition_2', 'growth_1', 'growth_2', 'worklife_1', 'worklife_2', 'enps'],
+        'Dimension': ['Recognition', 'Recognition', 'Growth', 'Growth', 'Work-Life', 'Work-Life', 'eNPS'],
+        'Text': ['I receive appropriate recognition for good work', 'My manager acknowledges my contributions',
+                 'I have opportunities to learn and grow here', 'I can see a career path for myself here',
+                 'My workload is manageable', 'I can balance work and personal commitments',
+                 'How likely are you to recommend working here to a friend? (0-10)']
+    }),
+    'skills': lambda: pd.DataFrame({
+        'Skill': ['AI/ML', 'Cloud Computing', 'Data Analysis', 'Project Management', 'Leadership', 'Cybersecurity'],
+        'Current': [45, 62, 78, 85, 72, 38],
+        'Required': [75, 85, 90, 90, 85, 70]
+    }),
+    'market_rate': lambda: pd.DataFrame({
+        'Quarter': ['Q1 2024', 'Q2 2024', 'Q3 2024', 'Q4 2024', 'Q1 2025', 'Q2 2025', 'Q3 2025'],
+        'Market Rate': [78000, 79000, 80000, 81500, 82300, 83100, 84000]
+    }),
+    'engagement_trend': lambda: pd.DataFrame({
+        'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+        'Overall': [72, 74, 73, 76, 78, 79],
+        'Recognition': [68, 70, 71, 73, 75, 77],
+        'Growth': [75, 76, 74, 78, 80, 81],
+        'Work-Life': [70, 72, 72, 74, 76, 78]
+    }),
+    'recruitment_funnel': lambda: pd.DataFrame({
+        'Stage': ['Applications', 'Phone Screen', 'Interview', 'Offer', 'Accepted'],
+        'Count': [450, 180, 85, 35, 28]
+    }),
+    'recruitment_metrics': lambda: pd.DataFrame({
+        'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+        'Applications': [420, 385, 465, 510, 445, 480],
+        'Hires': [12, 10, 15, 13, 11, 14],
+        'Time to Fill': [32, 28, 30, 26, 25, 28],
+        'Cost per Hire': [4200, 3950, 4100, 3800, 3900, 4000]
+    }),
+}
+
+
+def load_reference(store=None):
+    if store is None:
+        return {name: default() for name, default in REFERENCE_DEFAULTS.items()}
+    return {name: store.read_reference(name, default=default())
+            for name, default in REFERENCE_DEFAULTS.items()}
+
+
+def month_ordinal(values):
+    # datetime64 -> integer months since 1970-01, the key every grouping uses
+    return np.asarray(values, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def month_start(ordinals):
+    return np.asarray(ordinals).astype('datetime64[M]').astype('datetime64[ns]')
+
+
+def expand_intervals(start, stop):
+    # One output row per month in each inclusive [start, stop] interval
+    lengths = stop - start + 1
+    owner = np.repeat(np.arange(len(start)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner, start[owner] + offsets
+
+
+def place_teams(events):
+    # An event naming a department but no team (a transfer from an export
+    # without teams) leaves the employee in the department's own team
+    return events['team'].astype(object).fillna(events['department'].astype(object))
+
+
+def build_snapshot(events, start=None, end=None):
+    """Expand an HRIS event log into one row per employee per employed month."""
+    ev = events.sort_values(['employee_id', 'event_date'], kind='stable').reset_index(drop=True)
+    ev['event_date'] = pd.to_datetime(ev['event_date']).astype('datetime64[ns]')
+    ev['birth_date'] = pd.to_datetime(ev['birth_date']).astype('datetime64[ns]')
+    ev['team'] = place_teams(ev)
+    # Every event row carries the employee's full state as of that event
+    ev[STATE_COLUMNS] = ev.groupby('employee_id', sort=False)[STATE_COLUMNS].ffill()
+
+    hires = ev.loc[ev['event_type'] == 'hire', ['employee_id', 'event_date', 'source']]
+    terms = ev.loc[ev['event_type'] == 'termination', ['employee_id', 'event_date', 'category', 'reason']]
+    intervals = pd.merge_asof(
+        hires.sort_values('event_date').rename(columns={'event_date': 'hire_date'}),
+        terms.sort_values('event_date').rename(columns={'event_date': 'term_date'}),
+        left_on='hire_date', right_on='term_date', by='employee_id', direction='forward'
+    )
+
+    last = month_ordinal([end])[0] if end is not None else month_ordinal(ev['event_date']).max()
+    first = month_ordinal([start])[0] if start is not None else last - SNAPSHOT_MONTHS + 1
+    hire_m = month_ordinal(intervals['hire_date'])
+    has_term = intervals['term_date'].notna().to_numpy()
+    term_m = np.where(has_term, month_ordinal(intervals['term_date'].fillna(pd.Timestamp(0))), last)
+    keep = (term_m >= first) & (hire_m <= last)
+    intervals, hire_m, term_m, has_term = intervals[keep], hire_m[keep], term_m[keep], has_term[keep]
+    stop = np.minimum(term_m, last)
+
+    owner, month = expand_intervals(np.maximum(hire_m, first), stop)
+    snapshot = pd.DataFrame({
+        'month': month_start(month),
+        'employee_id': intervals['employee_id'].to_numpy()[owner],
+        'hire_date': intervals['hire_date'].to_numpy()[owner],
+        'hired': month == hire_m[owner],
+        'terminated': has_term[owner] & (month == term_m[owner]),
+    })
+    term_rows = snapshot['terminated'].to_numpy()
+    category = intervals['category'].astype(object).to_numpy()[owner]
+    reason = intervals['reason'].astype(object).to_numpy()[owner]
+    snapshot['term_category'] = pd.Categorical(np.where(term_rows, category, None), categories=TERM_CATEGORIES)
+    snapshot['term_reason'] = pd.Categorical(np.where(term_rows, reason, None))
+    # Recruitment source of the spell, from its hire event
+    snapshot['source'] = pd.Categorical(intervals['source'].astype(object).to_numpy()[owner])
+
+    # State as of each month end
+    snapshot['as_of'] = month_start(month + 1) - np.timedelta64(1, 'ns')
+    snapshot = pd.merge_asof(
+        snapshot.sort_values('as_of', kind='stable'),
+        ev[['employee_id', 'event_date'] + STATE_COLUMNS].sort_values('event_date', kind='stable'),
+        left_on='as_of', right_on='event_date', by='employee_id'
+    )
+    snapshot['age'] = ((snapshot['as_of'] - snapshot['birth_date']).dt.days / 365.25).astype('float32')
+    snapshot['tenure'] = ((snapshot['as_of'] - snapshot['hire_date']).dt.days / 365.25).astype('float32')
+    snapshot['rating'] = snapshot['rating'].fillna(0).astype('int8')
+    snapshot['satisfaction'] = snapshot['satisfaction'].astype('float32')
+    snapshot['department'] = snapshot['department'].astype('category')
+    snapshot['team'] = snapshot['team'].astype('category')
+    snapshot['level'] = snapshot['level'].astype(object).astype('category')
+    snapshot['gender'] = snapshot['gender'].astype('category')
+    return snapshot[SNAPSHOT_COLUMNS].sort_values(['month', 'employee_id'], kind='stable').reset_index(drop=True)
+
+
+def ratio(numerator, denominator):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(np.asarray(numerator, dtype=np.float64) / denominator)
+
+
+def bucket(edges, values):
+    values = np.asarray(values)
+    return np.searchsorted(np.asarray(edges, dtype=values.dtype), values, side='right')
+
+
+class Summary:
+    """Sufficient statistics per (department, month) cell of a snapshot.
+
+    Every dashboard table is a sum over some block of these cells, so a
+    department or date filter only slices these arrays and never touches
+    employee rows again. Cells are plain sums and counts, so rows can be
+    added or retracted later (see incremental.py).
+    """
+
+    COUNTS = ['hires', 'leavers', 'early_exits', 'headcount', 'salary_n', 'satisfaction_n', 'tenure_n',
+              'gender', 'age', 'rating', 'tenure_band', 'tenure_exits', 'category', 'reason']
+    SUMS = ['salary_sum', 'satisfaction_sum', 'tenure_sum']
+
+    def __init__(self, snapshot):
+        bounds = month_ordinal([snapshot['month'].min(), snapshot['month'].max()])
+        self.first_month = int(bounds[0])
+        self.n_months = int(bounds[1]) - self.first_month + 1
+        self.departments = pd.Index(snapshot['department'].cat.categories)
+        self.genders = pd.Index(snapshot['gender'].cat.categories)
+        self.reasons = pd.Index(snapshot['term_reason'].cat.categories)
+        shape = (len(self.departments), self.n_months)
+        widths = {'gender': len(self.genders), 'age': len(AGE_GROUPS), 'rating': 6,
+                  'tenure_band': len(TENURE_RANGES), 'tenure_exits': len(TENURE_RANGES),
+                  'category': len(TERM_CATEGORIES), 'reason': len(self.reasons)}
+        for name in self.COUNTS:
+            setattr(self, name, np.zeros(shape + ((widths[name],) if name in widths else ()), dtype=np.int64))
+        for name in self.SUMS:
+            setattr(self, name, np.zeros(shape))
+        self.add(snapshot)
+
+    def add(self, rows, sign=1):
+        """Add (or with ``sign=-1`` retract) snapshot rows into their cells."""
+        if not len(rows):
+            return
+        month = month_ordinal(rows['month']) - self.first_month
+        if month.min() < 0:
+            raise ValueError('rows precede the first month of the summary')
+        if month.max() >= self.n_months:
+            self._grow(months=int(month.max()) + 1 - self.n_months)
+        departments = self._codes(rows['department'], 'departments')
+        genders = self._codes(rows['gender'], 'genders')
+        reasons = self._codes(rows['term_reason'], 'reasons')
+        shape = self.headcount.shape
+        cell_count = shape[0] * shape[1]
+        cell = departments * self.n_months + month
+
+        def count(mask, codes=None, k=None):
+            if codes is None:
+                return np.bincount(cell[mask], minlength=cell_count).reshape(shape)
+            codes = np.asarray(codes)[mask]
+            keep = codes >= 0
+            flat = cell[mask][keep] * k + codes[keep]
+            return np.bincount(flat, minlength=cell_count * k).reshape(shape + (k,))
+
+        def total(mask, values):
+            values = np.asarray(values, dtype=np.float64)
+            valid = mask & ~np.isnan(values)
+            sums = np.bincount(cell[valid], weights=values[valid], minlength=cell_count).reshape(shape)
+            return sums, np.bincount(cell[valid], minlength=cell_count).reshape(shape)
+
+        terminated = rows['terminated'].to_numpy()
+        staying = ~terminated
+        tenure_band = bucket(TENURE_EDGES, rows['tenure'])
+        voluntary = terminated & (rows['term_category'] == 'Voluntary').to_numpy()
+        category = pd.Categorical(rows['term_category'], categories=TERM_CATEGORIES).codes
+        salary_sum, salary_n = total(staying, rows['salary'])
+        satisfaction_sum, satisfaction_n = total(staying, rows['satisfaction'])
+        tenure_sum, tenure_n = total(staying, rows['tenure'])
+
+        self.hires += sign * count(rows['hired'].to_numpy())
+        self.leavers += sign * count(terminated)
+        self.early_exits += sign * count(terminated & (rows['tenure'].to_numpy() < EARLY_EXIT_TENURE))
+        self.headcount += sign * count(staying)  # month-end headcount
+        self.salary_sum += sign * salary_sum
+        self.salary_n += sign * salary_n
+        self.satisfaction_sum += sign * satisfaction_sum
+        self.satisfaction_n += sign * satisfaction_n
+        self.tenure_sum += sign * tenure_sum
+        self.tenure_n += sign * tenure_n
+        self.gender += sign * count(staying, genders, len(self.genders))
+        self.age += sign * count(staying, bucket(AGE_EDGES, rows['age']), len(AGE_GROUPS))
+        self.rating += sign * count(staying, rows['rating'].to_numpy(), 6)
+        self.tenure_band += sign * count(staying, tenure_band, len(TENURE_RANGES))
+        self.tenure_exits += sign * count(terminated, tenure_band, len(TENURE_RANGES))
+        self.category += sign * count(terminated, category, len(TERM_CATEGORIES))
+        self.reason += sign * count(voluntary, reasons, len(self.reasons))
+
+    def _codes(self, values, attr):
+        known = getattr(self, attr)
+        if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.equals(known):
+            return values.cat.codes.to_numpy().astype(np.int64)
+        new = pd.Index(values.dropna().unique()).difference(known)
+        if len(new):
+            self._grow(**{attr: len(new)})
+            setattr(self, attr, known.append(new))
+        return pd.Categorical(values, categories=getattr(self, attr)).codes.astype(np.int64)
+
+    def _grow(self, months=0, departments=0, genders=0, reasons=0):
+        # Pad the cell arrays for months, departments or labels not seen before
+        for name in self.COUNTS + self.SUMS:
+            cells = getattr(self, name)
+            pad = [(0, departments), (0, months)] + [(0, 0)] * (cells.ndim - 2)
+            if name == 'gender':
+                pad[2] = (0, genders)
+            elif name == 'reason':
+                pad[2] = (0, reasons)
+            setattr(self, name, np.pad(cells, pad))
+        self.n_months += months
+
+    @property
+    def months(self):
+        return pd.DatetimeIndex(month_start(np.arange(self.first_month, self.first_month + self.n_months)))
+
+    def month_position(self, value):
+        position = month_ordinal([pd.Timestamp(value)])[0] - self.first_month
+        return int(np.clip(position, 0, self.n_months - 1))
+
+    def department_codes(self, departments=None):
+        """Rows of ``departments`` (default: all) in the cell arrays.
+
+        A contiguous run of rows, such as every department, is returned as a
+        slice, so filtering the cells with it is a view rather than a copy.
+        """
+        if departments is None:
+            return slice(0, len(self.departments))
+        codes = np.flatnonzero(self.departments.isin(list(departments)))
+        if len(codes) and codes[-1] - codes[0] + 1 == len(codes):
+            return slice(int(codes[0]), int(codes[-1]) + 1)
+        return codes
+
+
+def build_tables(snapshot, reference, start=None, months=8):
+    """Derive all 14 dashboard tables from an employee-month snapshot."""
+    return tables_from_summary(Summary(snapshot), reference, start=start, months=months)
+
+
+def tables_from_summary(summary, reference, departments=None, start=None, end=None, months=8):
+    """Dashboard tables for a department/date selection of a Summary.
+
+    The ``end`` month is the reporting month. Trends and period totals cover
+    the months from ``start``; without it, trends show the last ``months``
+    months and totals the trailing twelve.
+    """
+    codes = summary.department_codes(departments)
+    last = summary.n_months - 1 if end is None else summary.month_position(end)
+    span = slice(0, last + 1)
+
+    def by_dept(cells):
+        return cells[codes, span]
+
+    def by_month(cells):
+        return cells[codes, span].sum(axis=0)
+
+    headcount = by_month(summary.headcount)
+    active_months = np.flatnonzero(headcount + by_month(summary.leavers))
+    if not len(active_months):
+        return None
+    first = int(active_months[0])
+    if start is None:
+        trend_from, period_from = max(last - months + 1, first), max(last - 11, first)
+    else:
+        trend_from = period_from = int(np.clip(summary.month_position(start), first, last))
+    period = slice(period_from, last + 1)
+    period_months = last + 1 - period_from
+    labels = pd.PeriodIndex(month_start(np.arange(summary.first_month, summary.first_month + last + 1)), freq='M')
+
+    # Monthly flows and month-end headcount
+    window = slice(trend_from, last + 1)
+    headcount_trend = pd.DataFrame({
+        'Month': labels[window].strftime('%b %Y'),
+        'Employees': headcount[window],
+        'New Hires': by_month(summary.hires)[window],
+        'Terminations': by_month(summary.leavers)[window],
+    })
+
+    # Current department profile
+    dept_count = by_dept(summary.headcount)[:, last]
+    present = dept_count > 0
+    names = summary.departments[codes][present]
+    department_data = pd.DataFrame({
+        'Department': names,
+        'Employee Count': dept_count[present],
+        'Avg Salary': ratio(by_dept(summary.salary_sum), by_dept(summary.salary_n))[present, last].round(0),
+        'Satisfaction': ratio(by_dept(summary.satisfaction_sum), by_dept(summary.satisfaction_n))[present, last].round(1),
+        'Avg Tenure': ratio(by_dept(summary.tenure_sum), by_dept(summary.tenure_n))[present, last].round(1),
+    })
+    department_data = department_data.merge(reference['open_positions'], on='Department', how='left')
+    department_data['Open Positions'] = department_data['Open Positions'].fillna(0).astype(int)
+
+    gender_count = by_month(summary.gender)[last]
+    diversity_data = pd.DataFrame({
+        'Gender': summary.genders,
+        'Percentage': (ratio(gender_count, max(gender_count.sum(), 1)) * 100).round(1),
+    }).sort_values('Percentage', ascending=False, ignore_index=True)
+
+    age_diversity = pd.DataFrame({'Age Group': AGE_GROUPS, 'Count': by_month(summary.age)[last]})
+
+    # Quarterly turnover: leavers over average month-end headcount
+    def quarter_rate(hi):
+        quarter = slice(max(hi - 2, 0), max(hi + 1, 0))
+        leavers = by_dept(summary.leavers)[:, quarter].sum(axis=1)
+        avg_headcount = by_dept(summary.headcount)[:, quarter].mean(axis=1) if hi >= 0 else 0
+        return (ratio(leavers, avg_headcount) * 100)[present].round(1)
+
+    turnover_data = pd.DataFrame({
+        'Department': names,
+        'Current Quarter': quarter_rate(last),
+        'Previous Quarter': quarter_rate(last - 3),
+    }).merge(reference['industry_turnover'], on='Department', how='left')
+
+    ratings = by_month(summary.rating)
+    performance_data = pd.DataFrame({
+        'Rating': RATING_LABELS,
+        'Count': ratings[last][5:0:-1],
+        'Previous': ratings[max(last - 6, first)][5:0:-1],
+    })
+
+    skills = reference['skills']
+    skills_gap = skills.assign(Gap=skills['Required'] - skills['Current'])
+
+    # Average salary of the headcount at each quarter end (the reporting
+    # month stands in for a quarter still in progress)
+    monthly_salary = ratio(by_month(summary.salary_sum), by_month(summary.salary_n))
+    quarter_ends = np.flatnonzero((labels.month % 3 == 0) | (np.arange(last + 1) == last))
+    quarter_ends = quarter_ends[quarter_ends >= first]
+    quarter_ends = quarter_ends[-4:] if start is None else quarter_ends[quarter_ends >= trend_from]
+    compensation_trend = pd.DataFrame({
+        'Quarter': [f'Q{p.quarter} {p.year}' for p in labels[quarter_ends]],
+        'Avg Salary': monthly_salary[quarter_ends].round(0),
+    }).merge(reference['market_rate'], on='Quarter', how='left')
+
+    # Leavers over the reporting period
+    category_count = by_month(summary.category)[period].sum(axis=0)
+    turnover_breakdown = pd.DataFrame({
+        'Category': TERM_CATEGORIES,
+        'Count': category_count,
+        'Percentage': (ratio(category_count, max(category_count.sum(), 1)) * 100).round(1),
+    })
+
+    reason_count = by_month(summary.reason)[period].sum(axis=0)
+    order = np.argsort(-reason_count, kind='stable')
+    order = order[reason_count[order] > 0]
+    turnover_reasons = pd.DataFrame({'Reason': summary.reasons[order], 'Count': reason_count[order]})
+
+    # Annualised turnover by tenure band
+    band_exits = by_month(summary.tenure_exits)[period].sum(axis=0)
+    band_headcount = by_month(summary.tenure_band)[period].mean(axis=0)
+    tenure_analysis = pd.DataFrame({
+        'Tenure Range': TENURE_RANGES,
+        'Employees': by_month(summary.tenure_band)[last],
+        'Turnover Rate': (ratio(band_exits, band_headcount) * 100 * 12 / period_months).round(1),
+    })
+
+    return (headcount_trend, department_data, diversity_data, age_diversity,
+            turnover_data, performance_data, reference['engagement_trend'],
+            reference['recruitment_funnel'], skills_gap, compensation_trend,
+            reference['recruitment_metrics'], turnover_breakdown, turnover_reasons,
+            tenure_analysis)
+
+
+def date_bounds(summary, months=8):
+    """First and last day of the data and the default start of the date filter."""
+    first = summary.months[0].date()
+    last = (summary.months[-1] + pd.offsets.MonthEnd(0)).date()
+    return first, last, max(first, (summary.months[-1] - pd.DateOffset(months=months - 1)).date())
+
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import SNAPSHOT_MONTHS, month_start, ratio
+from orgchart import MEASURES, ORG_LEVELS
+
+# EWMA weight of the newest month, control limit in standard deviations, and
+# months a series must have seen before it is tested
+ALPHA = 0.2
+LIMIT = 3.0
+WARMUP = 6
+# Units smaller than this are tracked but never flagged
+MIN_UNIT_HEADCOUNT = 20
+
+_M = {name: k for k, name in enumerate(MEASURES)}
+# Metric -> (value from one month of OrgCube cells, smallest standard
+# deviation its limits may assume). Headcount is tested through its monthly
+# net change, as a growing stock would drift past any level limits.
+SERIES = {
+    'Net Change': (lambda c: c[:, _M['hires']] - c[:, _M['leavers']], 1.0),
+    'Hires': (lambda c: c[:, _M['hires']], 1.0),
+    'Terminations': (lambda c: c[:, _M['leavers']], 1.0),
+    'Satisfaction': (lambda c: np.where(c[:, _M['satisfaction_n']] > 0,
+                                        ratio(c[:, _M['satisfaction_sum']], c[:, _M['satisfaction_n']]), np.nan), 0.1),
+}
+FLAG_COLUMNS = ['Month', 'Level', 'Unit', 'Department', 'Metric', 'Value', 'Expected', 'Z']
+
+
+class ControlLimits:
+    """EWMA mean and variance of many series, updated one period at a time.
+
+    Each series keeps only its running mean, variance and length, so memory
+    is constant per series however long it runs. A new value is scored
+    against the limits before it is folded in and, once the series is past
+    its warm-up, clipped to them first so an outlier doesn't widen the
+    limits for the months after it.
+    """
+
+    def __init__(self, width, alpha=ALPHA, limit=LIMIT, warmup=WARMUP, min_std=0.0):
+        self.alpha, self.limit, self.warmup = alpha, limit, warmup
+        self.min_std = np.broadcast_to(np.asarray(min_std, dtype=np.float64), (width,))
+        self.mean = np.zeros((0, width))
+        self.var = np.zeros((0, width))
+        self.count = np.zeros((0, width), dtype=np.int32)
+
+    def update(self, rows, values):
+        """Fold ``values`` (one period, rows x width; NaN if missing) into series ``rows``.
+
+        Returns each value's z-score against the limits as they stood (NaN
+        for series still warming up) and the expected value, the EWMA mean
+        before this period.
+        """
+        missing = int(np.max(rows, initial=-1)) + 1 - len(self.mean)
+        if missing > 0:
+            self.mean = np.vstack([self.mean, np.zeros((missing, self.mean.shape[1]))])
+            self.var = np.vstack([self.var, np.zeros((missing, self.var.shape[1]))])
+            self.count = np.vstack([self.count, np.zeros((missing, self.count.shape[1]), dtype=np.int32)])
+        mean, var, count = self.mean[rows], self.var[rows], self.count[rows]
+        # The variance starts at zero; scale it up as an EWMA of few points
+        # underestimates it
+        weight = np.where(count > 1, 1 - (1 - self.alpha) ** (count - 1.0), 1)
+        spread = np.maximum(np.sqrt(var / weight), self.min_std)
+        seen = ~np.isnan(values)
+        warm = count >= max(self.warmup, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = np.where(seen & warm, (values - mean) / spread, np.nan)
+        clipped = np.where(warm, np.clip(values, mean - self.limit * spread, mean + self.limit * spread), values)
+        step = clipped - mean
+        self.mean[rows] = np.where(seen, np.where(count > 0, mean + self.alpha * step, clipped), mean)
+        self.var[rows] = np.where(seen & (count > 0), (1 - self.alpha) * (var + self.alpha * step ** 2), var)
+        self.count[rows] = count + seen
+        return z, mean
+
+
+class AnomalyDetector:
+    """Control limits on every org unit x SERIES metric, fed as months close.
+
+    Units are those of an OrgCube (company, divisions, departments, teams),
+    keyed by name rather than cube row so regrouping departments under new
+    divisions keeps their history. Flagged months are kept with the value,
+    the expected (EWMA) value and the z-score, for the last SNAPSHOT_MONTHS
+    months the dashboard can show, so the state doesn't grow with time.
+    """
+
+    def __init__(self, cube):
+        self.limits = ControlLimits(len(SERIES), min_std=[min_std for _, min_std in SERIES.values()])
+        self.keys = {}
+        self.units = []
+        self.month = cube.first_month - 1
+        self.flags = pd.DataFrame(columns=FLAG_COLUMNS)
+        # The cube's last month is still open
+        self.catch_up(cube, cube.first_month + cube.n_months - 2)
+
+    def catch_up(self, cube, through):
+        """Observe every month after the last one observed up to month ordinal ``through``."""
+        while self.month < through:
+            self.observe(cube, self.month + 1)
+
+    def observe(self, cube, month):
+        position = month - cube.first_month
+        cells = np.concatenate([cube.cells[level][:, position] for level in ORG_LEVELS])
+        rows = np.array([self._key(level, path) for level in ORG_LEVELS for path in cube.paths[level]],
+                        dtype=np.int64)
+        values = np.column_stack([value(cells) for value, _ in SERIES.values()])
+        z, expected = self.limits.update(rows, values)
+        self.month = month
+        if len(self.flags):
+            self.flags = self.flags[self.flags['Month'] >= month_start([month - SNAPSHOT_MONTHS + 1])[0]]
+        with np.errstate(invalid='ignore'):
+            unit, metric = np.nonzero((np.abs(z) > self.limits.limit)
+                                      & (cells[:, _M['headcount']] >= MIN_UNIT_HEADCOUNT)[:, None])
+        if not len(unit):
+            return
+        labels = [self.units[row] for row in rows[unit]]
+        found = pd.DataFrame({
+            'Month': month_start([month])[0],
+            'Level': [label[0] for label in labels],
+            'Unit': [label[1] for label in labels],
+            'Department': [label[2] for label in labels],
+            'Metric': np.array(list(SERIES), dtype=object)[metric],
+            'Value': values[unit, metric],
+            'Expected': expected[unit, metric],
+            'Z': z[unit, metric],
+        })
+        self.flags = pd.concat([self.flags, found], ignore_index=True) if len(self.flags) else found
+
+    def flagged(self, departments=None, start=None, end=None, levels=None, metrics=None):
+        """Flags between ``start`` and ``end`` for the selected departments, largest first.
+
+        Company and division units are included only when no department is
+        filtered out.
+        """
+        flags = self.flags
+        keep = np.ones(len(flags), dtype=bool)
+        if departments is not None:
+            chosen = set(departments)
+            everything = chosen.issuperset(label[2] for label in self.units if label[0] == 'Department')
+            keep &= flags['Department'].isin(chosen).to_numpy() | (everything & flags['Department'].isna()).to_numpy()
+        if start is not None:
+            keep &= (flags['Month'] >= pd.Timestamp(start).to_period('M').to_timestamp()).to_numpy()
+        if end is not None:
+            keep &= (flags['Month'] <= pd.Timestamp(end)).to_numpy()
+        if levels is not None:
+            keep &= flags['Level'].isin(levels).to_numpy()
+        if metrics is not None:
+            keep &= flags['Metric'].isin(metrics).to_numpy()
+        flags = flags[keep]
+        return flags.iloc[np.argsort(-flags['Z'].abs().to_numpy(), kind='stable')].reset_index(drop=True)
+
+    def _key(self, level, path):
+        # Departments and teams are named without their division
+        key = (level,) + (path[1:] if level in ('Department', 'Team') else path)
+        row = self.keys.get(key)
+        if row is None:
+            row = self.keys[key] = len(self.units)
+            department = path[1] if len(path) > 1 else None
+            self.units.append((level, path[-1] if path else 'Company', department))
+        return row
+
+
+def stream(table, columns, label='Month', warmup=3):
+    """Flags from feeding a small reference series (e.g. engagement_trend) through ControlLimits row by row."""
+    limits = ControlLimits(len(columns), warmup=warmup, min_std=1.0)
+    values = table[columns].to_numpy(dtype=np.float64)
+    rows = np.zeros(1, dtype=np.int64)
+    found = []
+    for i in range(len(values)):
+        z, expected = limits.update(rows, values[i:i + 1])
+        for k in np.flatnonzero(np.abs(np.nan_to_num(z[0])) > limits.limit):
+            found.append({'Month': table[label].iloc[i], 'Metric': columns[k], 'Value': values[i, k],
+                          'Expected': expected[0, k], 'Z': z[0, k]})
+    return pd.DataFrame(found, columns=['Month', 'Metric', 'Value', 'Expected', 'Z'])
@@ -0,0 +1,188 @@
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import os
+from collections import OrderedDict
+
+import pyarrow as pa
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from aggregation import TABLE_NAMES, date_bounds, tables_from_summary
+from cache import cache_key, open_cache
+from incremental import open_live
+from jobs import JobScheduler
+from metrics import evaluate
+from recruiting import funnel_reference
+from surveys import survey_reference
+
+DATA_DIR = os.environ.get('HR_DATA_DIR', 'data')
+REFRESH_SECONDS = 900
+# Encoded response bodies kept in memory, by ETag
+BODY_CACHE_SIZE = 1024
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+JSON_TYPE = 'application/json'
+
+
+def slug(title):
+    return title.lower().replace(' ', '-')
+
+
+# URL name -> position in the tables_from_summary() result; None for the KPIs
+TABLES = {'kpis': None, **{slug(name): i for i, name in enumerate(TABLE_NAMES)}}
+
+
+def encode(df, fmt):
+    if fmt == 'arrow':
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return df.to_json(orient='records', date_format='iso').encode()
+
+
+def matches(etag, header):
+    # If-None-Match is '*' or a list of (possibly weak) tags
+    tags = [tag.strip() for tag in header.split(',')]
+    tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+    return '*' in tags or etag in tags
+
+
+class MetricsAPI:
+    """Read-only HTTP access to the dashboard tables and KPIs.
+
+    Tables come from the same IncrementalSummary, tables_from_summary() and
+    HR_CACHE entries as the dashboard: filters are normalised exactly as the
+    sidebar does, so a table already computed for a dashboard session (or
+    another API worker) is served from the cache. The ETag is derived from
+    the cache key and format alone, so a conditional GET is answered without
+    reading anything, and encoded bodies are kept in memory by ETag. Cache
+    misses run on the job scheduler, so concurrent requests for the same
+    filters compute once.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, cache=None):
+        self.data_dir = data_dir
+        self.cache = cache or open_cache(os.environ.get('HR_CACHE', ''), os.path.join(data_dir, 'cache'))
+        self.scheduler = JobScheduler()
+        self.bodies = OrderedDict()
+        self.live = self.reference = None
+        self.app = Starlette(routes=[
+            Route('/health', self.health),
+            Route('/tables', self.tables),
+            Route('/tables/{name}', self.table),
+            Route('/kpis', self.table, name='kpis'),
+        ], lifespan=self.lifespan)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app):
+        self.live, self.reference = await run_in_threadpool(open_live, self.data_dir)
+        task = asyncio.create_task(self.refresh_loop())
+        yield
+        task.cancel()
+
+    async def refresh_loop(self):
+        while True:
+            await asyncio.sleep(60)
+            if self.live.due(REFRESH_SECONDS):
+                self.scheduler.submit('refresh', lambda job: self.live.refresh(min_interval=REFRESH_SECONDS))
+
+    async def health(self, request):
+        return JSONResponse({'status': 'ok', 'version': self.live.version})
+
+    async def tables(self, request):
+        first, last, default_start = date_bounds(self.live.summary)
+        return JSONResponse({
+            'tables': list(TABLES),
+            'departments': list(self.live.summary.departments),
+            'dates': {'min': first.isoformat(), 'max': last.isoformat(), 'default_start': default_start.isoformat()},
+        })
+
+    async def table(self, request):
+        name = request.path_params.get('name', 'kpis')
+        if name not in TABLES:
+            return JSONResponse({'error': f'unknown table {name!r}', 'tables': list(TABLES)}, 404)
+        try:
+            departments, start, end = self.filters(request.query_params)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, 400)
+        arrow = request.query_params.get('format') == 'arrow' or ARROW_TYPE in request.headers.get('accept', '')
+        fmt = 'arrow' if arrow else 'json'
+
+        namespace = 'kpis' if TABLES[name] is None else 'tables'
+        key = cache_key(namespace, self.live.version, departments=departments, start=start, end=end)
+        etag = '"' + hashlib.sha1(f'{key}|{name}|{fmt}'.encode()).hexdigest()[:20] + '"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept'}
+        if matches(etag, request.headers.get('if-none-match', '')):
+            return Response(status_code=304, headers=headers)
+
+        body = self.bodies.get(etag)
+        if body is None:
+            frames = await run_in_threadpool(self.frames, key, namespace, departments, start, end)
+            if frames is None:
+                return JSONResponse({'error': 'No employees match the selected departments and date range.'}, 404)
+            df = frames[0 if TABLES[name] is None else TABLES[name]]
+            body = await run_in_threadpool(encode, df, fmt)
+            self.bodies[etag] = body
+            while len(self.bodies) > BODY_CACHE_SIZE:
+                self.bodies.popitem(last=False)
+        else:
+            self.bodies.move_to_end(etag)
+        return Response(body, media_type=ARROW_TYPE if arrow else JSON_TYPE, headers=headers)
+
+    def filters(self, params):
+        """Sidebar-equivalent (departments, start, end) from query parameters.
+
+        ``departments`` may repeat or be comma-separated and defaults to all;
+        ``start`` and ``end`` are ISO dates clipped to the data, defaulting to
+        the dashboard's initial range.
+        """
+        summary = self.live.summary
+        departments = [name for value in params.getlist('departments') for name in value.split(',') if name]
+        unknown = sorted(set(departments) - set(summary.departments))
+        if unknown:
+            raise ValueError(f'unknown departments: {", ".join(unknown)}')
+        first, last, default_start = date_bounds(summary)
+        start = datetime.date.fromisoformat(params['start']) if 'start' in params else default_start
+        end = datetime.date.fromisoformat(params['end']) if 'end' in params else last
+        start, end = min(max(start, first), last), min(max(end, first), last)
+        if start > end:
+            raise ValueError('start is after end')
+        return sorted(departments or summary.departments), start, end
+
+    def frames(self, key, namespace, departments, start, end):
+        def compute():
+            with self.live.lock:
+                # As the dashboard does, so both fill the same cache entries alike
+                reference = survey_reference(self.reference, self.live.surveys, self.live.summary,
+                                             departments, start, end)
+                reference = funnel_reference(reference, self.live.funnel, departments, start, end)
+                if namespace == 'kpis':
+                    return (evaluate(self.live.summary, reference, departments, start, end),)
+                return tables_from_summary(self.live.summary, reference, departments, start, end)
+
+        frames = self.cache.get_frames(key)
+        if frames is None:
+            frames = self.scheduler.submit(key, lambda job: self.cache.cached_frames(key, compute)).wait()
+        return frames
+
+
+app = MetricsAPI().app
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Serve the dashboard tables and KPIs over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help='worker processes; they share HR_CACHE')
+    args = parser.parse_args()
+
+    uvicorn.run('api:app', host=args.host, port=args.port, workers=args.workers, log_level='warning')
@@ -1,9 +1,38 @@
 import streamlit as st
+from streamlit.elements.lib.layout_utils import LayoutConfig
+from streamlit.elements.lib.utils import compute_and_register_element_id
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
+import html
 import numpy as np
+import os
+import time
+import uuid
+
+from anomalies import stream
+from aggregation import TABLE_NAMES, date_bounds, tables_from_summary
+from cohorts import COHORT_GROUPS, cohort_tables
+from incremental import open_live
+from cache import cache_key, open_cache
+from figures import cached_figure
+from forecast import forecast_tables, with_forecast
+from history import headcount_series
+from insights import headline, insights
+from risk import RiskScores, risk_tables
+from surveys import MIN_GROUP_SIZE, survey_tables
+from export import Exporter
+from jobs import JobScheduler
+from metrics import display, evaluate
+from orgchart import ORG_LEVELS
+from payequity import PAY_GROUPS, pay_tables
+from profiling import PROFILE_LOG, Profiler, enabled_by_env
+from recruiting import funnel_tables
+import figures
+
+DATA_DIR = os.environ.get('HR_DATA_DIR', 'data')
+# HRIS batches land every 15 minutes
+REFRESH_SECONDS = 900
 
 # Page configuration
 st.set_page_config(
@@ -13,6 +42,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in timing of each section of the rerun (HR_PROFILE=1, or the toggle
+# under Developer at the bottom of the sidebar); see profiling.py
+profiler = Profiler(enabled=enabled_by_env() or st.session_state.get("profile", False),
+                    session=st.session_state.setdefault("session_id", uuid.uuid4().hex[:12]))
+profiler.section("page")
+
 # Custom CSS with enhanced styling
 st.markdown("""
 <style>
@@ -153,129 +188,78 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Enhanced data generation with more realistic patterns
-@st.cache_data
+# Long-running work (the first load, refreshes, table computations shared by
+# several sessions, exports) runs on the in-process job scheduler
+@st.cache_resource
+def load_scheduler():
+    return JobScheduler()
+
+scheduler = load_scheduler()
+
+# The employee-month snapshot comes from the Parquet event store when one has
+# been ingested (see store.py), otherwise from a seeded synthetic workforce.
+# It is summarised per (department, month) once per process and shared by
+# every session; filter changes only slice that summary. New event batches
+# are folded into the persisted summary incrementally (see incremental.py).
+def open_data(job):
+    job.update(message="Loading workforce data…")
+    return open_live(DATA_DIR)
+
+@st.cache_resource
 def load_data():
-    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug']
-    headcount_trend = pd.DataFrame({
-        'Month': months,
-        'Employees': [245, 252, 259, 266, 273, 280, 287, 294],
-        'New Hires': [12, 10, 15, 13, 11, 14, 16, 12],
-        'Terminations': [5, 3, 8, 6, 4, 7, 9, 5],
-        'Forecast': [None, None, None, None, None, None, 287, 294]
-    })
-    
-    department_data = pd.DataFrame({
-        'Department': ['Engineering', 'Sales', 'Marketing', 'HR', 'Finance', 'Operations'],
-        'Employee Count': [95, 62, 38, 18, 25, 42],
-        'Avg Salary': [98000, 75000, 72000, 68000, 82000, 65000],
-        'Satisfaction': [4.2, 3.8, 4.0, 4.5, 4.1, 3.9],
-        'Avg Tenure': [3.5, 2.1, 2.8, 4.2, 3.9, 3.0],
-        'Open Positions': [8, 5, 2, 1, 2, 4]
-    })
-    
-    diversity_data = pd.DataFrame({
-        'Gender': ['Male', 'Female', 'Non-binary'],
-        'Percentage': [58, 40, 2]
-    })
-    
-    age_diversity = pd.DataFrame({
-        'Age Group': ['18-25', '26-35', '36-45', '46-55', '56+'],
-        'Count': [42, 128, 76, 28, 6]
-    })
-    
-    turnover_data = pd.DataFrame({
-        'Department': ['Engineering', 'Sales', 'Marketing', 'HR', 'Finance', 'Operations'],
-        'Current Quarter': [8.2, 14.5, 11.3, 6.7, 7.8, 12.1],
-        'Previous Quarter': [7.8, 16.2, 10.5, 7.1, 8.2, 11.8],
-        'Industry Avg': [10.5, 15.0, 12.0, 8.0, 9.0, 13.0]
-    })
-    
-    performance_data = pd.DataFrame({
-        'Rating': ['Exceptional', 'Exceeds', 'Meets', 'Needs Improvement', 'Unsatisfactory'],
-        'Count': [42, 98, 112, 23, 5],
-        'Previous': [38, 95, 115, 20, 4]
-    })
-    
-    engagement_trend = pd.DataFrame({
-        'Month': months[:6],
-        'Overall': [72, 74, 73, 76, 78, 79],
-        'Recognition': [68, 70, 71, 73, 75, 77],
-        'Growth': [75, 76, 74, 78, 80, 81],
-        'Work-Life': [70, 72, 72, 74, 76, 78]
-    })
-    
-    recruitment_funnel = pd.DataFrame({
-        'Stage': ['Applications', 'Phone Screen', 'Interview', 'Offer', 'Accepted'],
-        'Count': [450, 180, 85, 35, 28]
-    })
-    
-    skills_gap = pd.DataFrame({
-        'Skill': ['AI/ML', 'Cloud Computing', 'Data Analysis', 'Project Management', 'Leadership', 'Cybersecurity'],
-        'Current': [45, 62, 78, 85, 72, 38],
-        'Required': [75, 85, 90, 90, 85, 70],
-        'Gap': [30, 23, 12, 5, 13, 32]
-    })
-    
-    compensation_trend = pd.DataFrame({
-        'Quarter': ['Q1 2024', 'Q2 2024', 'Q3 2024', 'Q4 2024'],
-        'Avg Salary': [76000, 77500, 78800, 80200],
-        'Market Rate': [78000, 79000, 80000, 81500]
-    })
-    
-    recruitment_metrics = pd.DataFrame({
-        'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-        'Applications': [420, 385, 465, 510, 445, 480],
-        'Hires': [12, 10, 15, 13, 11, 14],
-        'Time to Fill': [32, 28, 30, 26, 25, 28],
-        'Cost per Hire': [4200, 3950, 4100, 3800, 3900, 4000]
-    })
-    
-    turnover_breakdown = pd.DataFrame({
-        'Category': ['Voluntary', 'Involuntary', 'Retirement', 'Internal Transfer'],
-        'Count': [18, 7, 3, 2],
-        'Percentage': [60, 23.3, 10, 6.7]
-    })
-    
-    turnover_reasons = pd.DataFrame({
-        'Reason': ['Better Compensation', 'Career Growth', 'Work-Life Balance', 'Management Issues', 'Relocation', 'Other'],
-        'Count': [6, 5, 3, 2, 1, 1]
-    })
-    
-    tenure_analysis = pd.DataFrame({
-        'Tenure Range': ['0-1 year', '1-2 years', '2-3 years', '3-5 years', '5+ years'],
-        'Employees': [45, 72, 68, 55, 40],
-        'Turnover Rate': [22.5, 15.3, 8.7, 5.2, 3.1]
-    })
-    
-    return (headcount_trend, department_data, diversity_data, age_diversity, 
-            turnover_data, performance_data, engagement_trend, recruitment_funnel, 
-            skills_gap, compensation_trend, recruitment_metrics, turnover_breakdown, 
-            turnover_reasons, tenure_analysis)
+    return scheduler.submit('load', open_data)
 
-# Load data
-(headcount_trend, department_data, diversity_data, age_diversity, 
- turnover_data, performance_data, engagement_trend, recruitment_funnel, 
- skills_gap, compensation_trend, recruitment_metrics, turnover_breakdown, 
- turnover_reasons, tenure_analysis) = load_data()
+# Derived tables and figures are shared across restarts and replicas through
+# HR_CACHE: a directory (default), a redis:// URL or 'none'
+@st.cache_resource
+def load_cache():
+    return open_cache(os.environ.get('HR_CACHE', ''), os.path.join(DATA_DIR, 'cache'))
 
-# Calculate stats
-total_employees = int(department_data['Employee Count'].sum())
-avg_satisfaction = float(department_data['Satisfaction'].mean())
-open_positions = int(department_data['Open Positions'].sum())
-avg_tenure = float(department_data['Avg Tenure'].mean())
-num_departments = len(department_data)
+# Attrition risk scores for the current population, rescored only for the
+# employees each refresh touches
+@st.cache_resource
+def load_risk():
+    return RiskScores()
 
+# PDF and Excel exports are written under data/exports by worker processes
+@st.cache_resource
+def load_exporter():
+    return Exporter(os.path.join(DATA_DIR, 'exports'))
+
+profiler.section("load_data")
+loading = load_data()
+if not loading.done():
+    st.progress(loading.progress or 0.0, text=loading.message or "Loading workforce data…")
+    time.sleep(0.5)
+    st.rerun()
+if loading.status == 'failed':
+    load_data.clear()
+    st.error(f"Could not load workforce data: {loading.error}")
+    st.stop()
+live, reference = loading.result
+if live.due(REFRESH_SECONDS):
+    scheduler.submit('refresh', lambda job: live.refresh(min_interval=REFRESH_SECONDS))
+summary = live.summary
+cache = load_cache()
+risk = load_risk()
+exporter = load_exporter()
+data_start, data_end, default_start = date_bounds(summary)
+
+profiler.section("sidebar")
 # Sidebar
 st.sidebar.title("⚙️ Dashboard Controls")
 
 date_range = st.sidebar.date_input(
     "Select Date Range",
-    value=(datetime.now() - timedelta(days=180), datetime.now()),
-    max_value=datetime.now()
+    value=(default_start, data_end),
+    min_value=data_start,
+    max_value=data_end
 )
+# Keep the default while only one end of the range has been picked
+if len(date_range) != 2:
+    date_range = (default_start, data_end)
 
-all_departments = department_data['Department'].tolist()
+all_departments = list(summary.departments)
 select_all = st.sidebar.checkbox("Select All Departments", value=True)
 
 if select_all:
@@ -294,6 +278,91 @@ else:
 if not selected_departments:
     selected_departments = all_departments
 
+# Identical requests from concurrent sessions share one computation: a cache
+# miss becomes a scheduler job keyed by the cache key
+def shared(key, compute):
+    frames = cache.get_frames(key)
+    if frames is None:
+        frames = scheduler.submit(key, lambda job: cache.cached_frames(key, compute)).wait()
+    return frames
+
+profiler.section("surveys")
+# Once survey responses have been ingested their results (surveys.py)
+# replace the engagement_trend reference table
+def compute_surveys():
+    with live.lock:
+        return survey_tables(live.surveys, summary, reference["survey_questions"], selected_departments,
+                             date_range[0], date_range[1])
+
+survey_results = None
+if len(live.surveys):
+    survey_key = cache_key('surveys', live.version, departments=sorted(selected_departments),
+                           start=date_range[0], end=date_range[1])
+    survey_results = shared(survey_key, compute_surveys)
+    reference = {**reference, "engagement_trend": survey_results[0]}
+
+profiler.section("funnel")
+# Likewise ATS events (recruiting.py) replace the recruitment_funnel and
+# recruitment_metrics reference tables
+def compute_funnel():
+    with live.lock:
+        return funnel_tables(live.funnel, selected_departments, date_range[0], date_range[1])
+
+funnel_results = None
+if len(live.funnel):
+    funnel_key = cache_key('funnel', live.version, departments=sorted(selected_departments),
+                           start=date_range[0], end=date_range[1])
+    funnel_results = shared(funnel_key, compute_funnel)
+    reference = {**reference, "recruitment_funnel": funnel_results[0], "recruitment_metrics": funnel_results[1]}
+
+profiler.section("tables")
+# Load data
+def compute_tables():
+    with live.lock:
+        return tables_from_summary(summary, reference, selected_departments, date_range[0], date_range[1])
+
+tables_key = cache_key('tables', live.version, departments=sorted(selected_departments),
+                       start=date_range[0], end=date_range[1])
+tables = shared(tables_key, compute_tables)
+if tables is None:
+    st.warning("No employees match the selected departments and date range.")
+    st.stop()
+
+(headcount_trend, department_data, diversity_data, age_diversity, 
+ turnover_data, performance_data, engagement_trend, recruitment_funnel, 
+ skills_gap, compensation_trend, recruitment_metrics, turnover_breakdown, 
+ turnover_reasons, tenure_analysis) = tables
+
+profiler.section("forecast")
+def compute_forecast():
+    with live.lock:
+        return forecast_tables(summary, selected_departments, date_range[1])
+
+forecast_key = cache_key('forecast', live.version, departments=sorted(selected_departments), end=date_range[1])
+headcount_forecast, department_forecast = shared(forecast_key, compute_forecast)
+
+profiler.section("kpis")
+# Every KPI tile comes from the metric registry (metrics.py), current and
+# comparison periods in one pass
+def compute_kpis():
+    with live.lock:
+        return (evaluate(summary, reference, selected_departments, date_range[0], date_range[1]),)
+
+kpi_key = cache_key('kpis', live.version, departments=sorted(selected_departments),
+                    start=date_range[0], end=date_range[1])
+kpis = {row['Metric']: row for _, row in shared(kpi_key, compute_kpis)[0].iterrows()}
+
+def kpi(name, label=None):
+    st.metric(label or name, *display(kpis[name]))
+
+profiler.section("stats")
+# Calculate stats
+total_employees = int(department_data['Employee Count'].sum())
+avg_satisfaction = float(department_data['Satisfaction'].mean())
+open_positions = int(department_data['Open Positions'].sum())
+avg_tenure = float(department_data['Avg Tenure'].mean())
+num_departments = len(department_data)
+
 metric_view = st.sidebar.radio(
     "View Mode",
     ["Overview", "Deep Dive", "Predictive Analytics", "Benchmarking"]
@@ -304,12 +373,13 @@ st.sidebar.markdown("### 📥 Export Options")
 export_col1, export_col2 = st.sidebar.columns(2)
 
 with export_col1:
-    if st.button("📄 PDF", use_container_width=True):
-        st.sidebar.success("✅ PDF generated!")
+    export_pdf = st.button("📄 PDF", use_container_width=True)
 
 with export_col2:
-    if st.button("📊 Excel", use_container_width=True):
-        st.sidebar.success("✅ Excel ready!")
+    export_excel = st.button("📊 Excel", use_container_width=True)
+
+# Filled in once the figures are available, further down
+export_status = st.sidebar.container()
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📊 Quick Stats")
@@ -328,6 +398,11 @@ st.sidebar.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
+with st.sidebar.expander("🛠️ Developer"):
+    st.checkbox("Profile reruns", key="profile", help="Time each section of the page and append the spans to "
+                f"{PROFILE_LOG}")
+
+profiler.section("header")
 # Main header - Compact version
 st.markdown(f"""
 <div class="main-header">
@@ -362,284 +437,333 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
-# AI Insights
+# AI Insights: the rules in insights.py, run over every org unit in the
+# selection once per data version and filter
+profiler.section("insights")
 st.markdown("### 🤖 AI-Powered Insights")
-col1, col2, col3 = st.columns(3)
 
-with col1:
-    st.markdown("""
-    <div class="insight-box insight-positive">
-        <h4>✅ Positive Trend</h4>
-        <p>Employee engagement increased by 9.7% over the last 6 months, with Work-Life balance showing the strongest improvement.</p>
-    </div>
-    """, unsafe_allow_html=True)
+def compute_insights():
+    with live.lock:
+        return (insights(live.cube, reference, selected_departments, date_range[1]),)
 
-with col2:
-    st.markdown("""
-    <div class="insight-box insight-warning">
-        <h4>⚠️ Attention Needed</h4>
-        <p>Sales department turnover (14.5%) is above industry average. Consider retention initiatives.</p>
-    </div>
-    """, unsafe_allow_html=True)
+insight_key = cache_key('insights', live.version, departments=sorted(selected_departments), end=date_range[1])
+(insight_cards,) = shared(insight_key, compute_insights)
+INSIGHT_ICONS = {"positive": "✅", "warning": "⚠️", "critical": "🔴"}
 
-with col3:
-    st.markdown("""
-    <div class="insight-box insight-critical">
-        <h4>🔴 Critical Gap</h4>
-        <p>Cybersecurity and AI/ML skills are 32% and 30% below required levels. Training recommended.</p>
-    </div>
-    """, unsafe_allow_html=True)
+if len(insight_cards):
+    for col, card in zip(st.columns(3), headline(insight_cards).itertuples()):
+        with col:
+            st.markdown(f"""
+            <div class="insight-box insight-{card.Severity}">
+                <h4>{INSIGHT_ICONS[card.Severity]} {html.escape(card.Title)}</h4>
+                <p>{html.escape(card.Message)}</p>
+            </div>
+            """, unsafe_allow_html=True)
+    if len(insight_cards) > 3:
+        with st.expander(f"All insights ({len(insight_cards)})"):
+            st.dataframe(insight_cards[["Severity", "Title", "Message", "Units Flagged"]], use_container_width=True,
+                         hide_index=True)
+else:
+    st.info("No insights for this selection: every unit is within its thresholds.")
 
 st.markdown("---")
 
+# Figures come from figures.py as JSON text and are only rebuilt when the
+# columns they plot change
+def chart(builder, df, **style):
+    return cached_figure(cache, builder, df, **style)
+
+# st.plotly_chart validates and serializes every figure it is given, even
+# one that is already JSON, so memoized figures go out as the chart spec
+# directly (the same message st.plotly_chart sends for a stretched chart)
+def plotly_json(text, height=None):
+    proto = PlotlyChartProto(spec=text, config="{}", theme="streamlit")
+    proto.id = compute_and_register_element_id("plotly_chart", user_key=None, key_as_main_identity=False,
+                                               dg=st._main, plotly_spec=text, plotly_config=proto.config,
+                                               theme=proto.theme, width="stretch")
+    st._main._enqueue("plotly_chart", proto, layout_config=LayoutConfig(width="stretch", height=height or 450))
+
+def plot(builder, df, annotations=None, **style):
+    with profiler.span(f"chart:{builder.__name__}") as span:
+        with profiler.span("figure"):
+            text, height = chart(builder, df, **style)
+            if annotations is not None and len(annotations):
+                text = figures.annotate(text, annotations)
+        with profiler.span("plotly_chart"):
+            plotly_json(text, height)
+    if span is not None:
+        span.attrs["bytes"] = len(text)
+
+# Anomaly flags (see anomalies.py) as chart annotations: one point per month
+# at ``y`` (a Series indexed by the chart's x labels), naming the largest
+# deviation first and listing the rest on hover
+def anomaly_points(flags, y):
+    flags = flags[flags["Label"].isin(y.index)]
+    lines = [f"{unit}: {metric.lower()} " + f"{value:,.2f}".rstrip("0").rstrip(".") + f" ({z:+.1f}σ)"
+             for unit, metric, value, z in zip(flags["Unit"], flags["Metric"], flags["Value"], flags["Z"])]
+    text = pd.Series(lines, index=flags.index, dtype=object).groupby(flags["Label"].to_numpy(), sort=False)
+    text = text.agg(lambda month: month.iloc[0] + (f" +{len(month) - 1} more" if len(month) > 1 else "")
+                    + "\n" + "\n".join(month))
+    return pd.DataFrame({"X": text.index, "Y": y.reindex(text.index).to_numpy(), "Text": text.to_numpy()})
+
+# Drill-down from the company through divisions and departments to teams,
+# read from the org rollup cube (see orgchart.py). It follows the date range
+# and always covers every department.
+def org_drilldown(value, line):
+    path = ()
+    with live.lock:
+        units = live.cube.children(path, date_range[0], date_range[1])
+    for col, level in zip(st.columns(2), ORG_LEVELS[1:3]):
+        with col:
+            choice = st.selectbox(level, ["All"] + list(units["Unit"]), key=f"org_{level.lower()}")
+        if choice == "All":
+            break
+        path += (choice,)
+        with live.lock:
+            units = live.cube.children(path, date_range[0], date_range[1])
+    st.caption(" › ".join(("Company",) + path) + f" · {len(units)} {ORG_LEVELS[len(path) + 1].lower()}s")
+    plot(figures.org_units, units, value=value, line=line)
+    st.dataframe(units.drop(columns="Level"), use_container_width=True, hide_index=True)
+
+profiler.section("exports")
+# Exports are built by worker processes; each session keeps its latest job
+# of each kind and offers the file once it is ready
+export_sheets = {**dict(zip(TABLE_NAMES, tables)),
+                 "Headcount Forecast": headcount_forecast, "Department Forecast": department_forecast}
+
+def export_figures():
+    return [(title, text) for title, (text, _) in [
+        ("Headcount Trend & Forecast", chart(figures.headcount, with_forecast(headcount_trend, headcount_forecast))),
+        ("Department Metrics", chart(figures.department_metrics, department_data)),
+        ("Gender Diversity", chart(figures.gender_diversity, diversity_data)),
+        ("Age Distribution", chart(figures.age_distribution, age_diversity)),
+        ("Turnover Comparison", chart(figures.turnover_comparison, turnover_data)),
+        ("Skills Gap Analysis", chart(figures.skills, skills_gap)),
+        ("Performance Distribution", chart(figures.performance, performance_data)),
+        ("Engagement Breakdown", chart(figures.engagement, engagement_trend)),
+        ("Recruitment Funnel", chart(figures.funnel, recruitment_funnel)),
+        ("Recruitment Trends", chart(figures.recruitment_trends, recruitment_metrics)),
+        ("Salary vs Market Rate", chart(figures.salary_vs_market, compensation_trend)),
+        ("Average Salary by Department", chart(figures.salary_by_department, department_data)),
+        ("Turnover Breakdown", chart(figures.turnover_breakdown, turnover_breakdown)),
+        ("Voluntary Turnover Reasons", chart(figures.turnover_reasons, turnover_reasons)),
+        ("Turnover by Tenure", chart(figures.tenure_turnover, tenure_analysis)),
+        ("12-Month Department Forecast", chart(figures.department_forecast, department_forecast)),
+    ]]
+
+export_key = dict(version=live.version, departments=sorted(selected_departments),
+                  start=date_range[0], end=date_range[1])
+
+if export_pdf:
+    st.session_state["export_pdf"] = scheduler.submit_export(
+        cache_key('export-pdf', **export_key), exporter.pdf, export_figures(), export_sheets).id
+
+if export_excel:
+    # Event-level turnover detail streams straight from the store
+    detail = None if live.store is None else {
+        "root": live.store.root, "start": date_range[0], "end": date_range[1], "departments": selected_departments}
+    st.session_state["export_excel"] = scheduler.submit_export(
+        cache_key('export-excel', **export_key), exporter.excel, export_sheets, detail).id
+
+EXPORT_KINDS = [
+    ("pdf", "PDF", "application/pdf"),
+    ("excel", "Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+]
+
+def export_jobs():
+    for kind, label, mime in EXPORT_KINDS:
+        job = scheduler.get(st.session_state.get(f"export_{kind}", ""))
+        if job is not None:
+            yield kind, label, mime, job
+
+def export_panel():
+    for kind, label, mime, job in export_jobs():
+        if not job.done():
+            st.progress(job.progress or 0.0, text=f"⏳ {label}: {job.message or 'queued'}")
+            if st.button(f"✖ Cancel {label}", key=f"cancel_{kind}", use_container_width=True):
+                job.cancel()
+        elif job.status == 'failed':
+            st.error(f"{label} export failed: {job.error}")
+        elif job.status == 'cancelled':
+            st.info(f"{label} export cancelled")
+        elif os.path.exists(job.result):
+            with open(job.result, "rb") as f:
+                st.download_button(f"⬇️ Download {label}", f, file_name=os.path.basename(job.result),
+                                   mime=mime, use_container_width=True)
+
+def poll_exports():
+    export_panel()
+    # One full rerun once everything has finished turns the polling off
+    if all(job.done() for *_, job in export_jobs()):
+        st.rerun()
+
+with export_status:
+    # Fragments (Streamlit 1.37+) poll running exports without rerunning the page
+    if hasattr(st, "fragment") and any(not job.done() for *_, job in export_jobs()):
+        st.fragment(run_every=1)(poll_exports)()
+    else:
+        export_panel()
+
+profiler.section("metrics")
 # Key metrics
 col1, col2, col3, col4, col5 = st.columns(5)
 
 with col1:
-    st.metric("Total Employees", f"{total_employees}", delta="2.6%")
+    kpi("Total Employees")
 
 with col2:
-    st.metric("Turnover Rate", "10.2%", delta="-1.3%", delta_color="inverse")
+    kpi("Turnover Rate")
 
 with col3:
-    st.metric("Time to Fill", "28 days", delta="3 days", delta_color="inverse")
+    kpi("Time to Fill")
 
 with col4:
-    st.metric("Engagement", "79%", delta="1.3%")
+    kpi("Engagement")
 
 with col5:
-    st.metric("Retention Rate", "89.8%", delta="1.3%")
+    kpi("Retention Rate")
 
 st.markdown("---")
 
-# Tabs
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "📊 Overview",
-    "👤 Workforce Analytics",
-    "📈 Performance",
-    "🎯 Recruitment",
-    "💰 Compensation",
-    "🔄 Turnover Analysis"
-])
-
-with tab1:
+if metric_view == "Predictive Analytics":
+    st.markdown("### 🔮 12-Month Workforce Forecast")
+    col1, col2, col3, col4 = st.columns(4)
+    projected = headcount_forecast.iloc[-1]
+
+    with col1:
+        st.metric("Projected Headcount", f"{projected['Forecast']:,.0f}",
+                  f"{projected['Forecast'] - total_employees:+,.0f}")
+
+    with col2:
+        st.metric("80% Range", f"{projected['Lower']:,.0f} – {projected['Upper']:,.0f}")
+
+    with col3:
+        st.metric("Projected Hires", f"{headcount_forecast['Forecast Hires'].sum():,.0f}")
+
+    with col4:
+        st.metric("Projected Terminations", f"{headcount_forecast['Forecast Terminations'].sum():,.0f}",
+                  delta_color="inverse")
+
+    col1, col2 = st.columns([3, 2])
+
+    with col1:
+        plot(figures.department_forecast, department_forecast)
+
+    with col2:
+        st.dataframe(department_forecast, use_container_width=True, hide_index=True)
+
+    st.markdown("---")
+
+# Tabs. Each tab's data prep and figures live in its own render function and
+# only the selected tab runs on a rerun.
+def render_overview():
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📈 Headcount Trend & Forecast")
-        fig_headcount = go.Figure()
-        
-        fig_headcount.add_trace(go.Scatter(
-            x=headcount_trend['Month'],
-            y=headcount_trend['Employees'],
-            mode='lines+markers',
-            name='Actual',
-            line=dict(color='#3b82f6', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig_headcount.add_trace(go.Scatter(
-            x=headcount_trend['Month'][-2:],
-            y=headcount_trend['Forecast'][-2:],
-            mode='lines+markers',
-            name='Forecast',
-            line=dict(color='#10b981', width=3, dash='dash'),
-            marker=dict(size=8)
-        ))
-        
-        fig_headcount.add_trace(go.Bar(
-            x=headcount_trend['Month'],
-            y=headcount_trend['New Hires'],
-            name='New Hires',
-            marker_color='rgba(16, 185, 129, 0.5)',
-            yaxis='y2'
-        ))
-        
-        fig_headcount.update_layout(
-            height=400,
-            hovermode='x unified',
-            yaxis2=dict(overlaying='y', side='right'),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_headcount, use_container_width=True)
+        resolution = st.radio("Resolution", ["Monthly", "Daily"], horizontal=True, label_visibility="collapsed",
+                              key="headcount_resolution")
+        if resolution == "Daily":
+            # As-of headcount for every day of the date range (history.py)
+            def compute_daily():
+                with live.lock:
+                    return (headcount_series(live.history, selected_departments, date_range[0], date_range[1]),)
+
+            daily_key = cache_key('daily', live.version, departments=sorted(selected_departments),
+                                  start=date_range[0], end=date_range[1])
+            daily = shared(daily_key, compute_daily)[0]
+            plot(figures.daily_headcount, daily)
+            st.caption(f"{daily['Employees'].iloc[-1]:,} employees ({daily['FTE'].iloc[-1]:,.1f} FTE) at the close "
+                       f"of {date_range[1]:%d %b %Y}.")
+        else:
+            with live.lock:
+                flags = live.anomalies.flagged(selected_departments, date_range[0], date_range[1],
+                                               levels=["Company", "Department"])
+            flags = flags.assign(Label=flags["Month"].dt.strftime("%b %Y"))
+            plot(figures.headcount, with_forecast(headcount_trend, headcount_forecast),
+                 annotations=anomaly_points(flags, headcount_trend.set_index("Month")["Employees"]))
+            if len(flags):
+                with st.expander(f"⚠️ Anomalies ({len(flags)})"):
+                    st.dataframe(flags.drop(columns="Label").assign(Month=flags["Label"]).round(2),
+                                 use_container_width=True, hide_index=True)
     
     with col2:
         st.subheader("🏢 Department Metrics")
-        filtered_dept = department_data[department_data['Department'].isin(selected_departments)]
-        
-        fig_dept = go.Figure()
-        fig_dept.add_trace(go.Bar(
-            x=filtered_dept['Department'],
-            y=filtered_dept['Employee Count'],
-            name='Employees',
-            marker_color='#3b82f6'
-        ))
-        
-        fig_dept.add_trace(go.Scatter(
-            x=filtered_dept['Department'],
-            y=filtered_dept['Satisfaction'] * 20,
-            name='Satisfaction (scaled)',
-            mode='lines+markers',
-            marker=dict(size=10, color='#f59e0b'),
-            yaxis='y2'
-        ))
-        
-        fig_dept.update_layout(
-            height=400,
-            yaxis2=dict(overlaying='y', side='right', title='Satisfaction'),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_dept, use_container_width=True)
-
-with tab2:
+        plot(figures.department_metrics, department_data)
+
+    st.markdown("---")
+    st.subheader("🏛️ Organization Drill-down")
+    org_drilldown("Headcount", "Satisfaction")
+
+def render_workforce():
     col1, col2, col3 = st.columns(3)
     
     with col1:
         st.subheader("🌈 Gender Diversity")
-        fig_diversity = px.pie(
-            diversity_data,
-            values='Percentage',
-            names='Gender',
-            color='Gender',
-            color_discrete_map={'Male': '#3b82f6', 'Female': '#ec4899', 'Non-binary': '#8b5cf6'},
-            hole=0.4
-        )
-        fig_diversity.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_diversity, use_container_width=True)
+        plot(figures.gender_diversity, diversity_data)
     
     with col2:
         st.subheader("👥 Age Distribution")
-        fig_age = px.bar(age_diversity, x='Age Group', y='Count', color='Count', color_continuous_scale='Viridis')
-        fig_age.update_layout(showlegend=False)
-        st.plotly_chart(fig_age, use_container_width=True)
+        plot(figures.age_distribution, age_diversity)
     
     with col3:
         st.subheader("📉 Turnover Comparison")
-        fig_turnover = go.Figure()
-        
-        fig_turnover.add_trace(go.Bar(
-            name='Current Q',
-            x=turnover_data['Department'],
-            y=turnover_data['Current Quarter'],
-            marker_color='#ef4444'
-        ))
-        
-        fig_turnover.add_trace(go.Bar(
-            name='Previous Q',
-            x=turnover_data['Department'],
-            y=turnover_data['Previous Quarter'],
-            marker_color='#fca5a5'
-        ))
-        
-        fig_turnover.add_trace(go.Scatter(
-            name='Industry Avg',
-            x=turnover_data['Department'],
-            y=turnover_data['Industry Avg'],
-            mode='lines+markers',
-            marker=dict(size=10, color='#1f2937'),
-            line=dict(width=2, dash='dash')
-        ))
-        
-        fig_turnover.update_layout(barmode='group', height=350)
-        fig_turnover.update_xaxes(tickangle=-45)
-        st.plotly_chart(fig_turnover, use_container_width=True)
+        plot(figures.turnover_comparison, turnover_data)
     
     st.markdown("---")
     st.subheader("🎯 Skills Gap Analysis")
-    fig_skills = go.Figure()
-    
-    fig_skills.add_trace(go.Bar(
-        name='Current Level',
-        x=skills_gap['Skill'],
-        y=skills_gap['Current'],
-        marker_color='#3b82f6'
-    ))
-    
-    fig_skills.add_trace(go.Bar(
-        name='Required Level',
-        x=skills_gap['Skill'],
-        y=skills_gap['Required'],
-        marker_color='#10b981'
-    ))
-    
-    fig_skills.add_trace(go.Scatter(
-        name='Gap',
-        x=skills_gap['Skill'],
-        y=skills_gap['Gap'],
-        mode='lines+markers',
-        marker=dict(size=12, color='#ef4444'),
-        line=dict(width=3),
-        yaxis='y2'
-    ))
-    
-    fig_skills.update_layout(
-        barmode='group',
-        height=400,
-        yaxis2=dict(overlaying='y', side='right', title='Gap %'),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-    st.plotly_chart(fig_skills, use_container_width=True)
+    plot(figures.skills, skills_gap)
 
-with tab3:
+def render_performance():
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("⭐ Performance Distribution")
-        fig_performance = go.Figure()
-        
-        fig_performance.add_trace(go.Bar(
-            name='Current Period',
-            x=performance_data['Rating'],
-            y=performance_data['Count'],
-            marker_color='#10b981'
-        ))
-        
-        fig_performance.add_trace(go.Bar(
-            name='Previous Period',
-            x=performance_data['Rating'],
-            y=performance_data['Previous'],
-            marker_color='#86efac'
-        ))
-        
-        fig_performance.update_layout(barmode='group', height=400)
-        fig_performance.update_xaxes(tickangle=-45)
-        st.plotly_chart(fig_performance, use_container_width=True)
+        plot(figures.performance, performance_data)
     
     with col2:
         st.subheader("💚 Engagement Breakdown")
-        fig_engagement = go.Figure()
-        
-        for col_name in ['Overall', 'Recognition', 'Growth', 'Work-Life']:
-            fig_engagement.add_trace(go.Scatter(
-                x=engagement_trend['Month'],
-                y=engagement_trend[col_name],
-                mode='lines+markers',
-                name=col_name,
-                line=dict(width=3)
-            ))
-        
-        fig_engagement.update_layout(height=400, yaxis_range=[0, 100])
-        st.plotly_chart(fig_engagement, use_container_width=True)
+        flags = stream(engagement_trend, ["Overall", "Recognition", "Growth", "Work-Life"])
+        plot(figures.engagement, engagement_trend,
+             annotations=anomaly_points(flags.assign(Unit=flags["Metric"], Metric="Score", Label=flags["Month"]),
+                                        engagement_trend.set_index("Month")["Overall"]))
+
+    if survey_results is None:
+        return
+    _, favorability, net_promoter, response_rate = survey_results
+    st.markdown("---")
+    st.markdown("### 🗳️ Engagement Survey")
+    col1, col2, col3 = st.columns(3)
+
+    with col1:
+        st.subheader("👍 Favorability")
+        plot(figures.favorability, favorability)
+
+    with col2:
+        st.subheader("📣 Employee NPS")
+        plot(figures.net_promoter, net_promoter)
 
-with tab4:
+    with col3:
+        st.subheader("📬 Response Rate")
+        plot(figures.response_rate, response_rate)
+    st.caption(f"Latest survey in the date range. Results for departments with fewer than {MIN_GROUP_SIZE} "
+               "respondents are suppressed (grey) and left out of every total.")
+
+def render_recruitment():
     st.markdown("### 📊 Recruitment KPIs")
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        avg_time = recruitment_metrics['Time to Fill'].mean()
-        st.metric("Avg Time to Fill", f"{avg_time:.0f} days", "-2 days")
+        kpi("Time to Fill")
     
     with col2:
-        avg_cost = recruitment_metrics['Cost per Hire'].mean()
-        st.metric("Avg Cost per Hire", f"${avg_cost:,.0f}", "-$200")
+        kpi("Cost per Hire")
     
     with col3:
-        total_hires = recruitment_metrics['Hires'].sum()
-        st.metric("Total Hires (6mo)", total_hires, "+15%")
+        kpi("Hires", "Total Hires")
     
     with col4:
-        offer_accept = (recruitment_funnel.iloc[4]['Count'] / recruitment_funnel.iloc[3]['Count']) * 100
-        st.metric("Offer Accept Rate", f"{offer_accept:.0f}%", "+5%")
+        kpi("Offer Accept Rate")
     
     st.markdown("---")
     
@@ -647,117 +771,105 @@ with tab4:
     
     with col1:
         st.subheader("🎯 Recruitment Funnel")
-        fig_funnel = go.Figure(go.Funnel(
-            y=recruitment_funnel['Stage'],
-            x=recruitment_funnel['Count'],
-            textposition="inside",
-            textinfo="value+percent initial",
-            marker=dict(color=["#3b82f6", "#60a5fa", "#93c5fd", "#bfdbfe", "#dbeafe"])
-        ))
-        fig_funnel.update_layout(height=400)
-        st.plotly_chart(fig_funnel, use_container_width=True)
+        plot(figures.funnel, recruitment_funnel)
         
         st.markdown("**Conversion Rates:**")
         conv_col1, conv_col2 = st.columns(2)
         
-        for i in range(len(recruitment_funnel) - 1):
-            rate = (recruitment_funnel.iloc[i+1]['Count'] / recruitment_funnel.iloc[i]['Count']) * 100
+        stages = recruitment_funnel['Stage'].tolist()
+        counts = recruitment_funnel['Count']
+        rates = recruitment_funnel.get('Conversion', counts / counts.shift() * 100).tolist()
+        for i, (previous, stage, rate) in enumerate(zip(stages, stages[1:], rates[1:])):
             with conv_col1 if i % 2 == 0 else conv_col2:
                 st.metric(
-                    f"{recruitment_funnel.iloc[i]['Stage']} → {recruitment_funnel.iloc[i+1]['Stage']}",
-                    f"{rate:.1f}%",
+                    f"{previous} → {stage}",
+                    f"{rate:.1f}%" if pd.notna(rate) else "—",
                     delta_color="off"
                 )
     
     with col2:
         st.subheader("📊 Recruitment Trends")
-        fig_recruit_trend = go.Figure()
-        
-        fig_recruit_trend.add_trace(go.Scatter(
-            x=recruitment_metrics['Month'],
-            y=recruitment_metrics['Applications'],
-            mode='lines+markers',
-            name='Applications',
-            line=dict(color='#3b82f6', width=3),
-            yaxis='y'
-        ))
-        
-        fig_recruit_trend.add_trace(go.Bar(
-            x=recruitment_metrics['Month'],
-            y=recruitment_metrics['Hires'],
-            name='Hires',
-            marker_color='#10b981',
-            yaxis='y2'
-        ))
-        
-        fig_recruit_trend.update_layout(
-            height=400,
-            yaxis=dict(title='Applications'),
-            yaxis2=dict(title='Hires', overlaying='y', side='right'),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_recruit_trend, use_container_width=True)
-
-with tab5:
+        plot(figures.recruitment_trends, recruitment_metrics)
+
+    if funnel_results is None:
+        return
+    _, _, stage_timing, source_yield, requisitions = funnel_results
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("⏱️ Time in Stage")
+        plot(figures.stage_timing, stage_timing)
+
+    with col2:
+        st.subheader("🔗 Source of Hire")
+        plot(figures.source_yield, source_yield)
+
+    with st.expander(f"📋 Requisitions ({len(requisitions)})"):
+        st.dataframe(requisitions, use_container_width=True, hide_index=True)
+
+def render_compensation():
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("💰 Salary vs Market Rate")
-        fig_comp = go.Figure()
-        
-        fig_comp.add_trace(go.Scatter(
-            x=compensation_trend['Quarter'],
-            y=compensation_trend['Avg Salary'],
-            mode='lines+markers',
-            name='Company Avg',
-            line=dict(color='#3b82f6', width=3),
-            marker=dict(size=10)
-        ))
-        
-        fig_comp.add_trace(go.Scatter(
-            x=compensation_trend['Quarter'],
-            y=compensation_trend['Market Rate'],
-            mode='lines+markers',
-            name='Market Rate',
-            line=dict(color='#ef4444', width=3, dash='dash'),
-            marker=dict(size=10)
-        ))
-        
-        fig_comp.update_layout(height=400)
-        st.plotly_chart(fig_comp, use_container_width=True)
+        plot(figures.salary_vs_market, compensation_trend)
     
     with col2:
         st.subheader("💵 Average Salary by Department")
-        fig_salary = px.bar(
-            department_data.sort_values('Avg Salary', ascending=True),
-            y='Department',
-            x='Avg Salary',
-            orientation='h',
-            color='Avg Salary',
-            color_continuous_scale='YlOrRd',
-            text='Avg Salary'
-        )
-        fig_salary.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
-        fig_salary.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_salary, use_container_width=True)
-
-with tab6:
+        plot(figures.salary_by_department, department_data)
+    
+    st.markdown("---")
+    st.subheader("⚖️ Pay Equity")
+    col1, col2 = st.columns(2)
+    with col1:
+        by = st.selectbox("Group by", list(PAY_GROUPS), key="pay_group")
+    with col2:
+        level = st.selectbox("Job level", ["All levels"] + list(reference["pay_bands"]["Level"]), key="pay_level")
+    level = None if level == "All levels" else level
+    
+    def compute_pay():
+        with live.lock:
+            return pay_tables(live.pay, reference["pay_bands"], PAY_GROUPS[by], level, selected_departments,
+                              date_range[1], live.cube.divisions)
+
+    pay_key = cache_key('pay', live.version, departments=sorted(selected_departments), end=date_range[1], by=by,
+                        level=level)
+    pay_result = shared(pay_key, compute_pay)
+    if pay_result is None:
+        return
+    pay_data, compa_data, gap_data = pay_result
+    
+    st.markdown(f"**Salary P10–P90 by {by.lower()} and gender**")
+    plot(figures.pay_percentiles, pay_data)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Compa-ratio by job level**")
+        plot(figures.compa_ratio, compa_data)
+    with col2:
+        st.markdown("**Gender pay gap**")
+        st.dataframe(gap_data.drop(columns="Reference"), use_container_width=True, hide_index=True)
+        if len(gap_data):
+            st.caption(f"Percent of {gap_data['Reference'].iloc[0]} pay. The adjusted gap compares employees "
+                       "in the same department and job level; CI is the 95% interval.")
+
+def render_turnover():
     st.markdown("### 🔄 Turnover Analysis & Insights")
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Overall Turnover Rate", "10.2%", "-1.3%")
+        kpi("Turnover Rate", "Overall Turnover Rate")
     
     with col2:
-        voluntary_rate = (turnover_breakdown.iloc[0]['Count'] / turnover_breakdown['Count'].sum()) * 10.2
-        st.metric("Voluntary Turnover", f"{voluntary_rate:.1f}%", "-0.8%")
+        kpi("Voluntary Turnover")
     
     with col3:
-        st.metric("Avg Tenure", "3.2 years", "+0.3 years")
+        kpi("Avg Tenure")
     
     with col4:
-        st.metric("90-Day Retention", "94.5%", "+2.1%")
+        kpi("90-Day Retention")
     
     st.markdown("---")
     
@@ -765,36 +877,20 @@ with tab6:
     
     with col1:
         st.subheader("📊 Turnover Breakdown")
-        fig_turnover_breakdown = px.pie(
-            turnover_breakdown,
-            values='Count',
-            names='Category',
-            hole=0.4,
-            color_discrete_sequence=px.colors.sequential.RdBu
-        )
-        fig_turnover_breakdown.update_traces(textposition='inside', textinfo='percent+label')
-        fig_turnover_breakdown.update_layout(height=400)
-        st.plotly_chart(fig_turnover_breakdown, use_container_width=True)
+        plot(figures.turnover_breakdown, turnover_breakdown)
         
         st.markdown("**Turnover Summary:**")
         st.dataframe(turnover_breakdown[['Category', 'Count', 'Percentage']], use_container_width=True, hide_index=True)
     
     with col2:
         st.subheader("🔍 Voluntary Turnover Reasons")
-        fig_reasons = px.bar(
-            turnover_reasons.sort_values('Count', ascending=True),
-            y='Reason',
-            x='Count',
-            orientation='h',
-            color='Count',
-            color_continuous_scale='Reds',
-            text='Count'
-        )
-        fig_reasons.update_traces(textposition='outside')
-        fig_reasons.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_reasons, use_container_width=True)
+        plot(figures.turnover_reasons, turnover_reasons)
         
-        st.info("💡 **Key Insight:** 61% of voluntary turnover is due to compensation and career growth")
+        if turnover_reasons['Count'].sum():
+            top = turnover_reasons.nlargest(2, 'Count')
+            share = top['Count'].sum() / turnover_reasons['Count'].sum() * 100
+            st.info(f"💡 **Key Insight:** {share:.0f}% of voluntary turnover is due to "
+                    f"{' and '.join(top['Reason'].str.lower())}")
     
     st.markdown("---")
     
@@ -802,69 +898,63 @@ with tab6:
     
     with col1:
         st.subheader("⏳ Turnover by Tenure")
-        fig_tenure = go.Figure()
+        plot(figures.tenure_turnover, tenure_analysis)
         
-        fig_tenure.add_trace(go.Bar(
-            x=tenure_analysis['Tenure Range'],
-            y=tenure_analysis['Employees'],
-            name='Employee Count',
-            marker_color='#3b82f6',
-            yaxis='y'
-        ))
-        
-        fig_tenure.add_trace(go.Scatter(
-            x=tenure_analysis['Tenure Range'],
-            y=tenure_analysis['Turnover Rate'],
-            name='Turnover Rate %',
-            mode='lines+markers',
-            marker=dict(size=10, color='#ef4444'),
-            line=dict(width=3),
-            yaxis='y2'
-        ))
-        
-        fig_tenure.update_layout(
-            height=400,
-            yaxis=dict(title='Employees'),
-            yaxis2=dict(title='Turnover Rate %', overlaying='y', side='right'),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_tenure, use_container_width=True)
-        
-        st.warning("⚠️ **High Risk:** Employees with 0-1 year tenure have 22.5% turnover rate")
+        st.warning(f"⚠️ **High Risk:** Employees with {tenure_analysis['Tenure Range'].iloc[0]} tenure have "
+                   f"{tenure_analysis['Turnover Rate'].iloc[0]:.1f}% turnover rate")
     
     with col2:
         st.subheader("🏢 Turnover Rate by Department")
-        fig_dept_turnover = go.Figure()
-        
-        fig_dept_turnover.add_trace(go.Bar(
-            name='Current Quarter',
-            x=turnover_data['Department'],
-            y=turnover_data['Current Quarter'],
-            marker_color='#ef4444'
-        ))
-        
-        fig_dept_turnover.add_trace(go.Bar(
-            name='Previous Quarter',
-            x=turnover_data['Department'],
-            y=turnover_data['Previous Quarter'],
-            marker_color='#fca5a5'
-        ))
-        
-        fig_dept_turnover.add_trace(go.Scatter(
-            name='Industry Avg',
-            x=turnover_data['Department'],
-            y=turnover_data['Industry Avg'],
-            mode='lines+markers',
-            marker=dict(size=10, color='#1f2937'),
-            line=dict(width=2, dash='dash')
-        ))
-        
-        fig_dept_turnover.update_layout(
-            barmode='group',
-            height=400,
-            xaxis_tickangle=-45
-        )
-        st.plotly_chart(fig_dept_turnover, use_container_width=True)
+        plot(figures.turnover_comparison, turnover_data, height=400,
+             current="Current Quarter", previous="Previous Quarter")
+    
+    st.markdown("---")
+    st.subheader("🏛️ Turnover by Org Unit")
+    org_drilldown("Turnover Rate", "Headcount")
+    
+    st.markdown("---")
+    st.subheader("📉 Retention by Hire Cohort")
+    group = st.selectbox("Compare by", list(COHORT_GROUPS), key="cohort_group")
+    
+    def compute_cohorts():
+        with live.lock:
+            return cohort_tables(live.spells, COHORT_GROUPS[group], selected_departments, date_range[1])
+
+    cohort_key = cache_key('cohorts', live.version, departments=sorted(selected_departments), end=date_range[1],
+                           by=group)
+    cohort_result = shared(cohort_key, compute_cohorts)
+    if cohort_result is not None:
+        survival_data, retention_data = cohort_result
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f"**Survival by {group.lower()}**")
+            plot(figures.survival_curves, survival_data)
+        with col2:
+            st.markdown("**Retention by monthly hire cohort**")
+            plot(figures.retention_heatmap, retention_data)
+    
+    st.markdown("---")
+    
+    def compute_risk():
+        # One consistent view of the latest rows and the summary they feed
+        with live.lock:
+            risk.update(live)
+            return risk_tables(risk, summary, compensation_trend, selected_departments, date_range[1])
+
+    risk_key = cache_key('risk', live.version, departments=sorted(selected_departments), end=date_range[1])
+    risk_result = shared(risk_key, compute_risk)
+    if risk_result is None:
+        return
+    risk_distribution, risk_segments = risk_result
+    department_risk, new_hire_risk, talent_risk = (row for _, row in risk_segments.iterrows())
+    
+    st.subheader("🎲 Attrition Risk by Department")
+    latest_month = summary.months[-1]
+    if pd.Timestamp(date_range[1]) < latest_month:
+        # Only the latest rows are kept, so earlier populations can't be rescored
+        st.caption(f"Risk is scored for the workforce as of {latest_month:%B %Y}; the selected end date only "
+                   "sets the window of department turnover the scores start from.")
+    plot(figures.risk_distribution, risk_distribution)
     
     st.markdown("---")
     
@@ -872,10 +962,10 @@ with tab6:
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.markdown("""
+        st.markdown(f"""
         <div class="action-item">
-            <h4>🔴 Immediate Action - Sales Dept</h4>
-            <p>14.5% turnover (highest)</p>
+            <h4>🔴 Immediate Action - {department_risk['Segment'].removesuffix(' Dept')}</h4>
+            <p>{department_risk['Avg Risk']:.1f}% average attrition risk (highest)</p>
             <p>• Exit interview analysis</p>
             <p>• Compensation review</p>
             <p>• Manager training</p>
@@ -883,10 +973,10 @@ with tab6:
         """, unsafe_allow_html=True)
     
     with col2:
-        st.markdown("""
+        st.markdown(f"""
         <div class="action-item">
             <h4>🟡 Focus on New Hires</h4>
-            <p>First-year turnover at 22.5%</p>
+            <p>{new_hire_risk['High Risk']} of {new_hire_risk['Employees']} first-year employees at high risk</p>
             <p>• Enhance onboarding</p>
             <p>• 30/60/90 day check-ins</p>
             <p>• Buddy system</p>
@@ -894,16 +984,29 @@ with tab6:
         """, unsafe_allow_html=True)
     
     with col3:
-        st.markdown("""
+        st.markdown(f"""
         <div class="action-item">
             <h4>✅ Retain Top Talent</h4>
-            <p>94.5% 90-day retention</p>
+            <p>{talent_risk['High Risk']} top performers at high risk</p>
             <p>• Career development plans</p>
             <p>• Competitive compensation</p>
             <p>• Recognition programs</p>
         </div>
         """, unsafe_allow_html=True)
 
+TABS = {
+    "📊 Overview": render_overview,
+    "👤 Workforce Analytics": render_workforce,
+    "📈 Performance": render_performance,
+    "🎯 Recruitment": render_recruitment,
+    "💰 Compensation": render_compensation,
+    "🔄 Turnover Analysis": render_turnover,
+}
+
+active_tab = st.radio("Section", list(TABS), horizontal=True, label_visibility="collapsed", key="active_tab")
+profiler.section(f"tab:{active_tab}")
+TABS[active_tab]()
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -912,3 +1015,13 @@ st.markdown("""
     <p>For demo purposes only</p>
 </div>
 """, unsafe_allow_html=True)
+
+profiler.finish()
+if profiler.enabled:
+    spans = profiler.frame()
+    profiler.write()
+    total_ms = spans.loc[spans["Depth"] == 0, "Duration ms"].sum()
+    with st.expander(f"⏱️ Profile: {total_ms:,.0f} ms in {len(spans)} spans"):
+        st.plotly_chart(figures.waterfall(spans), use_container_width=True)
+        st.dataframe(spans.assign(Attributes=spans["Attributes"].astype(str)), use_container_width=True,
+                     hide_index=True)
@@ -0,0 +1,43 @@
+"""Time build_tables() on a synthetic employee-month snapshot.
+
+    python benchmarks/bench_aggregation.py --rows 5000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import build_tables, load_reference  # noqa: E402
+from synthetic import synthetic_snapshot  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5_000_000, help='target employee-months')
+    parser.add_argument('--months', type=int, default=120)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=5.0, help='seconds allowed per build')
+    args = parser.parse_args()
+
+    # With no growth headcount stays flat, so rows ~ employees * months
+    snapshot = synthetic_snapshot(employees=args.rows // args.months, months=args.months, seed=42, growth=0)
+    reference = load_reference()
+    print(f'snapshot: {len(snapshot):,} employee-months, '
+          f'{snapshot.memory_usage(deep=True).sum() / 2**20:,.0f} MiB')
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        build_tables(snapshot, reference)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f'build_tables: best {best:.3f}s, median {sorted(timings)[len(timings) // 2]:.3f}s '
+          f'({len(snapshot) / best / 1e6:,.1f}M rows/s)')
+    if best > args.budget:
+        sys.exit(f'over budget: {best:.3f}s > {args.budget:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
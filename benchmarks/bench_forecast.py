@@ -0,0 +1,45 @@
+"""Time holt_winters() on headcount, hire and leaver series for many cost centers.
+
+    python benchmarks/bench_forecast.py --departments 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecast import holt_winters  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--departments', type=int, default=500)
+    parser.add_argument('--months', type=int, default=120)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=1.0, help='seconds allowed per fit')
+    args = parser.parse_args()
+
+    # Headcount, hires and leavers for each department plus the total, as in forecast_tables()
+    rng = np.random.default_rng(42)
+    t = np.arange(args.months)
+    series = 3 * (args.departments + 1)
+    base = rng.uniform(10, 500, (series, 1))
+    y = base * (1 + 0.002 * t + 0.05 * np.sin(2 * np.pi * t / 12)) + rng.normal(0, 2, (series, args.months))
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        holt_winters(y)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f'holt_winters: {series:,} series x {args.months} months, best {best:.3f}s, '
+          f'median {sorted(timings)[len(timings) // 2]:.3f}s')
+    if best > args.budget:
+        sys.exit(f'over budget: {best:.3f}s > {args.budget:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
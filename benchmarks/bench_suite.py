@@ -0,0 +1,312 @@
+"""Load, aggregation, filter and figure benchmarks at several workforce sizes.
+
+    python benchmarks/bench_suite.py --out results.json
+    python benchmarks/bench_suite.py --large --out results.json
+    python benchmarks/bench_suite.py --employees 10000 --baseline results.json
+
+Sizes default to 10k and 100k employees; --large adds 1M and 10M, which
+need tens to hundreds of GB of memory. Each size gets a seeded synthetic
+HRIS event store (generated once and kept under --data) and runs in a
+process of its own, so its peak memory is its own. Results go to --out as
+JSON; with --baseline, timings more than --tolerance slower than the
+baseline's are reported and the run exits non-zero.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import figures  # noqa: E402
+from aggregation import TABLE_NAMES, date_bounds, tables_from_summary  # noqa: E402
+from anomalies import AnomalyDetector  # noqa: E402
+from forecast import forecast_tables, with_forecast  # noqa: E402
+from history import headcount_series  # noqa: E402
+from incremental import open_live  # noqa: E402
+from insights import insights  # noqa: E402
+from metrics import evaluate  # noqa: E402
+from risk import RiskScores, risk_tables  # noqa: E402
+from store import EventStore  # noqa: E402
+from orgchart import ORG_LEVELS  # noqa: E402
+from payequity import pay_tables  # noqa: E402
+from recruiting import FunnelSummary, funnel_tables  # noqa: E402
+from surveys import SurveySummary, survey_tables  # noqa: E402
+from synthetic import org_structure, synthetic_applications, synthetic_events, synthetic_responses  # noqa: E402
+
+# Figure builder -> the table it plots (a TABLE_NAMES title, or a derived table)
+FIGURES = {
+    'headcount': 'headcount_with_forecast',
+    'department_metrics': 'Departments',
+    'gender_diversity': 'Gender Diversity',
+    'age_distribution': 'Age Distribution',
+    'turnover_comparison': 'Turnover',
+    'skills': 'Skills Gap',
+    'performance': 'Performance',
+    'engagement': 'Engagement',
+    'funnel': 'Recruitment Funnel',
+    'recruitment_trends': 'Recruitment Metrics',
+    'salary_vs_market': 'Compensation',
+    'salary_by_department': 'Departments',
+    'turnover_breakdown': 'Turnover Breakdown',
+    'turnover_reasons': 'Turnover Reasons',
+    'tenure_turnover': 'Tenure Analysis',
+    'department_forecast': 'department_forecast',
+    'risk_distribution': 'risk_distribution',
+}
+SIZES = [10_000, 100_000]
+LARGE_SIZES = [1_000_000, 10_000_000]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def peak_rss_mib():
+    # Peak of this process so far; each size runs in its own (see run_isolated())
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def generate(root, employees, departments, years, seed):
+    store = EventStore(root)
+    if not store.is_empty():
+        return None
+    shutil.rmtree(root, ignore_errors=True)
+    start = time.perf_counter()
+    events = sum(store.ingest_table(table) for table in synthetic_events(employees, departments, years, seed))
+    store.write_reference('org_structure', org_structure(departments))
+    return {'events': events, 'generate_s': time.perf_counter() - start}
+
+
+def count_responses(responses):
+    surveys = SurveySummary()
+    surveys.add([responses])
+    return surveys
+
+
+def count_applications(events):
+    funnel = FunnelSummary()
+    funnel.add(events)
+    return funnel
+
+
+def run_size(args, employees):
+    root = os.path.join(args.data, f'{employees}-{args.departments}d-{args.years}y-s{args.seed}')
+    result = {'employees': employees}
+    result.update(generate(root, employees, args.departments, args.years, args.seed) or {})
+    store = EventStore(root)
+    result['files'] = len(store.files())
+    result['store_mib'] = sum(os.path.getsize(f) for f in store.files()) / 2**20
+
+    # Cold: no persisted summary, so the snapshot is rebuilt from every event
+    shutil.rmtree(os.path.join(root, 'state'), ignore_errors=True)
+    start = time.perf_counter()
+    live, reference = open_live(root)
+    result['load_cold_s'] = time.perf_counter() - start
+    result['load_warm_s'], (live, reference) = best_of(args.repeat, lambda: open_live(root))
+    summary = live.summary
+    result['departments'] = len(summary.departments)
+    result['headcount'] = int(summary.headcount[:, -1].sum())
+
+    result['tables_s'], tables = best_of(args.repeat, lambda: tables_from_summary(summary, reference))
+    result['kpis_s'], _ = best_of(args.repeat, lambda: evaluate(summary, reference))
+    result['forecast_s'], forecast = best_of(args.repeat, lambda: forecast_tables(summary))
+    risk = RiskScores()
+    start = time.perf_counter()
+    risk.update(live)
+    result['risk_score_s'] = time.perf_counter() - start
+    compensation = tables[TABLE_NAMES.index('Compensation')]
+    result['risk_tables_s'], risk_result = best_of(args.repeat,
+                                                   lambda: risk_tables(risk, summary, compensation))
+
+    # Filter latency: random department subsets and date ranges, as a
+    # sidebar change would issue them
+    rng = np.random.default_rng(args.seed)
+    months = summary.months
+    latencies = []
+    for _ in range(args.filters):
+        chosen = rng.choice(summary.departments, size=rng.integers(1, len(summary.departments) + 1), replace=False)
+        lo, hi = np.sort(rng.integers(0, len(months), 2))
+        start = time.perf_counter()
+        tables_from_summary(summary, reference, chosen, months[lo], months[hi])
+        evaluate(summary, reference, chosen, months[lo], months[hi])
+        latencies.append((time.perf_counter() - start) * 1000)
+    result['filter_p50_ms'] = float(np.percentile(latencies, 50))
+    result['filter_p95_ms'] = float(np.percentile(latencies, 95))
+
+    # Org drill-down: children of random divisions and departments
+    cube = live.cube
+    result['teams'] = len(cube.paths['Team'])
+    latencies = []
+    for _ in range(args.filters):
+        level = ORG_LEVELS[rng.integers(0, 3)]
+        path = cube.paths[level][rng.integers(0, len(cube.paths[level]))]
+        lo, hi = np.sort(rng.integers(0, len(months), 2))
+        start = time.perf_counter()
+        cube.children(path, months[lo], months[hi])
+        latencies.append((time.perf_counter() - start) * 1000)
+    result['drill_p95_ms'] = float(np.percentile(latencies, 95))
+    seconds, _ = best_of(args.repeat, lambda: insights(cube, reference))
+    result['insights_ms'] = seconds * 1000
+    seconds, _ = best_of(args.repeat, lambda: AnomalyDetector(cube))
+    result['anomalies_ms'] = seconds * 1000
+    result['pay_s'], _ = best_of(args.repeat, lambda: pay_tables(live.pay, reference['pay_bands'],
+                                                                 divisions=cube.divisions))
+    # A year of daily as-of headcount, and everyone on staff on the last day
+    last_day = date_bounds(summary)[1]
+    result['history_segments'] = len(live.history)
+    seconds, _ = best_of(args.repeat, lambda: headcount_series(live.history, None, last_day - pd.Timedelta(days=364),
+                                                               last_day))
+    result['asof_daily_ms'] = seconds * 1000
+    seconds, _ = best_of(args.repeat, lambda: live.history.members(last_day))
+    result['asof_members_ms'] = seconds * 1000
+
+    # One pulse survey of the whole workforce, counted into answer
+    # histograms and read back as the dashboard's survey tables
+    responses = synthetic_responses(summary, reference['survey_questions'], seed=args.seed, last=1)
+    result['responses'] = len(responses)
+    result['survey_count_s'], surveys = best_of(args.repeat, lambda: count_responses(responses))
+    seconds, _ = best_of(args.repeat, lambda: survey_tables(surveys, summary, reference['survey_questions']))
+    result['survey_tables_ms'] = seconds * 1000
+    del responses
+
+    # A quarter of ATS events behind the hires, folded into funnel cells and
+    # read back for one department
+    applications = synthetic_applications(summary, seed=args.seed, last=3)
+    result['ats_events'] = len(applications)
+    result['funnel_add_s'], funnel = best_of(args.repeat, lambda: count_applications(applications))
+    seconds, _ = best_of(args.repeat, lambda: funnel_tables(funnel))
+    result['funnel_tables_ms'] = seconds * 1000
+    seconds, _ = best_of(args.repeat, lambda: funnel_tables(funnel, summary.departments[:1]))
+    result['funnel_filter_ms'] = seconds * 1000
+    del applications
+
+    inputs = dict(zip(TABLE_NAMES, tables))
+    inputs['headcount_with_forecast'] = with_forecast(inputs['Headcount Trend'], forecast[0])
+    inputs['department_forecast'] = forecast[1]
+    inputs['risk_distribution'] = risk_result[0]
+    result['figures'] = {}
+    for name, table in FIGURES.items():
+        seconds, fig = best_of(args.repeat, lambda: getattr(figures, name)(inputs[table]))
+        result['figures'][name] = {'build_ms': seconds * 1000, 'json_bytes': len(fig.to_json())}
+    result['figures_ms'] = sum(f['build_ms'] for f in result['figures'].values())
+    result['payload_bytes'] = sum(f['json_bytes'] for f in result['figures'].values())
+    result['peak_rss_mib'] = peak_rss_mib()
+    return result
+
+
+def run_isolated(args, employees):
+    # run_size() in a fresh interpreter, so peak RSS covers that size alone
+    # and one that runs out of memory doesn't take the others with it
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    command = [sys.executable, os.path.abspath(__file__), '--employees', str(employees), '--result', path,
+               '--departments', str(args.departments), '--years', str(args.years), '--seed', str(args.seed),
+               '--repeat', str(args.repeat), '--filters', str(args.filters), '--data', args.data]
+    try:
+        code = subprocess.run(command).returncode
+        if code:
+            return {'employees': employees, 'failed': f'exit status {code}'}
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'timestamp': pd.Timestamp.now(tz='UTC').isoformat(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'pyarrow': pa.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def timings(results):
+    # Flatten every duration (keys ending in _s or _ms) to 'size/name'
+    flat = {}
+    for size, result in results.items():
+        for key, value in result.items():
+            if key.endswith(('_s', '_ms')) and key != 'generate_s':
+                flat[f'{size}/{key}'] = value
+        for name, fig in result.get('figures', {}).items():
+            flat[f'{size}/figures/{name}'] = fig['build_ms']
+    return flat
+
+
+def regressions(current, baseline, tolerance):
+    old = timings(baseline['results'])
+    return [(key, old[key], value) for key, value in timings(current['results']).items()
+            if key in old and old[key] > 0 and value > old[key] * (1 + tolerance)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--employees', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--large', action='store_true', help=f'also run {LARGE_SIZES}')
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--filters', type=int, default=50, help='random filter selections to time')
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'),
+                        help='where generated event stores are kept')
+    parser.add_argument('--out', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown against the baseline')
+    # Where run_isolated() has a single size write its result
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.result:
+        with open(args.result, 'w') as f:
+            json.dump(run_size(args, args.employees[0]), f)
+        return
+
+    sizes = list(args.employees) + (LARGE_SIZES if args.large else [])
+    report = {'meta': metadata(), 'params': {k: v for k, v in vars(args).items()
+                                             if k not in ('out', 'baseline', 'result')}, 'results': {}}
+    for employees in sizes:
+        result = run_isolated(args, employees)
+        report['results'][str(employees)] = result
+        if 'failed' in result:
+            print(f"{employees:>12,} employees: failed ({result['failed']})")
+        else:
+                print(f"{employees:>12,} employees: cold load {result['load_cold_s']:.2f}s, "
+                  f"warm {result['load_warm_s']:.3f}s, tables {result['tables_s'] * 1000:.1f}ms, "
+                  f"filter p95 {result['filter_p95_ms']:.1f}ms, figures {result['figures_ms']:.0f}ms "
+                  f"({result['payload_bytes'] / 1024:,.0f} KiB), peak RSS {result['peak_rss_mib']:,.0f} MiB")
+        # Written after every size so an interrupted run keeps the sizes done
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance)
+        for key, old, new in slower:
+            print(f'regression: {key} {old:.4g} -> {new:.4g}')
+        if slower:
+            sys.exit(f'{len(slower)} timings regressed by more than {args.tolerance:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pyarrow as pa
+
+import profiling
+
+# Cached entries live for a day unless a caller asks otherwise; every key
+# already carries the data version, so stale entries are only a space cost
+DEFAULT_TTL = 24 * 3600
+# Frame sets kept in memory per process, shared by every session that asks
+# for the same key
+FRAME_MEMO_SIZE = 256
+# DiskCache rescans its directory at least this often (for other replicas'
+# writes and expired entries), and evicts down to this share of its bound
+SCAN_SECONDS = 300
+EVICT_TO = 0.9
+
+
+def cache_key(namespace, version, **params):
+    """Stable key for ``namespace`` results of one data version and parameter set."""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return f'{namespace}:{version}:{hashlib.sha1(payload.encode()).hexdigest()}'
+
+
+def frame_to_bytes(df):
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def frame_from_buffer(buffer):
+    # One block per column lets numeric columns without nulls wrap the Arrow
+    # buffers (memory-mapped for DiskCache) instead of being copied out
+    return pa.ipc.open_file(buffer).read_all().to_pandas(split_blocks=True)
+
+
+class ResultCache:
+    """Derived DataFrames and figure JSON on top of a byte-oriented backend.
+
+    Frame sets are also memoized in the process, so concurrent sessions with
+    the same filters get the same DataFrame objects rather than one copy
+    each. Callers must treat them as read-only; columns backed by
+    memory-mapped cache files reject writes anyway.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        profiling.count('cache_misses' if value is None else 'cache_hits')
+        return value
+
+    def get_frames(self, key):
+        with self.lock:
+            frames = self.frames.get(key)
+            if frames is not None:
+                self.frames.move_to_end(key)
+                return self._count(frames)
+        count = self.backend.get(f'{key}:n')
+        if count is None:
+            return self._count(None)
+        buffers = self.backend.get_many([f'{key}:{i}' for i in range(int(count))])
+        if any(buffer is None for buffer in buffers):
+            return self._count(None)
+        frames = tuple(frame_from_buffer(buffer) for buffer in buffers)
+        self._remember(key, frames)
+        return self._count(frames)
+
+    def put_frames(self, key, frames, ttl=DEFAULT_TTL):
+        for i, df in enumerate(frames):
+            self.backend.set(f'{key}:{i}', frame_to_bytes(df), ttl)
+        # Written last so a reader never sees a partial set
+        self.backend.set(f'{key}:n', str(len(frames)).encode(), ttl)
+        self._remember(key, frames)
+
+    def _remember(self, key, frames):
+        if isinstance(self.backend, NullCache):
+            return
+        with self.lock:
+            self.frames[key] = frames
+            self.frames.move_to_end(key)
+            while len(self.frames) > FRAME_MEMO_SIZE:
+                self.frames.popitem(last=False)
+
+    def get_json(self, key):
+        value = self.backend.get(key)
+        return self._count(None if value is None else bytes(value).decode())
+
+    def put_json(self, key, text, ttl=DEFAULT_TTL):
+        self.backend.set(key, text.encode(), ttl)
+
+    def cached_frames(self, key, compute, ttl=DEFAULT_TTL):
+        frames = self.get_frames(key)
+        if frames is None:
+            frames = compute()
+            if frames is not None:
+                self.put_frames(key, frames, ttl)
+        return frames
+
+
+class NullCache:
+    """Backend that stores nothing; caching disabled."""
+
+    def get(self, key):
+        return None
+
+    def get_many(self, keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, ttl=None):
+        pass
+
+
+class DiskCache:
+    """Size-bounded LRU cache of files in a (possibly shared) directory.
+
+    Values are read back through memory maps, so Arrow IPC entries are not
+    copied into the process until pandas needs them. Each file's mtime holds
+    its expiry time and its atime the last access, which drives LRU eviction
+    without a separate index that replicas would have to agree on. The
+    directory's total size is tracked in memory as entries are written; it
+    is only scanned when that passes ``max_bytes`` or SCAN_SECONDS have
+    gone by, so a write costs no more than the file it writes.
+    """
+
+    def __init__(self, root, max_bytes=2 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total = None  # bytes in the directory as of the last scan, plus writes since
+        self.scanned = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime < time.time():
+                os.remove(path)
+                with self.lock:
+                    if self.total is not None:
+                        self.total -= stat.st_size
+                return None
+            os.utime(path, (time.time(), stat.st_mtime))
+            # The buffer keeps the mapping alive once the file is closed
+            with pa.memory_map(path) as source:
+                return source.read_buffer()
+        except FileNotFoundError:
+            return None
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=DEFAULT_TTL):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        data = memoryview(value)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.utime(tmp, (time.time(), time.time() + (ttl or DEFAULT_TTL)))
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self.lock:
+            if self.total is not None:
+                self.total += data.nbytes - replaced
+            due = self.total is None or self.total > self.max_bytes \
+                or time.monotonic() - self.scanned >= SCAN_SECONDS
+        if due:
+            self._evict()
+
+    def _evict(self):
+        # Drop expired entries, then the least recently used down to
+        # EVICT_TO of the bound once it is exceeded
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, stat.st_mtime, entry.path))
+            now = time.time()
+            total = sum(size for _, size, _, _ in entries)
+            target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+            for accessed, size, expires, path in sorted(entries):
+                if total <= target and expires >= now:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self.total = total
+            self.scanned = time.monotonic()
+
+
+class RedisCache:
+    """Cache shared by all replicas through any Redis-protocol server.
+
+    TTLs are native key expiries. The size bound is kept client-side: a
+    sorted set scores keys by last access and a hash records their sizes, so
+    the least recently used entries are dropped once ``max_bytes`` is
+    exceeded, whatever the server's own eviction policy. Keys that expired
+    through their TTL are swept from the sorted set, the hash and the byte
+    count before anything is evicted, and every SCAN_SECONDS regardless.
+    """
+
+    def __init__(self, url, max_bytes=2 << 30, prefix='hr-dashboard', client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lru = f'{prefix}:lru'
+        self.sizes = f'{prefix}:sizes'
+        self.total = f'{prefix}:bytes'
+        self.swept = 0.0
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        keys = [self._key(key) for key in keys]
+        values = self.client.mget(keys)
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in zip(keys, values):
+            if value is not None:
+                pipe.zadd(self.lru, {key: now}, xx=True)
+        pipe.execute()
+        return [None if value is None else pa.py_buffer(value) for value in values]
+
+    def set(self, key, value, ttl=DEFAULT_TTL):
+        key = self._key(key)
+        data = memoryview(value).tobytes()
+        pipe = self.client.pipeline()
+        pipe.set(key, data, ex=int(ttl or DEFAULT_TTL))
+        pipe.zadd(self.lru, {key: time.time()})
+        pipe.hget(self.sizes, key)
+        pipe.hset(self.sizes, key, len(data))
+        _, _, previous, _ = pipe.execute()
+        total = self.client.incrby(self.total, len(data) - int(previous or 0))
+        if total > self.max_bytes or time.monotonic() - self.swept >= SCAN_SECONDS:
+            self._evict(total)
+
+    def _evict(self, total):
+        # Forget expired keys, then drop the least recently used down to
+        # EVICT_TO of the bound once it is exceeded
+        self.swept = time.monotonic()
+        members = self.client.zrange(self.lru, 0, -1)
+        pipe = self.client.pipeline(transaction=False)
+        for member in members:
+            pipe.exists(member)
+        expired = [member for member, alive in zip(members, pipe.execute()) if not alive]
+        if expired:
+            total = self._forget(expired)
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        while total > target:
+            oldest = self.client.zpopmin(self.lru)
+            if not oldest:
+                break
+            self.client.delete(oldest[0][0])
+            total = self._forget([oldest[0][0]])
+
+    def _forget(self, keys):
+        # Drop keys from the bookkeeping; returns the new byte count
+        pipe = self.client.pipeline()
+        pipe.zrem(self.lru, *keys)
+        pipe.hmget(self.sizes, keys)
+        pipe.hdel(self.sizes, *keys)
+        _, sizes, _ = pipe.execute()
+        return self.client.incrby(self.total, -sum(int(size or 0) for size in sizes))
+
+def open_cache(spec, default_root):
+    """Cache from a spec: 'none', 'redis://host:port/db' or a directory (default)."""
+    if spec == 'none':
+        return ResultCache(NullCache())
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return ResultCache(RedisCache(spec))
+    return ResultCache(DiskCache(spec or default_root))
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from aggregation import month_ordinal, month_start, ratio
+
+# Curves stop where fewer spells than this are at risk
+MIN_AT_RISK = 10
+# Longest tenure, in months, that curves and the retention matrix reach, and
+# the number of monthly hire cohorts in the matrix
+HORIZON = 120
+# Dashboard label -> spell attribute the survival curves are split by
+COHORT_GROUPS = {'Department': 'department', 'Recruitment Source': 'source', 'Hire Year': 'hire_year'}
+UNKNOWN_SOURCE = 'Unknown'
+
+
+def spells_frame(employee_id, hire, entry, exit, department, source):
+    return pd.DataFrame({
+        'employee_id': np.asarray(employee_id, dtype=np.int64),
+        'hire': np.asarray(hire, dtype=np.int32),
+        'entry': np.asarray(entry, dtype=np.int32),
+        'exit': np.asarray(exit, dtype=np.int32),
+        'department': pd.Categorical(np.asarray(department, dtype=object)),
+        'source': pd.Categorical(pd.Series(np.asarray(source, dtype=object)).fillna(UNKNOWN_SOURCE)),
+    })
+
+
+def spells_from_events(events, start=None):
+    """Employment spells, one per hire, from an HRIS event log.
+
+    ``hire``, ``entry`` and ``exit`` are month ordinals; ``exit`` is -1
+    while the spell is open. ``entry`` is the first month the spell was
+    observed: its hire month, or ``start`` for earlier hires. By default
+    ``start`` is the month of the log's first event other than a hire, as
+    exports list the backdated hires of everyone employed when they begin
+    but none of the exits before. Department and source are those on the
+    hire event.
+    """
+    if start is None:
+        others = events.loc[events['event_type'] != 'hire', 'event_date']
+        start = month_ordinal([pd.to_datetime(others).min()])[0] if len(others) else np.iinfo(np.int32).min
+    ev = events[events['event_type'].isin(['hire', 'termination'])]
+    if 'source' not in ev:
+        ev = ev.assign(source=None)
+    # Dates go in as arrays: a Series assigned to an empty frame (a batch
+    # without terminations) would bring its whole index along
+    dates = pd.to_datetime(ev['event_date']).astype('datetime64[ns]').to_numpy()
+    hired = (ev['event_type'] == 'hire').to_numpy()
+    left = (ev['event_type'] == 'termination').to_numpy()
+    hires = ev.loc[hired, ['employee_id', 'department', 'source']].assign(
+        hire_date=dates[hired]).sort_values('hire_date', kind='stable')
+    terms = ev.loc[left, ['employee_id']].assign(term_date=dates[left]).sort_values('term_date', kind='stable')
+    spells = pd.merge_asof(hires, terms, left_on='hire_date', right_on='term_date', by='employee_id',
+                           direction='forward')
+    hire = month_ordinal(spells['hire_date'])
+    exit = np.where(spells['term_date'].notna(), month_ordinal(spells['term_date'].fillna(pd.Timestamp(0))), -1)
+    return spells_frame(spells['employee_id'], hire, np.maximum(hire, start), exit, spells['department'],
+                        spells['source'])
+
+
+def spells_from_snapshot(snapshot):
+    """Spells of everyone in an employee-month snapshot.
+
+    Spells that began before the snapshot are entered at its first month
+    (left-truncated), with the hire month taken from tenure; the estimators
+    only count them from entry.
+    """
+    first = snapshot.drop_duplicates('employee_id')
+    month = month_ordinal(first['month'])
+    hire = np.where(first['hired'], month, month - np.round(first['tenure'].to_numpy() * 12).astype(np.int64))
+    leavers = snapshot.loc[snapshot['terminated'], ['employee_id', 'month']].drop_duplicates('employee_id', keep='last')
+    exit = pd.Series(month_ordinal(leavers['month']), index=leavers['employee_id'].to_numpy())
+    exit = exit.reindex(first['employee_id'].to_numpy()).fillna(-1).to_numpy()
+    source = first['source'] if 'source' in first else None
+    return spells_frame(first['employee_id'], hire, month, exit, first['department'], source)
+
+
+def update_spells(spells, events):
+    """``spells`` with a batch of events applied: terminations close open spells, hires open new ones."""
+    terms = events[events['event_type'] == 'termination']
+    if len(terms):
+        first_term = terms.assign(month=month_ordinal(pd.to_datetime(terms['event_date']))) \
+            .groupby('employee_id')['month'].min()
+        open_spells = np.flatnonzero(spells['exit'].to_numpy() < 0)
+        ids = spells['employee_id'].to_numpy()[open_spells]
+        month = first_term.reindex(ids).to_numpy()
+        closing = ~np.isnan(month) & (month >= spells['hire'].to_numpy()[open_spells])
+        if closing.any():
+            exit = spells['exit'].to_numpy().copy()
+            exit[open_spells[closing]] = month[closing]
+            spells = spells.assign(exit=exit)
+    if not (events['event_type'] == 'hire').any():
+        return spells
+    new = spells_from_events(events, start=spells['entry'].min() if len(spells) else None)
+    # Categories are merged rather than the labels re-encoded, so appending
+    # a batch copies the integer columns and codes once
+    columns = {name: np.concatenate([spells[name].to_numpy(), new[name].to_numpy()])
+               for name in ['employee_id', 'hire', 'entry', 'exit']}
+    for name in ['department', 'source']:
+        columns[name] = union_categoricals([spells[name], new[name]])
+    return pd.DataFrame(columns)
+
+
+def observed(spells, departments=None, end=None):
+    # Spells of the selected departments as of ``end``: later hires are
+    # dropped and later exits reopened. Returns the spells, whether each
+    # ended in an exit, and the last observed month.
+    if end is None:
+        last = int(max(spells['hire'].max(), spells['exit'].max()))
+    else:
+        last = int(month_ordinal([pd.Timestamp(end)])[0])
+    keep = spells['hire'].to_numpy() <= last
+    if departments is not None:
+        keep &= spells['department'].isin(list(departments)).to_numpy()
+    spells = spells[keep]
+    exit = spells['exit'].to_numpy()
+    return spells, (exit >= 0) & (exit <= last), last
+
+
+def survival(spells, by=None, departments=None, end=None, horizon=HORIZON):
+    """Kaplan-Meier retention by months since hire, overall or per ``by`` group.
+
+    A spell is at risk from its entry month until it exits (an event at
+    that tenure) or until ``end`` (censored). Exits, entries and censorings
+    are counted per (group, tenure) with one bincount each, so the risk
+    sets and the product-limit estimate are cumulative sums and products
+    along the tenure axis. Tenure past ``horizon`` counts as censored there.
+
+    Returns Group, Months, Retention (percent still employed after that
+    many months), At Risk and Exits; points with fewer than MIN_AT_RISK
+    spells at risk are left out.
+    """
+    spells, exited, last = observed(spells, departments, end)
+    hire = spells['hire'].to_numpy(np.int64)
+    start = spells['entry'].to_numpy(np.int64) - hire
+    stop = np.where(exited, spells['exit'].to_numpy(np.int64), last) - hire
+    inside = start <= horizon
+    exited &= stop <= horizon
+    stop = np.minimum(stop, horizon)
+    codes, labels = groups(spells, by)
+    codes, start, stop, exited = codes[inside], start[inside], stop[inside], exited[inside]
+
+    width = horizon + 1
+    size = len(labels) * width
+    exits = np.bincount(codes * width + stop, weights=exited, minlength=size).reshape(-1, width)
+    leaving = np.bincount(codes * width + stop, minlength=size).reshape(-1, width)
+    entering = np.bincount(codes * width + start, minlength=size).reshape(-1, width)
+    # At risk at tenure t: entered by t and not gone before t
+    at_risk = np.cumsum(entering, axis=1) - (np.cumsum(leaving, axis=1) - leaving)
+    retention = np.cumprod(1 - ratio(exits, at_risk), axis=1) * 100
+
+    df = pd.DataFrame({
+        'Group': np.repeat(labels, width),
+        'Months': np.tile(np.arange(width), len(labels)),
+        'Retention': retention.ravel().round(1),
+        'At Risk': at_risk.ravel(),
+        'Exits': exits.ravel().astype(np.int64),
+    })
+    return df[df['At Risk'] >= MIN_AT_RISK].reset_index(drop=True)
+
+
+def retention_matrix(spells, departments=None, end=None, cohorts=HORIZON, horizon=HORIZON):
+    """Share of each monthly hire cohort still employed k months after hire.
+
+    Covers the latest ``cohorts`` cohorts observed from their hire month,
+    for tenures they have reached by ``end``. Returns Cohort, Months,
+    Retention (percent) and Hires, cohorts in hire order.
+    """
+    spells, exited, last = observed(spells, departments, end)
+    hire = spells['hire'].to_numpy(np.int64)
+    first = last - cohorts + 1
+    keep = (spells['entry'].to_numpy() == hire) & (hire >= first)
+    cohort = hire[keep] - first
+    tenure = np.where(exited, spells['exit'].to_numpy(np.int64), last)[keep] - hire[keep]
+    left = exited[keep] & (tenure <= horizon)
+
+    width = horizon + 1
+    hires = np.bincount(cohort, minlength=cohorts)
+    exits = np.bincount(cohort[left] * width + tenure[left], minlength=cohorts * width).reshape(cohorts, width)
+    retention = (1 - ratio(np.cumsum(exits, axis=1), hires[:, None])) * 100
+    months = np.arange(width)
+    reached = (months[None, :] <= (last - first - np.arange(cohorts))[:, None]) & (hires[:, None] > 0)
+    row, column = np.nonzero(reached)
+    labels = pd.PeriodIndex(month_start(first + np.arange(cohorts)), freq='M').strftime('%b %Y')
+    return pd.DataFrame({
+        'Cohort': np.asarray(labels)[row],
+        'Months': column,
+        'Retention': retention[row, column].round(1),
+        'Hires': hires[row],
+    })
+
+
+def groups(spells, by):
+    if by is None:
+        return np.zeros(len(spells), dtype=np.int64), np.array(['All'], dtype=object)
+    if by == 'hire_year':
+        values = pd.Series(1970 + spells['hire'].to_numpy() // 12).astype(str)
+    else:
+        values = spells[by].astype(object)
+    codes, labels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), np.asarray(labels, dtype=object)
+
+
+def cohort_tables(spells, by=None, departments=None, end=None):
+    """Survival curves split by ``by`` (a COHORT_GROUPS value) and the hire-cohort retention matrix."""
+    return survival(spells, by, departments, end), retention_matrix(spells, departments, end)
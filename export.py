@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+import plotly.graph_objects as go
+
+from jobs import Cancelled
+from store import EventStore
+
+# Excel's sheet limit, header row included; longer tables continue on
+# numbered sheets
+EXCEL_ROWS = 1_048_576
+DETAIL_COLUMNS = ['employee_id', 'event_date', 'department', 'category', 'reason']
+PDF_TABLE_ROWS = 40
+PAGE_SIZE = (1100, 850)
+# Finished exports are removed after this many seconds
+EXPORT_TTL = 3600
+# How often a waiting export job checks for cancellation
+POLL_SECONDS = 0.5
+
+
+def write_excel(path, sheets, detail=None):
+    """Write ``sheets`` (title -> DataFrame) and an optional turnover detail to ``path``.
+
+    xlsxwriter's constant-memory mode flushes every row to disk as soon as
+    the next one starts, and the detail is streamed from the event store in
+    batches, so memory stays flat however many rows are exported.
+    ``detail`` holds the store ``root`` and the ``start``, ``end`` and
+    ``departments`` filters.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    for title, df in sheets.items():
+        write_frames(workbook, title, [df])
+    if detail is not None:
+        store = EventStore(detail['root'])
+        frames = store.batches(DETAIL_COLUMNS, detail.get('start'), detail.get('end'),
+                               detail.get('departments'), event_types=['termination'])
+        write_frames(workbook, 'Turnover Detail', frames)
+    workbook.close()
+    return path
+
+
+def write_frames(workbook, title, frames):
+    sheet, row, part = None, EXCEL_ROWS, 0
+    for df in frames:
+        # Native Python values with None for blanks; xlsxwriter skips those
+        columns = [df[name].astype(object).where(df[name].notna(), None).tolist() for name in df.columns]
+        for values in zip(*columns):
+            if row == EXCEL_ROWS:
+                part += 1
+                sheet = workbook.add_worksheet((title if part == 1 else f'{title} ({part})')[:31])
+                sheet.write_row(0, 0, [str(name) for name in df.columns])
+                row = 1
+            sheet.write_row(row, 0, values)
+            row += 1
+    if sheet is None:
+        workbook.add_worksheet(title[:31])
+
+
+def table_figure(title, df):
+    shown = df.head(PDF_TABLE_ROWS)
+    cells = [np.where(shown[name].isna(), '', shown[name].astype(str)) for name in shown.columns]
+    fig = go.Figure(go.Table(
+        header=dict(values=[f'<b>{name}</b>' for name in shown.columns], fill_color='#667eea',
+                    font=dict(color='white')),
+        cells=dict(values=cells, fill_color='#f7fafc')
+    ))
+    suffix = f' (first {PDF_TABLE_ROWS} of {len(df):,} rows)' if len(df) > PDF_TABLE_ROWS else ''
+    fig.update_layout(title=title + suffix)
+    return fig
+
+
+def render_page(figure_json, path, title=None):
+    import plotly.io as pio
+
+    fig = pio.from_json(figure_json)
+    if title is not None:
+        fig.update_layout(title=title)
+    fig.write_image(path, format='png', width=PAGE_SIZE[0], height=PAGE_SIZE[1])
+    return path
+
+
+def assemble_pdf(path, pages):
+    from PIL import Image
+
+    images = [Image.open(page).convert('RGB') for page in pages]
+    images[0].save(path, 'PDF', save_all=True, append_images=images[1:], resolution=100)
+    return path
+
+
+class Exporter:
+    """Builds export files in worker processes.
+
+    The methods run inside scheduler jobs (see jobs.py) and block until the
+    file is written, reporting progress on the job. The work itself happens
+    in a process pool, so a large export neither holds the GIL nor grows
+    the Streamlit process's memory. PDF pages (one per figure or table) are
+    rendered to PNG in parallel across the pool, then stitched into one
+    document. A cancelled export's worker runs to completion and its file
+    is discarded.
+    """
+
+    def __init__(self, directory, workers=2):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def path(self, suffix):
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < time.time() - EXPORT_TTL:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        return os.path.join(self.directory, f'hr-dashboard-{uuid.uuid4().hex[:12]}.{suffix}')
+
+    def excel(self, job, sheets, detail=None):
+        path = self.path('xlsx')
+        job.update(message='Writing workbook')
+        return self._wait(job, self.pool.submit(write_excel, path, sheets, detail), path)
+
+    def pdf(self, job, figures, sheets):
+        """``figures`` is a list of (title, figure JSON); ``sheets`` maps titles to tables."""
+        # Titles are set in the workers, so figure JSON is never parsed here
+        pages = list(figures) + [(None, table_figure(title, df).to_json()) for title, df in sheets.items()]
+        path = self.path('pdf')
+        scratch = tempfile.mkdtemp(dir=self.directory)
+        rendered = [self.pool.submit(render_page, page, os.path.join(scratch, f'{i:03d}.png'), title)
+                    for i, (title, page) in enumerate(pages)]
+        try:
+            pending = rendered
+            while pending:
+                done, pending = wait(rendered, timeout=POLL_SECONDS)
+                job.update(len(done) / (len(pages) + 1), f'Rendered {len(done)} of {len(pages)} pages')
+            pages = [future.result() for future in rendered]
+            return self._wait(job, self.pool.submit(assemble_pdf, path, pages), path)
+        except Cancelled:
+            for future in rendered:
+                future.cancel()
+            raise
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def _wait(self, job, future, path):
+        try:
+            while not wait([future], timeout=POLL_SECONDS).done:
+                job.update()
+            return future.result()
+        except Cancelled:
+            if not future.cancel():
+                future.add_done_callback(lambda _: os.path.exists(path) and os.remove(path))
+            raise
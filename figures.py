@@ -0,0 +1,814 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import profiling
+from cache import cache_key
+
+# Series longer than this are drawn with WebGL and downsampled to MAX_POINTS
+WEBGL_THRESHOLD = 1000
+MAX_POINTS = 2000
+
+# Figures built in this process, most recently used last
+MEMO_SIZE = 256
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def chart(*columns):
+    """Register the input columns a figure builder reads; only they are fingerprinted."""
+    def register(builder):
+        builder.columns = list(columns)
+        return builder
+    return register
+
+
+def fingerprint(df, columns):
+    hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    return hashlib.sha1('\x1f'.join(columns).encode() + hashes.tobytes()).hexdigest()
+
+
+def cached_figure(cache, builder, df, **style):
+    """JSON text and layout height of ``builder(df, **style)``, rebuilt only when its inputs change.
+
+    The memo and the shared result cache hold serialized figures, so a hit
+    neither builds a Figure nor serializes one; app.py sends the text to
+    the browser as is.
+    """
+    key = cache_key('figure', fingerprint(df, builder.columns), chart=builder.__name__, **style)
+    with _memo_lock:
+        figure = _memo.get(key)
+        if figure is not None:
+            _memo.move_to_end(key)
+            profiling.annotate(figure='memo')
+            return figure
+    text = cache.get_json(key)
+    if text is None:
+        fig = builder(df, **style)
+        text, height = fig.to_json(), fig.layout.height
+        cache.put_json(key, text)
+        profiling.annotate(figure='built')
+    else:
+        height = json.loads(text)['layout'].get('height')
+        profiling.annotate(figure='cache')
+    figure = text, height
+    with _memo_lock:
+        _memo[key] = figure
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return figure
+
+
+def positions(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(float)
+    # Category labels are evenly spaced
+    return np.arange(len(x), dtype=float)
+
+
+def lttb(x, y, n):
+    """Indices of ``n`` points picked by largest-triangle-three-buckets.
+
+    The first and last points are kept; every bucket in between contributes
+    the point forming the largest triangle with the previous pick and the
+    mean of the next bucket. Only the loop over buckets is in Python.
+    """
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:size - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:size - 1], edges[:-1]) / counts
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+    picked = np.empty(n, dtype=np.int64)
+    picked[0], picked[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def min_max(y, n):
+    """Indices of the minimum and maximum of ``n // 2`` equal buckets, in order."""
+    size = len(y)
+    if n >= size:
+        return np.arange(size)
+    starts = np.linspace(0, size, n // 2 + 1).astype(np.int64)[:-1]
+    bucket = np.repeat(np.arange(len(starts)), np.diff(starts, append=size))
+    picked = []
+    for extreme in (np.fmin, np.fmax):
+        hits = np.flatnonzero(y == extreme.reduceat(y, starts)[bucket])
+        # First hit in each bucket
+        picked.append(hits[np.diff(bucket[hits], prepend=-1) > 0])
+    return np.unique(np.concatenate(picked))
+
+
+def time_series(x, y, bar=False, **kwargs):
+    """Scatter (or bar) trace for a time series of any length.
+
+    Past WEBGL_THRESHOLD points lines switch to Scattergl and are reduced
+    with LTTB, and bars keep each bucket's extremes, so the browser never
+    receives more than about MAX_POINTS per trace.
+    """
+    if len(y) <= WEBGL_THRESHOLD:
+        return (go.Bar if bar else go.Scatter)(x=x, y=y, **kwargs)
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    if bar:
+        keep = min_max(y, MAX_POINTS)
+        return go.Bar(x=x[keep], y=y[keep], **kwargs)
+    keep = lttb(positions(x), y, MAX_POINTS)
+    return go.Scattergl(x=x[keep], y=y[keep], **kwargs)
+
+
+@chart('Month', 'Employees', 'New Hires', 'Forecast', 'Lower', 'Upper')
+def headcount(headcount_trend, height=400):
+    fig = go.Figure()
+    fig.add_trace(time_series(
+        headcount_trend['Month'],
+        headcount_trend['Employees'],
+        mode='lines+markers',
+        name='Actual',
+        line=dict(color='#3b82f6', width=3),
+        marker=dict(size=8)
+    ))
+    # Forecast rows follow the actuals; the band is drawn upper first so the
+    # lower trace can fill up to it
+    future = headcount_trend[headcount_trend['Forecast'].notna()]
+    fig.add_trace(go.Scatter(
+        x=future['Month'],
+        y=future['Upper'],
+        mode='lines',
+        line=dict(width=0),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+    fig.add_trace(go.Scatter(
+        x=future['Month'],
+        y=future['Lower'],
+        mode='lines',
+        name='80% Interval',
+        line=dict(width=0),
+        fill='tonexty',
+        fillcolor='rgba(16, 185, 129, 0.2)'
+    ))
+    fig.add_trace(go.Scatter(
+        x=future['Month'],
+        y=future['Forecast'],
+        mode='lines+markers',
+        name='Forecast',
+        line=dict(color='#10b981', width=3, dash='dash'),
+        marker=dict(size=8)
+    ))
+    fig.add_trace(time_series(
+        headcount_trend['Month'],
+        headcount_trend['New Hires'],
+        bar=True,
+        name='New Hires',
+        marker_color='rgba(16, 185, 129, 0.5)',
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        height=height,
+        hovermode='x unified',
+        yaxis2=dict(overlaying='y', side='right'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Date', 'Employees', 'FTE')
+def daily_headcount(daily, height=400):
+    fig = go.Figure()
+    fig.add_trace(time_series(
+        daily['Date'],
+        daily['Employees'],
+        mode='lines',
+        name='Employees',
+        line=dict(color='#3b82f6', width=2)
+    ))
+    fig.add_trace(time_series(
+        daily['Date'],
+        daily['FTE'],
+        mode='lines',
+        name='FTE',
+        line=dict(color='#10b981', width=2, dash='dot')
+    ))
+    fig.update_layout(
+        height=height,
+        hovermode='x unified',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Department', 'Employee Count', 'Satisfaction')
+def department_metrics(department_data, height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=department_data['Department'],
+        y=department_data['Employee Count'],
+        name='Employees',
+        marker_color='#3b82f6'
+    ))
+    fig.add_trace(go.Scatter(
+        x=department_data['Department'],
+        y=department_data['Satisfaction'] * 20,
+        name='Satisfaction (scaled)',
+        mode='lines+markers',
+        marker=dict(size=10, color='#f59e0b'),
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        height=height,
+        yaxis2=dict(overlaying='y', side='right', title='Satisfaction'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Gender', 'Percentage')
+def gender_diversity(diversity_data):
+    fig = px.pie(
+        diversity_data,
+        values='Percentage',
+        names='Gender',
+        color='Gender',
+        color_discrete_map={'Male': '#3b82f6', 'Female': '#ec4899', 'Non-binary': '#8b5cf6'},
+        hole=0.4
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+
+@chart('Age Group', 'Count')
+def age_distribution(age_diversity):
+    fig = px.bar(age_diversity, x='Age Group', y='Count', color='Count', color_continuous_scale='Viridis')
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+@chart('Department', 'Current Quarter', 'Previous Quarter', 'Industry Avg')
+def turnover_comparison(turnover_data, height=350, current='Current Q', previous='Previous Q'):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name=current,
+        x=turnover_data['Department'],
+        y=turnover_data['Current Quarter'],
+        marker_color='#ef4444'
+    ))
+    fig.add_trace(go.Bar(
+        name=previous,
+        x=turnover_data['Department'],
+        y=turnover_data['Previous Quarter'],
+        marker_color='#fca5a5'
+    ))
+    fig.add_trace(go.Scatter(
+        name='Industry Avg',
+        x=turnover_data['Department'],
+        y=turnover_data['Industry Avg'],
+        mode='lines+markers',
+        marker=dict(size=10, color='#1f2937'),
+        line=dict(width=2, dash='dash')
+    ))
+    fig.update_layout(barmode='group', height=height)
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+@chart('Skill', 'Current', 'Required', 'Gap')
+def skills(skills_gap, height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Current Level',
+        x=skills_gap['Skill'],
+        y=skills_gap['Current'],
+        marker_color='#3b82f6'
+    ))
+    fig.add_trace(go.Bar(
+        name='Required Level',
+        x=skills_gap['Skill'],
+        y=skills_gap['Required'],
+        marker_color='#10b981'
+    ))
+    fig.add_trace(go.Scatter(
+        name='Gap',
+        x=skills_gap['Skill'],
+        y=skills_gap['Gap'],
+        mode='lines+markers',
+        marker=dict(size=12, color='#ef4444'),
+        line=dict(width=3),
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        barmode='group',
+        height=height,
+        yaxis2=dict(overlaying='y', side='right', title='Gap %'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Rating', 'Count', 'Previous')
+def performance(performance_data, height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Current Period',
+        x=performance_data['Rating'],
+        y=performance_data['Count'],
+        marker_color='#10b981'
+    ))
+    fig.add_trace(go.Bar(
+        name='Previous Period',
+        x=performance_data['Rating'],
+        y=performance_data['Previous'],
+        marker_color='#86efac'
+    ))
+    fig.update_layout(barmode='group', height=height)
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+
+@chart('Month', 'Overall', 'Recognition', 'Growth', 'Work-Life')
+def engagement(engagement_trend, height=400):
+    fig = go.Figure()
+    for col_name in ['Overall', 'Recognition', 'Growth', 'Work-Life']:
+        fig.add_trace(time_series(
+            engagement_trend['Month'],
+            engagement_trend[col_name],
+            mode='lines+markers',
+            name=col_name,
+            line=dict(width=3)
+        ))
+    fig.update_layout(height=height, yaxis_range=[0, 100])
+    return fig
+
+
+@chart('Dimension', 'Favorable', 'Neutral', 'Unfavorable')
+def favorability(favorability, height=400):
+    fig = go.Figure()
+    for column, color in [('Favorable', '#10b981'), ('Neutral', '#d1d5db'), ('Unfavorable', '#ef4444')]:
+        fig.add_trace(go.Bar(
+            y=favorability['Dimension'],
+            x=favorability[column],
+            name=column,
+            orientation='h',
+            marker_color=color,
+            text=favorability[column].map('{:.0f}%'.format),
+            textposition='inside'
+        ))
+    fig.update_layout(
+        height=height,
+        barmode='stack',
+        xaxis=dict(title='% of answers', range=[0, 100]),
+        yaxis=dict(autorange='reversed'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Month', 'Promoters', 'Passives', 'Detractors', 'eNPS')
+def net_promoter(net_promoter, height=400):
+    fig = go.Figure()
+    for column, color in [('Promoters', '#10b981'), ('Passives', '#d1d5db'), ('Detractors', '#ef4444')]:
+        fig.add_trace(go.Bar(
+            x=net_promoter['Month'],
+            y=net_promoter[column],
+            name=column,
+            marker_color=color
+        ))
+    fig.add_trace(go.Scatter(
+        x=net_promoter['Month'],
+        y=net_promoter['eNPS'],
+        name='eNPS',
+        mode='lines+markers+text',
+        text=net_promoter['eNPS'].map('{:+.0f}'.format),
+        textposition='top center',
+        line=dict(color='#1f2937', width=3),
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        height=height,
+        barmode='stack',
+        yaxis=dict(title='% of answers', range=[0, 100]),
+        yaxis2=dict(title='eNPS', overlaying='y', side='right', range=[-100, 100]),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Department', 'Respondents', 'Response Rate', 'Reported')
+def response_rate(response_rate, height=400):
+    fig = go.Figure(go.Bar(
+        x=response_rate['Department'],
+        y=response_rate['Response Rate'],
+        marker_color=np.where(response_rate['Reported'], '#3b82f6', '#9ca3af'),
+        text=response_rate['Response Rate'].map('{:.0f}%'.format),
+        textposition='outside',
+        customdata=np.column_stack([response_rate['Respondents'],
+                                    np.where(response_rate['Reported'], 'shown', 'suppressed')]),
+        hovertemplate='%{x}<br>%{y:.1f}% responded (%{customdata[0]})<br>Results %{customdata[1]}<extra></extra>'
+    ))
+    fig.update_layout(height=height, yaxis=dict(title='Response rate %', range=[0, 110]))
+    return fig
+
+
+@chart('Stage', 'Count')
+def funnel(recruitment_funnel, height=400):
+    fig = go.Figure(go.Funnel(
+        y=recruitment_funnel['Stage'],
+        x=recruitment_funnel['Count'],
+        textposition="inside",
+        textinfo="value+percent initial",
+        marker=dict(color=["#3b82f6", "#60a5fa", "#93c5fd", "#bfdbfe", "#dbeafe"])
+    ))
+    fig.update_layout(height=height)
+    return fig
+
+
+@chart('Month', 'Applications', 'Hires')
+def recruitment_trends(recruitment_metrics, height=400):
+    fig = go.Figure()
+    fig.add_trace(time_series(
+        recruitment_metrics['Month'],
+        recruitment_metrics['Applications'],
+        mode='lines+markers',
+        name='Applications',
+        line=dict(color='#3b82f6', width=3),
+        yaxis='y'
+    ))
+    fig.add_trace(time_series(
+        recruitment_metrics['Month'],
+        recruitment_metrics['Hires'],
+        bar=True,
+        name='Hires',
+        marker_color='#10b981',
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        height=height,
+        yaxis=dict(title='Applications'),
+        yaxis2=dict(title='Hires', overlaying='y', side='right'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Stage', 'Median Days', 'P90 Days')
+def stage_timing(stage_timing, height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        y=stage_timing['Stage'],
+        x=stage_timing['Median Days'],
+        orientation='h',
+        name='Median',
+        marker_color='#3b82f6'
+    ))
+    fig.add_trace(go.Bar(
+        y=stage_timing['Stage'],
+        x=stage_timing['P90 Days'],
+        orientation='h',
+        name='90th percentile',
+        marker_color='#bfdbfe'
+    ))
+    fig.update_layout(
+        height=height,
+        barmode='group',
+        xaxis=dict(title='Days in stage'),
+        yaxis=dict(autorange='reversed'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Source', 'Applications', 'Hires', 'Yield')
+def source_yield(source_yield, height=400):
+    fig = go.Figure(go.Bar(
+        x=source_yield['Source'],
+        y=source_yield['Hires'],
+        marker_color='#10b981',
+        text=source_yield['Yield'].map('{:.1f}%'.format),
+        textposition='outside',
+        customdata=source_yield['Applications'],
+        hovertemplate='%{x}<br>%{y} hires from %{customdata} applications<br>%{text} hired<extra></extra>'
+    ))
+    fig.update_layout(height=height, yaxis=dict(title='Hires'))
+    return fig
+
+
+@chart('Quarter', 'Avg Salary', 'Market Rate')
+def salary_vs_market(compensation_trend, height=400):
+    fig = go.Figure()
+    fig.add_trace(time_series(
+        compensation_trend['Quarter'],
+        compensation_trend['Avg Salary'],
+        mode='lines+markers',
+        name='Company Avg',
+        line=dict(color='#3b82f6', width=3),
+        marker=dict(size=10)
+    ))
+    fig.add_trace(time_series(
+        compensation_trend['Quarter'],
+        compensation_trend['Market Rate'],
+        mode='lines+markers',
+        name='Market Rate',
+        line=dict(color='#ef4444', width=3, dash='dash'),
+        marker=dict(size=10)
+    ))
+    fig.update_layout(height=height)
+    return fig
+
+
+@chart('Department', 'Avg Salary')
+def salary_by_department(department_data, height=400):
+    fig = px.bar(
+        department_data.sort_values('Avg Salary', ascending=True),
+        y='Department',
+        x='Avg Salary',
+        orientation='h',
+        color='Avg Salary',
+        color_continuous_scale='YlOrRd',
+        text='Avg Salary'
+    )
+    fig.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
+    fig.update_layout(height=height, showlegend=False)
+    return fig
+
+
+@chart('Category', 'Count')
+def turnover_breakdown(turnover_breakdown, height=400):
+    fig = px.pie(
+        turnover_breakdown,
+        values='Count',
+        names='Category',
+        hole=0.4,
+        color_discrete_sequence=px.colors.sequential.RdBu
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(height=height)
+    return fig
+
+
+@chart('Reason', 'Count')
+def turnover_reasons(turnover_reasons, height=400):
+    fig = px.bar(
+        turnover_reasons.sort_values('Count', ascending=True),
+        y='Reason',
+        x='Count',
+        orientation='h',
+        color='Count',
+        color_continuous_scale='Reds',
+        text='Count'
+    )
+    fig.update_traces(textposition='outside')
+    fig.update_layout(height=height, showlegend=False)
+    return fig
+
+
+@chart('Tenure Range', 'Employees', 'Turnover Rate')
+def tenure_turnover(tenure_analysis, height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=tenure_analysis['Tenure Range'],
+        y=tenure_analysis['Employees'],
+        name='Employee Count',
+        marker_color='#3b82f6',
+        yaxis='y'
+    ))
+    fig.add_trace(go.Scatter(
+        x=tenure_analysis['Tenure Range'],
+        y=tenure_analysis['Turnover Rate'],
+        name='Turnover Rate %',
+        mode='lines+markers',
+        marker=dict(size=10, color='#ef4444'),
+        line=dict(width=3),
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        height=height,
+        yaxis=dict(title='Employees'),
+        yaxis2=dict(title='Turnover Rate %', overlaying='y', side='right'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Department', 'Headcount', 'Projected Headcount', 'Lower', 'Upper')
+def department_forecast(department_forecast, height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Current',
+        x=department_forecast['Department'],
+        y=department_forecast['Headcount'],
+        marker_color='#3b82f6'
+    ))
+    fig.add_trace(go.Bar(
+        name='Projected (12 mo)',
+        x=department_forecast['Department'],
+        y=department_forecast['Projected Headcount'],
+        marker_color='#10b981',
+        error_y=dict(
+            type='data',
+            symmetric=False,
+            array=department_forecast['Upper'] - department_forecast['Projected Headcount'],
+            arrayminus=department_forecast['Projected Headcount'] - department_forecast['Lower']
+        )
+    ))
+    fig.update_layout(
+        barmode='group',
+        height=height,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Unit', 'Headcount', 'Terminations', 'Turnover Rate', 'Satisfaction')
+def org_units(org_data, value='Headcount', line='Satisfaction', height=400):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=org_data['Unit'],
+        y=org_data[value],
+        name=value,
+        marker_color='#3b82f6'
+    ))
+    fig.add_trace(go.Scatter(
+        x=org_data['Unit'],
+        y=org_data[line],
+        name=line,
+        mode='lines+markers',
+        marker=dict(size=8, color='#f59e0b'),
+        yaxis='y2'
+    ))
+    fig.update_layout(
+        height=height,
+        yaxis=dict(title=value),
+        yaxis2=dict(title=line, overlaying='y', side='right'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Department', 'Risk Level', 'Employees')
+def risk_distribution(risk_distribution, height=400):
+    colors = {'Low': '#10b981', 'Medium': '#f59e0b', 'High': '#f97316', 'Critical': '#ef4444'}
+    fig = go.Figure()
+    for level, color in colors.items():
+        rows = risk_distribution[risk_distribution['Risk Level'] == level]
+        fig.add_trace(go.Bar(
+            name=level,
+            x=rows['Department'],
+            y=rows['Employees'],
+            marker_color=color
+        ))
+    fig.update_layout(
+        barmode='stack',
+        height=height,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Group', 'Gender', 'P10', 'P25', 'P50', 'P75', 'P90')
+def pay_percentiles(pay_data, height=400):
+    # Whiskers at P10/P90, box at P25-P75; no raw salaries reach the browser
+    colors = ['#3b82f6', '#ec4899', '#10b981', '#f59e0b', '#8b5cf6']
+    fig = go.Figure()
+    for k, (gender, rows) in enumerate(pay_data.groupby('Gender', sort=False)):
+        fig.add_trace(go.Box(
+            name=str(gender),
+            x=rows['Group'],
+            lowerfence=rows['P10'],
+            q1=rows['P25'],
+            median=rows['P50'],
+            q3=rows['P75'],
+            upperfence=rows['P90'],
+            marker_color=colors[k % len(colors)]
+        ))
+    fig.update_layout(
+        boxmode='group',
+        height=height,
+        yaxis_title='Salary ($)',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Level', 'Gender', 'Compa-Ratio')
+def compa_ratio(compa_data, height=400):
+    colors = ['#3b82f6', '#ec4899', '#10b981', '#f59e0b', '#8b5cf6']
+    fig = go.Figure()
+    for k, (gender, rows) in enumerate(compa_data.groupby('Gender', sort=False)):
+        fig.add_trace(go.Bar(
+            name=str(gender),
+            x=rows['Level'],
+            y=rows['Compa-Ratio'],
+            marker_color=colors[k % len(colors)]
+        ))
+    fig.add_hline(y=1, line_dash='dash', line_color='#6b7280')
+    fig.update_layout(
+        barmode='group',
+        height=height,
+        yaxis_title='Median salary / band midpoint',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Group', 'Months', 'Retention')
+def survival_curves(survival_data, height=400):
+    fig = go.Figure()
+    for group, rows in survival_data.groupby('Group', sort=False):
+        fig.add_trace(go.Scatter(
+            x=rows['Months'],
+            y=rows['Retention'],
+            name=str(group),
+            mode='lines',
+            line=dict(shape='hv', width=2)
+        ))
+    fig.update_layout(
+        height=height,
+        xaxis_title='Months since hire',
+        yaxis=dict(title='Still employed (%)', range=[0, 100]),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+@chart('Cohort', 'Months', 'Retention')
+def retention_heatmap(retention_data, height=400):
+    # Rows in hire order, newest at the bottom
+    matrix = retention_data.pivot(index='Cohort', columns='Months', values='Retention') \
+        .reindex(retention_data['Cohort'].unique())
+    fig = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=matrix.columns,
+        y=matrix.index,
+        zmin=0,
+        zmax=100,
+        colorscale='RdYlGn',
+        colorbar=dict(title='%'),
+        hovertemplate='%{y}, month %{x}: %{z:.1f}%<extra></extra>'
+    ))
+    fig.update_layout(
+        height=height,
+        xaxis_title='Months since hire',
+        yaxis=dict(autorange='reversed')
+    )
+    return fig
+
+
+def annotate(text, points):
+    """Figure JSON ``text`` with ``points`` (X, Y, Text) marked and labelled; not memoized."""
+    fig = pio.from_json(text)
+    fig.add_trace(go.Scatter(
+        x=points['X'],
+        y=points['Y'],
+        mode='markers',
+        name='Anomaly',
+        marker=dict(color='#ef4444', size=13, symbol='circle-open', line=dict(width=3)),
+        hovertext=points['Text'].str.split('\n', n=1).str[-1].str.replace('\n', '<br>'),
+        hovertemplate='%{hovertext}<extra></extra>'
+    ))
+    for x, y, label in zip(points['X'], points['Y'], points['Text']):
+        fig.add_annotation(x=x, y=y, text=label.split('\n')[0], showarrow=True, arrowhead=2, arrowcolor='#ef4444',
+                           ax=0, ay=-40, font=dict(size=11, color='#b91c1c'), bgcolor='rgba(255, 255, 255, 0.8)')
+    return fig.to_json()
+
+
+def waterfall(spans, height=None):
+    """Profile spans (Profiler.frame()) as a waterfall; not memoized."""
+    labels = ['\u2003' * depth + name for depth, name in zip(spans['Depth'], spans['Span'])]
+    # One row per span, even when names repeat
+    rows = np.arange(len(spans))
+    fig = go.Figure(go.Bar(
+        y=rows,
+        x=spans['Duration ms'],
+        base=spans['Start ms'],
+        orientation='h',
+        marker_color=np.where(spans['Depth'] == 0, '#667eea', '#a5b4fc'),
+        hovertext=[f'{name}<br>{ms:.1f} ms<br>{attrs or ""}' for name, ms, attrs
+                   in zip(spans['Span'], spans['Duration ms'], spans['Attributes'])],
+        hovertemplate='%{hovertext}<extra></extra>'
+    ))
+    fig.update_layout(
+        height=height or max(300, 22 * len(spans)),
+        xaxis_title='ms since rerun start',
+        yaxis=dict(autorange='reversed', tickvals=rows, ticktext=labels),
+        margin=dict(l=10, r=10, t=10, b=10)
+    )
+    return fig
@@ -0,0 +1,129 @@
+from itertools import product
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from aggregation import month_start
+
+HORIZON = 12
+SEASON = 12
+# Smoothing weights tried for every series at once; each series keeps the
+# combination with the lowest one-step-ahead squared error
+GRID = np.array(list(product([0.2, 0.5, 0.8], [0.05, 0.2], [0.05, 0.3])))
+
+
+def holt_winters(y, horizon=HORIZON, season=SEASON, level=0.8):
+    """Additive Holt-Winters forecasts for every row of ``y`` in one pass.
+
+    ``y`` is (series, months). The recursion steps through time once with
+    all series and all GRID weights as array axes, so cost grows with the
+    history length rather than the number of series. With fewer than two
+    seasons of history the seasonal term is dropped (Holt's linear trend).
+    Returns forecast, lower and upper bounds, each (series, horizon), the
+    bounds covering ``level`` of the one-step error distribution carried
+    forward with the usual Holt-Winters variance multipliers.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n, length = y.shape
+    seasonal = length >= 2 * season
+    period = season if seasonal else 1
+    alpha, beta, gamma = (GRID[:, i, None] for i in range(3))
+    if not seasonal:
+        gamma = np.zeros_like(gamma)
+
+    if seasonal:
+        first, second = y[:, :season].mean(axis=1), y[:, season:2 * season].mean(axis=1)
+        slope = (second - first) / season
+        # Seasonal indices are deviations from the first season's trend line,
+        # and the level starts on that line at the season's last month
+        line = first[:, None] + slope[:, None] * (np.arange(season) - (season - 1) / 2)
+        lvl = np.broadcast_to(line[:, -1], (len(GRID), n)).copy()
+        trend = np.broadcast_to(slope, (len(GRID), n)).copy()
+        seas = np.broadcast_to(y[:, :season] - line, (len(GRID), n, season)).copy()
+        start = season
+    else:
+        lvl = np.broadcast_to(y[:, 0], (len(GRID), n)).copy()
+        trend = np.broadcast_to(y[:, min(1, length - 1)] - y[:, 0], (len(GRID), n)).copy()
+        seas = np.zeros((len(GRID), n, 1))
+        start = 1
+
+    sse = np.zeros((len(GRID), n))
+    for t in range(start, length):
+        s = seas[:, :, t % period]
+        error = y[:, t] - (lvl + trend + s)
+        sse += error ** 2
+        previous = lvl
+        lvl = alpha * (y[:, t] - s) + (1 - alpha) * (lvl + trend)
+        trend = beta * (lvl - previous) + (1 - beta) * trend
+        seas[:, :, t % period] = gamma * (y[:, t] - lvl) + (1 - gamma) * s
+
+    best = np.argmin(sse, axis=0)
+    pick = (best, np.arange(n))
+    lvl, trend, seas = lvl[pick], trend[pick], seas[pick]
+    a, b = GRID[best, 0], GRID[best, 1]
+    g = GRID[best, 2] if seasonal else np.zeros(n)
+    sigma = np.sqrt(sse[pick] / max(length - start, 1))
+
+    h = np.arange(1, horizon + 1)
+    forecast = lvl[:, None] + h * trend[:, None] + seas[:, (length - 1 + h) % period]
+    # Var(h) = sigma^2 * (1 + sum_{j<h} (a * (1 + j b) + g [j % season == 0])^2)
+    j = np.arange(1, horizon)
+    weights = a[:, None] * (1 + j * b[:, None]) + g[:, None] * (j % season == 0)
+    spread = sigma[:, None] * np.sqrt(1 + np.concatenate([np.zeros((n, 1)), np.cumsum(weights ** 2, axis=1)], axis=1))
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    return forecast, forecast - z * spread, forecast + z * spread
+
+
+def forecast_tables(summary, departments=None, end=None, horizon=HORIZON, level=0.8):
+    """Headcount, hire and termination projections for a department selection.
+
+    Department series and the selection total are fitted in one batch from
+    the first active month up to ``end``. Returns ``headcount_forecast``
+    (the total by future month) and ``department_forecast`` (one row per
+    department), or None if there is no data.
+    """
+    codes = summary.department_codes(departments)
+    last = summary.n_months - 1 if end is None else summary.month_position(end)
+    headcount = summary.headcount[codes, :last + 1]
+    hires = summary.hires[codes, :last + 1]
+    leavers = summary.leavers[codes, :last + 1]
+    active = np.flatnonzero(headcount.sum(axis=0) + leavers.sum(axis=0))
+    if not len(active):
+        return None
+    history = slice(int(active[0]), last + 1)
+    series = [cells[:, history] for cells in (headcount, hires, leavers)]
+    batch = np.concatenate([np.vstack([cells, cells.sum(axis=0)]) for cells in series])
+    forecast, lower, upper = (np.clip(values, 0, None) for values in holt_winters(batch, horizon, level=level))
+    # Rows are [departments..., total] for headcount, then hires, then leavers
+    rows = len(headcount) + 1
+    total = rows - 1
+
+    months = month_start(np.arange(1, horizon + 1) + summary.first_month + last)
+    headcount_forecast = pd.DataFrame({
+        'Month': pd.PeriodIndex(months, freq='M').strftime('%b %Y'),
+        'Forecast': forecast[total].round(0),
+        'Lower': lower[total].round(0),
+        'Upper': upper[total].round(0),
+        'Forecast Hires': forecast[rows + total].round(0),
+        'Forecast Terminations': forecast[2 * rows + total].round(0),
+    })
+
+    present = headcount[:, -1] > 0
+    department_forecast = pd.DataFrame({
+        'Department': summary.departments[codes],
+        'Headcount': headcount[:, -1],
+        'Projected Headcount': forecast[:total, -1].round(0),
+        'Lower': lower[:total, -1].round(0),
+        'Upper': upper[:total, -1].round(0),
+        'Projected Hires': forecast[rows:rows + total].sum(axis=1).round(0),
+        'Projected Terminations': forecast[2 * rows:2 * rows + total].sum(axis=1).round(0),
+    })[present].reset_index(drop=True)
+    return headcount_forecast, department_forecast
+
+
+def with_forecast(headcount_trend, headcount_forecast):
+    """``headcount_trend`` followed by the forecast months, joined at the last actual."""
+    trend = headcount_trend.assign(Forecast=np.nan, Lower=np.nan, Upper=np.nan)
+    trend.loc[trend.index[-1], ['Forecast', 'Lower', 'Upper']] = trend['Employees'].iloc[-1]
+    return pd.concat([trend, headcount_forecast[['Month', 'Forecast', 'Lower', 'Upper']]], ignore_index=True)
@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import month_ordinal, month_start, place_teams
+
+# End day of segments still open
+OPEN = np.iinfo(np.int64).max
+# Order of same-day events: a hire, then changes, then a termination, which
+# closes a spell begun that day as build_snapshot() does. Carried-over
+# segments sort first.
+CARRIED, HIRE, CHANGE, EXIT = range(4)
+MEMBER_COLUMNS = ['employee_id', 'department', 'team', 'fte', 'since']
+
+
+def to_days(values):
+    # Dates -> integer days since 1970-01-01
+    return pd.to_datetime(values).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+class EmploymentHistory:
+    """Effective-dated employment segments, queried as of any date.
+
+    A segment is a run of days an employee spent in one department and
+    team at one FTE: hires open one, transfers and FTE changes split it and
+    terminations close it. Days count at their close, so a hire is on staff
+    from their hire date, a transfer moves them on its date and a
+    termination takes them off on its date. Queries sort the segments'
+    start and end days once per department; the headcount on a day is the
+    number of starts on or before it less the number of ends, one
+    searchsorted per array, so q dates over n segments cost O((n + q) log n)
+    rather than a scan of every segment per date.
+    """
+
+    def __init__(self):
+        self.departments = pd.Index([], dtype=object)
+        self.teams = pd.Index([], dtype=object)
+        self.employee = np.zeros(0, dtype=np.int64)
+        self.start = np.zeros(0, dtype=np.int64)
+        self.end = np.zeros(0, dtype=np.int64)
+        self.department = np.zeros(0, dtype=np.int32)
+        self.team = np.zeros(0, dtype=np.int32)
+        self.fte = np.zeros(0, dtype=np.float32)
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.employee)
+
+    def add(self, events):
+        """Apply a DataFrame of HRIS events (EVENT_COLUMNS).
+
+        The open segment of every employee in the batch is re-read with the
+        new events after it, so events are expected in date order across
+        batches; one dated before an employee's open segment began is
+        ignored.
+        """
+        events = events[events['employee_id'].notna().to_numpy()]
+        if not len(events):
+            return
+        kind = events['event_type'].astype(object).to_numpy()
+        rank = np.where(kind == 'hire', HIRE, np.where(kind == 'termination', EXIT, CHANGE))
+        fte = events['fte'].to_numpy(np.float64, na_value=np.nan) if 'fte' in events else np.full(len(events), np.nan)
+        new = {
+            'employee': events['employee_id'].to_numpy(np.int64),
+            'day': to_days(events['event_date']),
+            'rank': rank,
+            'department': self._codes('departments', events['department']),
+            'team': self._codes('teams', place_teams(events)),
+            'fte': fte,
+        }
+        carried = np.flatnonzero((self.end == OPEN) & np.isin(self.employee, new['employee']))
+        prior = {
+            'employee': self.employee[carried], 'day': self.start[carried], 'rank': np.full(len(carried), CARRIED),
+            'department': self.department[carried], 'team': self.team[carried],
+            'fte': self.fte[carried].astype(np.float64),
+        }
+        rows = {name: np.concatenate([prior[name], new[name]]) for name in new}
+        order = np.lexsort((rows['rank'], rows['day'], rows['employee']))
+        rows = {name: values[order] for name, values in rows.items()}
+        employee, day, rank = rows['employee'], rows['day'], rows['rank']
+        first = np.ones(len(employee), dtype=bool)
+        first[1:] = employee[1:] != employee[:-1]
+        positions = np.arange(len(employee))
+
+        def carry(known):
+            # Each row's position of the latest row at or before it, within
+            # the employee, where ``known`` holds
+            return np.maximum.accumulate(np.where(known | first, positions, 0))
+
+        # An event missing a field leaves it as it was
+        department = rows['department'][carry(rows['department'] >= 0)]
+        team = rows['team'][carry(rows['team'] >= 0)]
+        fte = rows['fte'][carry(~np.isnan(rows['fte']))]
+        fte = np.where(np.isnan(fte), 1.0, fte)
+        # Employed after a hire (or carried segment) until a termination
+        employed = np.where(rank == EXIT, False, rank != CHANGE)[carry(rank != CHANGE)]
+
+        before = np.roll(employed, 1) & ~first
+        changed = ((department != np.roll(department, 1)) | (team != np.roll(team, 1))
+                   | (fte != np.roll(fte, 1))) & ~first
+        opens = employed & (~before | changed)
+        closes = before & (~employed | opens)
+
+        starts, stops = np.flatnonzero(opens), np.flatnonzero(closes)
+        after = np.searchsorted(stops, starts, side='right')
+        stop = stops[np.minimum(after, max(len(stops) - 1, 0))] if len(stops) else starts
+        closed = (after < len(stops)) & (employee[stop] == employee[starts])
+        end = np.where(closed, day[stop], OPEN)
+        keep = end > day[starts]
+        starts, end = starts[keep], end[keep]
+
+        retained = np.ones(len(self.employee), dtype=bool)
+        retained[carried] = False
+        self.employee = np.concatenate([self.employee[retained], employee[starts]])
+        self.start = np.concatenate([self.start[retained], day[starts]])
+        self.end = np.concatenate([self.end[retained], end])
+        self.department = np.concatenate([self.department[retained], department[starts].astype(np.int32)])
+        self.team = np.concatenate([self.team[retained], team[starts].astype(np.int32)])
+        self.fte = np.concatenate([self.fte[retained], fte[starts].astype(np.float32)])
+        self._sorted = None
+
+    def _codes(self, name, values):
+        # Codes into the departments or teams index, growing it; -1 for null
+        values = pd.Series(values).astype(object).to_numpy()
+        known = pd.notna(values)
+        index = getattr(self, name)
+        index = index.append(pd.Index(pd.unique(values[known])).difference(index).astype(object))
+        setattr(self, name, index)
+        codes = np.full(len(values), -1, dtype=np.int64)
+        codes[known] = index.get_indexer(values[known])
+        return codes
+
+    def _index(self):
+        # Segment starts and ends sorted within each department, the
+        # cumulative FTE along both, and where each department's run begins
+        if self._sorted is None:
+            by_start = np.lexsort((self.start, self.department))
+            by_end = np.lexsort((self.end, self.department))
+            bounds = np.searchsorted(self.department[by_start], np.arange(len(self.departments) + 1))
+            self._sorted = {
+                'by_start': by_start,
+                'start': self.start[by_start],
+                'end': self.end[by_end],
+                'start_fte': np.concatenate([[0.0], np.cumsum(self.fte[by_start], dtype=np.float64)]),
+                'end_fte': np.concatenate([[0.0], np.cumsum(self.fte[by_end], dtype=np.float64)]),
+                'bounds': bounds,
+            }
+        return self._sorted
+
+    def department_codes(self, departments=None):
+        if departments is None:
+            return np.arange(len(self.departments))
+        codes = self.departments.get_indexer(list(departments))
+        return codes[codes >= 0]
+
+    def headcount(self, dates, departments=None):
+        """Headcount and FTE at the close of each of ``dates``, one row per date and column per department.
+
+        Columns follow ``department_codes(departments)``.
+        """
+        days = to_days(np.atleast_1d(dates))
+        index = self._index()
+        codes = self.department_codes(departments)
+        heads = np.zeros((len(days), len(codes)), dtype=np.int64)
+        fte = np.zeros((len(days), len(codes)))
+        for k, code in enumerate(codes):
+            lo, hi = index['bounds'][code], index['bounds'][code + 1]
+            started = lo + np.searchsorted(index['start'][lo:hi], days, side='right')
+            ended = lo + np.searchsorted(index['end'][lo:hi], days, side='right')
+            heads[:, k] = started - ended
+            fte[:, k] = (index['start_fte'][started] - index['start_fte'][lo]) \
+                - (index['end_fte'][ended] - index['end_fte'][lo])
+        return heads, fte
+
+    def members(self, date, departments=None):
+        """Who was on staff at the close of ``date``: department, team, FTE and the day the segment began."""
+        day = to_days([date])[0]
+        index = self._index()
+        rows = []
+        for code in self.department_codes(departments):
+            lo, hi = index['bounds'][code], index['bounds'][code + 1]
+            # Segments begun by then are a prefix of the start order
+            begun = index['by_start'][lo:lo + np.searchsorted(index['start'][lo:hi], day, side='right')]
+            rows.append(begun[self.end[begun] > day])
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        return pd.DataFrame({
+            'employee_id': self.employee[rows],
+            'department': self.departments.to_numpy()[self.department[rows]],
+            'team': np.where(self.team[rows] >= 0, self.teams.to_numpy()[np.maximum(self.team[rows], 0)], None),
+            'fte': self.fte[rows],
+            'since': self.start[rows].astype('datetime64[D]'),
+        }, columns=MEMBER_COLUMNS).sort_values('employee_id', kind='stable').reset_index(drop=True)
+
+
+def history_from_events(events):
+    history = EmploymentHistory()
+    history.add(events)
+    return history
+
+
+def history_from_snapshot(snapshot):
+    """Segments of everyone in an employee-month snapshot, to the month.
+
+    A snapshot has hire dates only through tenure and no other dates, so
+    segments begin on the hire date or the first of their month and end
+    on the last day of the final month, matching its month-end headcount.
+    """
+    rows = snapshot.sort_values(['employee_id', 'month'], kind='stable')
+    employee = rows['employee_id'].to_numpy(np.int64)
+    month = month_ordinal(rows['month'])
+    department = rows['department'].astype(object).to_numpy()
+    team = rows['team'].astype(object).to_numpy() if 'team' in rows else department
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (employee[1:] != employee[:-1]) | (month[1:] != month[:-1] + 1) \
+        | (department[1:] != department[:-1]) | (team[1:] != team[:-1])
+    starts = np.flatnonzero(first)
+    stops = np.append(starts[1:] - 1, len(rows) - 1)
+    month_end = (month_start(month + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')).astype(np.int64)
+    hired = rows['hired'].to_numpy()[starts]
+    tenure_days = np.round(rows['tenure'].to_numpy(np.float64)[starts] * 365.25).astype(np.int64)
+    begin = np.where(hired, month_end[starts] - tenure_days,
+                     month_start(month[starts]).astype('datetime64[D]').astype(np.int64))
+    # Leavers go at the close of their last month's final day; a change of
+    # department or team takes effect on the first of the next month
+    final = np.append(employee[1:] != employee[:-1], True)[stops]
+    end = np.where(rows['terminated'].to_numpy()[stops], month_end[stops],
+                   np.where(final & (month[stops] == month.max()), OPEN, month_end[stops] + 1))
+    history = EmploymentHistory()
+    history.departments = pd.Index(pd.unique(department), dtype=object)
+    history.teams = pd.Index(pd.unique(team), dtype=object)
+    history.employee = employee[starts]
+    history.start = np.minimum(begin, month_end[starts])
+    history.end = end
+    history.department = history.departments.get_indexer(department[starts]).astype(np.int32)
+    history.team = history.teams.get_indexer(team[starts]).astype(np.int32)
+    history.fte = np.ones(len(starts), dtype=np.float32)
+    return history
+
+
+def headcount_series(history, departments=None, start=None, end=None):
+    """Daily headcount and FTE of the selected departments from ``start`` to ``end`` (Date, Employees, FTE)."""
+    days = np.arange(np.datetime64(pd.Timestamp(start).date(), 'D'), np.datetime64(pd.Timestamp(end).date(), 'D')
+                     + np.timedelta64(1, 'D'))
+    heads, fte = history.headcount(days, departments)
+    return pd.DataFrame({'Date': days.astype('datetime64[ns]'), 'Employees': heads.sum(axis=1),
+                         'FTE': fte.sum(axis=1).round(1)})
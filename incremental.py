@@ -0,0 +1,449 @@
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from aggregation import (EVENT_COLUMNS, TERM_CATEGORIES, Summary, build_snapshot, load_reference, month_ordinal,
+                         month_start, place_teams)
+from anomalies import AnomalyDetector
+from cohorts import spells_from_events, spells_from_snapshot, update_spells
+from history import history_from_events, history_from_snapshot
+from orgchart import OrgCube, divisions_from
+from payequity import PaySketch
+from recruiting import FunnelSummary
+from store import EventStore, changed_files
+from surveys import SurveySummary
+from synthetic import synthetic_applications, synthetic_responses, synthetic_snapshot
+
+STATE_FILE = 'summary.pkl'
+# Refreshes appended to the journal before the whole state is pickled again
+SNAPSHOT_EVERY = 64
+AREAS = ['events', 'responses', 'applications']
+CATEGORY_COLUMNS = ['department', 'team', 'level', 'gender', 'term_category', 'term_reason']
+ROW_COLUMNS = ['month', 'department', 'team', 'level', 'gender', 'age', 'tenure', 'salary', 'rating',
+               'satisfaction', 'hired', 'terminated', 'term_category', 'term_reason', 'hire_date', 'birth_date']
+DAYS_PER_YEAR = 365.25
+
+
+class IncrementalSummary:
+    """A Summary kept current by folding in only newly ingested events.
+
+    Alongside the per-(department, month) sums it keeps each employee's row
+    for the latest month. A batch of events retracts the old rows of the
+    employees it touches, applies the events and adds the new rows back, so
+    a refresh costs time proportional to the batch rather than the history.
+    Moving into a new month carries every employee forward once.
+    """
+
+    def __init__(self, snapshot, store=None, files=(), version=None, divisions=None, spells=None, history=None):
+        self.summary = Summary(snapshot)
+        # The same rows rolled up the org tree (see orgchart.py)
+        self.cube = OrgCube(snapshot, divisions)
+        # Hire-to-exit spells for the cohort survival estimates (see cohorts.py)
+        self.spells = spells_from_snapshot(snapshot) if spells is None else spells
+        # Effective-dated department and team segments for as-of queries (see history.py)
+        self.history = history_from_snapshot(snapshot) if history is None else history
+        # Salary sketches for the pay-equity tables (see payequity.py)
+        self.pay = PaySketch(snapshot)
+        # Control limits per org unit and metric, fed as months close (see anomalies.py)
+        self.anomalies = AnomalyDetector(self.cube)
+        # Engagement survey answer counts, fed from their own response files (see surveys.py)
+        self.surveys = SurveySummary()
+        self.survey_files = set()
+        # Recruiting funnel cells, fed from ATS event files (see recruiting.py)
+        self.funnel = FunnelSummary()
+        self.application_files = set()
+        latest = snapshot['month'] == snapshot['month'].max()
+        self.current = with_dates(snapshot.loc[latest]).set_index('employee_id')[ROW_COLUMNS]
+        # Rows changed since ``current`` was last consolidated; they win over
+        # ``current`` and keep each batch from copying the whole population
+        self.recent = self.current.iloc[0:0]
+        self.month = month_ordinal([snapshot['month'].max()])[0]
+        self.files = set(files)
+        self.version = version or next_version('', self.files)
+        # Partition directories of each store area as last listed (see store.changed_files)
+        self.listings = {area: {} for area in AREAS}
+        # Refreshes since the last pickle are lines of summary-<journal>.journal
+        self.journal = uuid.uuid4().hex
+        self.journaled = 0
+        # Token of the store's last compaction; a new one means its part files were renamed
+        self.compacted = store.compacted() if store is not None else ''
+        self.store = store
+        self.checked = time.monotonic()
+        self.lock = threading.RLock()
+        # Bumped by every change to the latest-month rows; see changed_since()
+        self.generation = 0
+        self.rebased = 0
+        self.changes = []
+
+    @classmethod
+    def open(cls, store, divisions=None):
+        if store.legacy_layout():
+            store.compact(min_files=None)
+        path = os.path.join(store.root, 'state', STATE_FILE)
+        state = None
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            # States saved before a Summary field, one of the rollups below or the row dates existed are
+            # rebuilt, as are states of files since compacted
+            if not all(hasattr(state.summary, name) for name in Summary.COUNTS + Summary.SUMS) \
+                    or not all(hasattr(state, name)
+                               for name in ('cube', 'spells', 'pay', 'anomalies', 'surveys', 'funnel', 'history',
+                                            'listings', 'compacted')) \
+                    or 'hire_date' not in state.current or state.compacted != store.compacted():
+                state = None
+        if state is not None:
+            state.store = store
+            if divisions is not None:
+                state.cube.set_divisions(divisions)
+            state.replay()
+            state.refresh()
+        else:
+            state = cls.build(store, divisions)
+            state.save()
+        return state
+
+    @classmethod
+    def build(cls, store, divisions=None):
+        """A state built from every file in ``store``."""
+        listing = {}
+        files = changed_files(store.events_path, listing)
+        events = store.read_files(files, EVENT_COLUMNS)
+        state = cls(build_snapshot(events), store, files, divisions=divisions, spells=spells_from_events(events),
+                    history=history_from_events(events))
+        state.listings['events'] = listing
+        state.fold({'events': [], 'responses': state._new_files('responses'),
+                    'applications': state._new_files('applications')})
+        return state
+
+    def save(self, batch=None):
+        """Persist the state, or just ``batch``, the files a refresh folded in.
+
+        A batch is appended to the journal, a line of file names, so a
+        refresh writes in proportion to what it read; open() replays the
+        journal over the last pickle. Every SNAPSHOT_EVERY batches the whole
+        state is pickled again under a new journal name, so a crash between
+        writing the pickle and dropping the old journal replays nothing twice.
+        """
+        directory = os.path.join(self.store.root, 'state')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, STATE_FILE)
+        if batch is not None and self.journaled < SNAPSHOT_EVERY and os.path.exists(path):
+            line = {area: [os.path.relpath(f, self.store.root) for f in batch[area]] for area in AREAS}
+            with open(self._journal_path(), 'a') as f:
+                f.write(json.dumps(line) + '\n')
+            self.journaled += 1
+            return
+        self.journal = uuid.uuid4().hex
+        self.journaled = 0
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        for name in os.listdir(directory):
+            if name.endswith('.journal') and name != os.path.basename(self._journal_path()):
+                os.remove(os.path.join(directory, name))
+
+    def replay(self):
+        # Fold in the batches journaled since the state was pickled, as they were
+        path = self._journal_path()
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                try:
+                    line = json.loads(line)
+                except ValueError:
+                    break  # a line cut short by a crash; refresh() finds its files again
+                self.fold({area: [os.path.join(self.store.root, f) for f in line[area]] for area in AREAS})
+                self.journaled += 1
+
+    def _journal_path(self):
+        return os.path.join(self.store.root, 'state', f'summary-{self.journal}.journal')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock'], state['store']
+        return state
+
+    def __setstate__(self, state):
+        # States saved before change tracking existed start rebased
+        self.__dict__.update(generation=0, rebased=0, changes=[])
+        self.__dict__.update(state)
+        self.store = None
+        self.checked = time.monotonic()
+        self.lock = threading.RLock()
+
+    def refresh(self, min_interval=0):
+        """Fold in and persist event, survey response and ATS files ingested since the last refresh.
+
+        Returns the number of events applied, or None when a compaction made it rebuild from every file.
+        """
+        if not self.due(min_interval):
+            return 0
+        with self.lock:
+            self.checked = time.monotonic()
+            if self.store.compacted() != self.compacted:
+                # compact() renamed the part files, so the ones already folded in can't be told apart
+                self._rebuild()
+                self.save()
+                return None
+            batch = {area: self._new_files(area) for area in AREAS}
+            if not any(batch.values()):
+                return 0
+            applied = self.fold(batch)
+            self.save(batch)
+            return applied
+
+    def _rebuild(self):
+        # Replace the state in place, so every session holding it sees the
+        # rebuild, and mark every latest row changed (see changed_since())
+        fresh = self.build(self.store, self.cube.divisions)
+        lock, generation = self.lock, self.generation + 1
+        self.__dict__.update(fresh.__dict__)
+        self.lock = lock
+        self.generation = self.rebased = generation
+        self.changes = []
+
+    def fold(self, batch):
+        """Fold in the event, response and ATS files of ``batch`` (lists keyed by area) not already folded in."""
+        with self.lock:
+            new = [path for path in batch['events'] if path not in self.files]
+            applied = 0
+            if new:
+                events = self.store.read_files(new, EVENT_COLUMNS)
+                self.apply(events)
+                self.files.update(new)
+                self.version = next_version(self.version, new)
+                applied = len(events)
+            self.add_responses([path for path in batch['responses'] if path not in self.survey_files])
+            self.add_applications([path for path in batch['applications'] if path not in self.application_files])
+            return applied
+
+    def _new_files(self, area):
+        known = {'events': self.files, 'responses': self.survey_files, 'applications': self.application_files}[area]
+        return [path for path in changed_files(os.path.join(self.store.root, area), self.listings[area])
+                if path not in known]
+
+    def add_responses(self, files):
+        """Count the survey responses in ``files``, part files of the store's response area."""
+        with self.lock:
+            if files:
+                self.surveys.add(self.store.response_batches(files))
+                self.survey_files.update(files)
+                self.version = next_version(self.version, files)
+
+    def add_applications(self, files):
+        """Fold the ATS events in ``files``, part files of the store's application area, into the funnel.
+
+        Files are read one month partition at a time, oldest first, so each
+        candidate's events reach the funnel in date order.
+        """
+        with self.lock:
+            partition = lambda path: os.path.basename(os.path.dirname(path))
+            for _, month in itertools.groupby(sorted(files, key=partition), key=partition):
+                month = list(month)
+                batches = list(self.store.application_batches(month))
+                if batches:
+                    self.funnel.add(pd.concat(batches, ignore_index=True))
+                self.application_files.update(month)
+            self.version = next_version(self.version, files)
+
+    def latest(self, ids=None):
+        """Latest-month rows of ``ids`` (default: everyone), indexed by employee_id."""
+        with self.lock:
+            return self._consolidate() if ids is None else self._rows(ids)
+
+    def changed_since(self, generation):
+        """Employee ids whose latest row changed after ``generation``.
+
+        Returns None when every row may have changed (a month rollover or a
+        generation older than the change log).
+        """
+        with self.lock:
+            if generation < self.rebased:
+                return None
+            changed = [ids for seen, ids in self.changes if seen > generation]
+            return pd.Index(np.unique(np.concatenate(changed))) if changed else pd.Index([], dtype=np.int64)
+
+    def _touch(self, ids=None):
+        self.generation += 1
+        if ids is None:
+            self.rebased = self.generation
+            self.changes = []
+        else:
+            self.changes.append((self.generation, ids.to_numpy()))
+
+    def due(self, min_interval):
+        return self.store is not None and time.monotonic() - self.checked >= min_interval
+
+    def apply(self, events):
+        with self.lock:
+            events = events.assign(event_date=pd.to_datetime(events['event_date']).astype('datetime64[ns]'),
+                                   team=place_teams(events))
+            events = events.sort_values(['event_date', 'employee_id'], kind='stable')
+            # Late-arriving events for closed months land in the current month
+            month = np.maximum(month_ordinal(events['event_date']), self.month)
+            for value in np.unique(month):
+                while self.month < value:
+                    self._advance()
+                self._apply_month(events[month == value])
+            self.spells = update_spells(self.spells, events)
+            self.history.add(events)
+
+    def _advance(self):
+        rows = self._consolidate()
+        rows = rows[~rows['terminated']].copy()
+        self.month += 1
+        rows['month'] = month_start([self.month])[0]
+        rows['hired'] = False
+        rows['terminated'] = False
+        rows['term_category'] = np.nan
+        rows['term_reason'] = np.nan
+        rows = typed(rows)
+        # Recomputed from the dates as build_snapshot does, so they never
+        # drift from a rebuild
+        month_end = month_start([self.month + 1])[0] - np.timedelta64(1, 'D')
+        rows['tenure'] = years_between(rows['hire_date'], month_end)
+        rows['age'] = years_between(rows['birth_date'], month_end)
+        self._add(rows.reset_index())
+        self.current = rows
+        self.recent = rows.iloc[0:0]
+        self._touch()
+        self.anomalies.catch_up(self.cube, self.month - 1)
+
+    def _add(self, rows, sign=1):
+        self.summary.add(rows, sign)
+        self.cube.add(rows, sign)
+        self.pay.add(rows, sign)
+
+    def _consolidate(self):
+        if len(self.recent):
+            self.current = typed(pd.concat([self.current.drop(self.recent.index, errors='ignore'), self.recent]))
+            self.recent = self.current.iloc[0:0]
+        return self.current
+
+    def _rows(self, ids):
+        in_recent = ids.isin(self.recent.index)
+        known = ids[~in_recent].intersection(self.current.index)
+        return pd.concat([self.recent.loc[ids[in_recent]], self.current.loc[known]])
+
+    def _apply_month(self, events):
+        ids = pd.Index(events['employee_id'].unique())
+        old = self._rows(ids)
+        self._add(old.reset_index(), sign=-1)
+        new = self._update(old, events)
+        self._add(new.reset_index())
+        self.recent = typed(pd.concat([self.recent.drop(new.index.union(old.index), errors='ignore'), new]))
+        self._touch(new.index.union(old.index))
+
+    def _update(self, old, events):
+        month_end = month_start([self.month + 1])[0] - np.timedelta64(1, 'D')
+        by_employee = events.groupby('employee_id', sort=False)
+        latest = by_employee[['department', 'team', 'level', 'salary', 'gender', 'birth_date', 'rating',
+                              'satisfaction', 'category', 'reason']].last()
+        status = events[events['event_type'].isin(['hire', 'termination'])]
+        status = status.groupby('employee_id', sort=False)['event_type'].last().astype(str)
+        # Anyone hired this month gets a row, even if they also left in it
+        hire_date = events[events['event_type'] == 'hire'].groupby('employee_id')['event_date'].last()
+        hired = hire_date.index
+        left = status.index[status == 'termination']
+
+        # Work in wide dtypes while editing; typed() narrows them again
+        rows = old.reindex(old.index.union(hired)).astype(
+            {**{column: object for column in CATEGORY_COLUMNS},
+             **{column: np.float64 for column in ['age', 'tenure', 'salary', 'rating', 'satisfaction']}})
+        rows['month'] = month_start([self.month])[0]
+        rows.loc[hired, ['hired', 'terminated']] = [True, False]
+        rows.loc[hired, 'hire_date'] = hire_date.to_numpy()
+        birth = pd.to_datetime(latest['birth_date']).astype('datetime64[ns]')
+        birth = birth[birth.notna()]
+        rows.loc[birth.index, 'birth_date'] = birth.to_numpy()
+        rows.loc[hired, 'tenure'] = years_between(rows.loc[hired, 'hire_date'], month_end)
+        rows.loc[hired, 'age'] = years_between(rows.loc[hired, 'birth_date'], month_end)
+        rows.loc[hired, 'term_category'] = np.nan
+        rows.loc[hired, 'term_reason'] = np.nan
+        left = left.intersection(rows.index)
+        rows.loc[left, 'terminated'] = True
+        rows.loc[left, 'term_category'] = latest.loc[left, 'category'].astype(object).to_numpy()
+        rows.loc[left, 'term_reason'] = latest.loc[left, 'reason'].astype(object).to_numpy()
+
+        # Attributes take the most recent non-null value from the batch
+        updates = latest.reindex(rows.index)
+        for column in ['department', 'team', 'level', 'salary', 'gender', 'rating', 'satisfaction']:
+            value = updates[column]
+            changed = value.notna().to_numpy()
+            rows.loc[changed, column] = value[changed].astype(
+                object if column in CATEGORY_COLUMNS else float).to_numpy()
+
+        return typed(rows)
+
+
+def open_live(root):
+    """IncrementalSummary and reference tables for the event store at ``root``.
+
+    With no events ingested the dashboard runs on a seeded synthetic
+    workforce.
+    """
+    store = EventStore(root)
+    if store.is_empty():
+        reference = load_reference()
+        divisions = divisions_from(reference['org_structure'])
+        live = IncrementalSummary(synthetic_snapshot(seed=7), version='synthetic-7', divisions=divisions)
+        live.surveys.add([synthetic_responses(live.summary, reference['survey_questions'], seed=7)])
+        live.funnel.add(synthetic_applications(live.summary, seed=7))
+        return live, reference
+    reference = load_reference(store)
+    return IncrementalSummary.open(store, divisions_from(reference['org_structure'])), reference
+
+
+def next_version(version, files):
+    # Part files are never rewritten, so the names folded in so far identify
+    # the data; each batch extends the digest rather than rehashing them all
+    if not files:
+        return version
+    names = [version] + sorted(os.path.basename(f) for f in files)
+    return hashlib.sha1('\n'.join(names).encode()).hexdigest()[:16]
+
+
+def years_between(dates, until):
+    # Whole days from ``dates`` to ``until`` in years, as build_snapshot counts them
+    days = (until - pd.to_datetime(dates).astype('datetime64[ns]')).dt.days
+    return (days / DAYS_PER_YEAR).astype('float32').to_numpy()
+
+
+def with_dates(rows):
+    # Hire and birth dates of snapshot rows, recovered from their month-end
+    # tenure and age (whole days, so rounding gives them back exactly)
+    month_end = (rows['month'] + pd.offsets.MonthEnd(0)).to_numpy().astype('datetime64[D]')
+    dates = {}
+    for column, years in [('hire_date', 'tenure'), ('birth_date', 'age')]:
+        days = np.round(rows[years].to_numpy(np.float64) * DAYS_PER_YEAR)
+        dates[column] = pd.to_datetime(month_end - np.nan_to_num(days).astype('timedelta64[D]')).where(
+            ~np.isnan(days))
+    return rows.assign(**dates)
+
+
+def typed(rows):
+    # Restore snapshot dtypes after rows have been edited or concatenated
+    rows = rows[ROW_COLUMNS].copy()
+    rows['hired'] = rows['hired'].fillna(False).astype(bool)
+    rows['terminated'] = rows['terminated'].fillna(False).astype(bool)
+    rows['age'] = rows['age'].astype('float32')
+    rows['tenure'] = rows['tenure'].astype('float32')
+    rows['salary'] = rows['salary'].astype('float64')
+    rows['rating'] = rows['rating'].fillna(0).astype('int8')
+    rows['satisfaction'] = rows['satisfaction'].astype('float32')
+    rows['hire_date'] = pd.to_datetime(rows['hire_date']).astype('datetime64[ns]')
+    rows['birth_date'] = pd.to_datetime(rows['birth_date']).astype('datetime64[ns]')
+    for column in ['department', 'team', 'level', 'gender', 'term_reason']:
+        rows[column] = rows[column].astype(object).astype('category')
+    rows['term_category'] = pd.Categorical(rows['term_category'].astype(object), categories=TERM_CATEGORIES)
+    return rows
@@ -0,0 +1,315 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from aggregation import month_start
+from orgchart import MEASURES, ORG_LEVELS
+
+# Months of each unit's series the rules can look back over
+HISTORY = 24
+# Units smaller than this at the reporting month are too noisy to flag
+MIN_UNIT_HEADCOUNT = 20
+SEVERITIES = ['critical', 'warning', 'positive']
+
+
+def trailing(monthly, months=12):
+    """Sum over the last ``months`` months at each month; NaN until there are that many."""
+    out = np.full(monthly.shape, np.nan)
+    if monthly.shape[-1] < months:
+        return out
+    cumulative = np.cumsum(monthly, axis=-1)
+    out[..., months - 1] = cumulative[..., months - 1]
+    out[..., months:] = cumulative[..., months:] - cumulative[..., :-months]
+    return out
+
+
+def mean_of(sums, counts):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+# Series every rule can read: name -> (formula over a namespace of monthly
+# OrgCube measures, each (units, months), unit)
+SERIES = {
+    'Headcount': (lambda c: c.headcount, 'employees'),
+    'Hires': (lambda c: trailing(c.hires), 'hires'),
+    'Terminations': (lambda c: c.leavers, 'exits'),
+    'Turnover Rate': (lambda c: 100 * mean_of(trailing(c.leavers), trailing(c.headcount) / 12), '%'),
+    'Avg Salary': (lambda c: mean_of(c.salary_sum, c.salary_n), '$'),
+    'Satisfaction': (lambda c: mean_of(c.satisfaction_sum, c.satisfaction_n), 'score'),
+}
+
+
+def industry(column):
+    """A per-department benchmark from the industry_turnover reference table."""
+    return ('reference', 'industry_turnover', column)
+
+
+class Rule:
+    """An insight declared as a test of one series, applied to every org unit.
+
+    ``kind`` is one of:
+
+    - 'threshold': the reporting-month value against ``benchmark`` (a
+      number, industry(...), 'parent' or 'company'); fires when it is more
+      than ``margin`` (relative) beyond it in ``direction``
+    - 'gap': a threshold against the parent unit, keeping the ``top``
+      largest gaps
+    - 'trend': the least-squares slope over the last ``window`` months;
+      fires when the fitted change over the window exceeds ``margin`` of
+      the mean level
+    - 'anomaly': the reporting month's z-score against the ``window``
+      months before it (standard deviation at least ``min_std``); fires
+      beyond ``margin``
+
+    A unit's score is how far past the margin it is (1 at the margin).
+    ``direction`` is 'up' (above, rising) or 'down'. A warning becomes
+    critical when its score reaches ``critical``.
+    ``message`` is formatted with unit, parent, value, benchmark, excess
+    (percent beyond the benchmark), change (percent over the window), z and
+    month; excess, change and z are magnitudes, so the wording carries the
+    direction.
+    """
+
+    def __init__(self, title, kind, series, severity, message, direction='up', benchmark=None, margin=0.1,
+                 window=6, top=None, min_std=0.0, critical=None, levels=None):
+        self.title = title
+        self.kind = kind
+        self.series = series
+        self.severity = severity
+        self.message = message
+        self.direction = direction
+        self.benchmark = 'parent' if kind == 'gap' else benchmark
+        self.margin = margin
+        self.window = window
+        self.top = top
+        self.min_std = min_std
+        self.critical = critical
+        self.levels = levels
+
+
+REGISTRY = [
+    Rule('Turnover Above Industry', 'threshold', 'Turnover Rate', 'warning',
+         '{unit} turnover ({value:.1f}%) is above the industry average ({benchmark:.1f}%). '
+         'Consider retention initiatives.', benchmark=industry('Industry Avg'), critical=5),
+    Rule('Turnover Hotspot', 'gap', 'Turnover Rate', 'warning',
+         '{unit} turnover ({value:.1f}%) is {excess:.0f}% above {parent} ({benchmark:.1f}%).',
+         margin=0.5, top=3, levels=('Department', 'Team')),
+    Rule('Exit Spike', 'anomaly', 'Terminations', 'critical',
+         '{unit} had {value:.0f} exits in {month}, {z:.1f} standard deviations above its 12-month norm.',
+         margin=3, window=12, min_std=1),
+    Rule('Turnover Rising', 'trend', 'Turnover Rate', 'warning',
+         '{unit} turnover rose {change:.0f}% over the last 6 months, to {value:.1f}%.', margin=0.25, critical=2),
+    Rule('Turnover Falling', 'trend', 'Turnover Rate', 'positive',
+         '{unit} turnover fell {change:.0f}% over the last 6 months, to {value:.1f}%.', direction='down',
+         margin=0.15),
+    Rule('Low Satisfaction', 'threshold', 'Satisfaction', 'warning',
+         '{unit} satisfaction ({value:.1f}) is below {benchmark:.1f}. Schedule stay interviews.',
+         direction='down', benchmark=3.5, margin=0.01, critical=10),
+    Rule('Satisfaction Improving', 'trend', 'Satisfaction', 'positive',
+         '{unit} satisfaction rose {change:.1f}% over the last 6 months, to {value:.1f}.', margin=0.03),
+    Rule('Satisfaction Declining', 'trend', 'Satisfaction', 'warning',
+         '{unit} satisfaction fell {change:.1f}% over the last 6 months, to {value:.1f}.', direction='down',
+         margin=0.03),
+    Rule('Headcount Growing', 'trend', 'Headcount', 'positive',
+         '{unit} grew {change:.1f}% over the last 6 months, to {value:,.0f} employees.', margin=0.05),
+    Rule('Headcount Shrinking', 'trend', 'Headcount', 'warning',
+         '{unit} shrank {change:.1f}% over the last 6 months, to {value:,.0f} employees.', direction='down',
+         margin=0.05),
+    Rule('Pay Below Peers', 'gap', 'Avg Salary', 'warning',
+         '{unit} average salary (${value:,.0f}) is {excess:.0f}% below {parent} (${benchmark:,.0f}). '
+         'Review compensation.', direction='down', margin=0.1, top=3, levels=('Department',)),
+]
+
+
+def unit_series(cube, departments=None, end=None, series=SERIES, history=HISTORY):
+    """Every org unit's series over the ``history`` months to ``end``.
+
+    Returns a units frame (Unit, Level, Department, Parent: the row of the
+    parent unit, -1 for the company) and a (months, units, series) array,
+    months first so the rules reduce over contiguous slabs.
+    Departments outside ``departments`` are dropped with their teams;
+    divisions and the company only when some are dropped.
+    """
+    last = cube.n_months - 1 if end is None else cube.month_position(end)
+    # Trailing sums need a year before the first month shown
+    first = max(last - history - 11, 0)
+    # Row of each level's first unit once the levels are stacked
+    starts = np.cumsum([0] + [len(cube.paths[level]) for level in ORG_LEVELS])
+    frames, cells = [], []
+    for depth, level in enumerate(ORG_LEVELS):
+        paths = cube.paths[level]
+        parent = np.asarray(cube.parent[level], dtype=np.int64) + starts[depth - 1] if depth \
+            else np.full(len(paths), -1)
+        frames.append(pd.DataFrame({
+            'Unit': [path[-1] if path else 'Company' for path in paths],
+            'Level': level,
+            'Department': [path[1] if len(path) > 1 else None for path in paths],
+            'Parent': parent,
+        }))
+        cells.append(cube.cells[level][:, first:last + 1])
+    units = pd.concat(frames, ignore_index=True)
+    cells = np.concatenate(cells)
+    namespace = SimpleNamespace(**{name: cells[:, :, k] for k, name in enumerate(MEASURES)})
+    values = np.stack([formula(namespace)[:, -history:].T for formula, _ in series.values()], axis=2)
+    # Pad so every unit has ``history`` months, oldest first
+    if len(values) < history:
+        values = np.concatenate([np.full((history - len(values),) + values.shape[1:], np.nan), values])
+
+    if departments is not None:
+        chosen = set(departments)
+        keep = units['Department'].isin(chosen).to_numpy()
+        if chosen.issuperset(path[-1] for path in cube.paths['Department']):
+            keep = keep | units['Department'].isna().to_numpy()
+        rows = np.flatnonzero(keep)
+        remap = np.full(len(units), -1)
+        remap[rows] = np.arange(len(rows))
+        units = units.iloc[rows].reset_index(drop=True)
+        units['Parent'] = np.where(units['Parent'] >= 0, remap[units['Parent'].clip(lower=0)], -1)
+        values = values[:, rows]
+    return units, values
+
+
+def evaluate_rules(units, values, rules=REGISTRY, names=list(SERIES), reference=None, month=None):
+    """Every unit each rule flags, with its score, best first within each rule.
+
+    Rules of the same kind and window are evaluated together: their series
+    are gathered into one (months, units, rules) block, holding only the
+    months they read, and tested with array operations. The hits of every
+    rule are then ranked in one sort, so the cost grows with units x rules
+    and no Python loop runs over units.
+    """
+    index = {name: k for k, name in enumerate(names)}
+    headcount = values[-1, :, index['Headcount']] if 'Headcount' in index else np.full(len(units), np.inf)
+    level = pd.Categorical(units['Level'], categories=ORG_LEVELS).codes
+    eligible = (headcount >= MIN_UNIT_HEADCOUNT) | (level == 0)
+    parent = units['Parent'].to_numpy()
+    groups = {}
+    for r, rule in enumerate(rules):
+        months = 1 if rule.kind in ('threshold', 'gap') else rule.window + (rule.kind == 'anomaly')
+        groups.setdefault((rule.kind, months), []).append(r)
+
+    hits = {name: [] for name in ['row', 'rule', 'Score'] + FIELDS}
+    for (kind, months), numbers in groups.items():
+        chosen = [rules[r] for r in numbers]
+        sign = np.array([1.0 if rule.direction == 'up' else -1.0 for rule in chosen])
+        margin = np.array([rule.margin for rule in chosen], dtype=np.float64)
+        block = values[-months:][:, :, [index[rule.series] for rule in chosen]]
+        score, found = KINDS[kind](chosen, block, sign, margin, units, parent, reference)
+        levels = np.array([[name in (rule.levels or ORG_LEVELS) for rule in chosen] for name in ORG_LEVELS])
+        with np.errstate(invalid='ignore'):
+            rows, cols = np.nonzero((score > 1) & eligible[:, None] & levels[level])
+        hits['row'].append(rows)
+        hits['rule'].append(np.asarray(numbers)[cols])
+        hits['Score'].append(score[rows, cols])
+        for name in FIELDS:
+            hits[name].append(found[name][rows, cols] if name in found else np.full(len(rows), np.nan))
+
+    hits = {name: np.concatenate(parts) if parts else np.zeros(0) for name, parts in hits.items()}
+    rows, numbers = hits['row'].astype(np.int64), hits['rule'].astype(np.int64)
+    ranked = np.lexsort((-hits['Score'], numbers))
+    # Rank within each rule, for the rules keeping only their ``top`` hits
+    first = np.searchsorted(numbers[ranked], numbers[ranked])
+    top = np.array([rule.top or len(units) for rule in rules] or [0])
+    ranked = ranked[np.arange(len(ranked)) - first < top[numbers[ranked]]]
+    rows, numbers = rows[ranked], numbers[ranked]
+    parent_names = np.append(units['Unit'].to_numpy(dtype=object), None)[parent]
+    return pd.DataFrame({
+        'Rule': np.array([rule.title for rule in rules], dtype=object)[numbers],
+        'Unit': units['Unit'].to_numpy()[rows],
+        'Level': units['Level'].to_numpy()[rows],
+        'Parent': parent_names[rows],
+        'Score': hits['Score'][ranked],
+        **{name: hits[name][ranked] for name in FIELDS},
+        'Month': month,
+    })
+
+
+def benchmarks(rules, latest, units, parent, reference):
+    # (units, rules) benchmark values; NaN where a unit has none
+    out = np.full((len(units), len(rules)), np.nan)
+    padded = np.vstack([latest, np.full((1, len(rules)), np.nan)])
+    for r, rule in enumerate(rules):
+        if rule.benchmark == 'parent':
+            out[:, r] = padded[parent, r]
+        elif rule.benchmark == 'company':
+            out[:, r] = padded[np.flatnonzero(units['Level'] == 'Company')[:1], r]
+        elif isinstance(rule.benchmark, tuple):
+            _, table, column = rule.benchmark
+            lookup = reference[table].set_index('Department')[column] if reference is not None else pd.Series()
+            out[:, r] = units['Department'].map(lookup).to_numpy(dtype=np.float64)
+        elif rule.benchmark is not None:
+            out[:, r] = rule.benchmark
+    return out
+
+
+def threshold(rules, block, sign, margin, units, parent, reference):
+    latest = block[-1]
+    benchmark = benchmarks(rules, latest, units, parent, reference)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        excess = sign * (latest - benchmark) / np.abs(benchmark)
+    return excess / margin, {'value': latest, 'benchmark': benchmark, 'excess': 100 * np.abs(excess)}
+
+
+def trend(rules, block, sign, margin, units, parent, reference):
+    window = len(block)
+    t = np.arange(window) - (window - 1) / 2
+    level = block.mean(axis=0)
+    slope = np.tensordot(t, block, axes=1) / (t ** 2).sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = slope * (window - 1) / np.abs(level)
+    return sign * change / margin, {'value': block[-1], 'change': 100 * np.abs(change)}
+
+
+def anomaly(rules, block, sign, margin, units, parent, reference):
+    history = block[:-1]
+    mean = history.mean(axis=0)
+    spread = np.maximum(history.std(axis=0), [rule.min_std for rule in rules])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (block[-1] - mean) / spread
+    return sign * z / margin, {'value': block[-1], 'benchmark': mean, 'z': np.abs(z)}
+
+
+KINDS = {'threshold': threshold, 'gap': threshold, 'trend': trend, 'anomaly': anomaly}
+# Values the kinds report for each hit, for the card messages
+FIELDS = ['value', 'benchmark', 'excess', 'change', 'z']
+
+
+def insight_cards(found, rules=REGISTRY):
+    """One card per rule that fired, for its highest-scoring unit, ranked by severity then score."""
+    by_title = {rule.title: rule for rule in rules}
+    flagged = found['Rule'].value_counts()
+    cards = []
+    # evaluate_rules() lists each rule's hits best first
+    for best in found.drop_duplicates('Rule').to_dict('records'):
+        rule = by_title[best['Rule']]
+        severity = 'critical' if rule.critical and rule.severity == 'warning' and best['Score'] >= rule.critical \
+            else rule.severity
+        message = rule.message.format(unit=best['Unit'], parent=best['Parent'], month=best['Month'],
+                                      **{name: 0 if pd.isna(best[name]) else best[name] for name in FIELDS})
+        others = flagged[rule.title] - 1
+        if others:
+            message += f" {others} other unit{'s' if others > 1 else ''} also flagged."
+        cards.append({'Severity': severity, 'Title': rule.title, 'Message': message, 'Unit': best['Unit'],
+                      'Level': best['Level'], 'Series': rule.series, 'Score': round(float(best['Score']), 2),
+                      'Units Flagged': int(flagged[rule.title])})
+    cards = pd.DataFrame(cards, columns=['Severity', 'Title', 'Message', 'Unit', 'Level', 'Series', 'Score',
+                                         'Units Flagged'])
+    order = cards['Severity'].map({severity: k for k, severity in enumerate(SEVERITIES)})
+    return cards.assign(order=order).sort_values(['order', 'Score'], ascending=[True, False], kind='stable') \
+        .drop(columns='order').reset_index(drop=True)
+
+
+def insights(cube, reference, departments=None, end=None, rules=REGISTRY):
+    """Ranked insight cards for a filter selection (see insight_cards())."""
+    units, values = unit_series(cube, departments, end)
+    last = cube.n_months - 1 if end is None else cube.month_position(end)
+    month = pd.Timestamp(month_start([cube.first_month + last])[0]).strftime('%B %Y')
+    return insight_cards(evaluate_rules(units, values, rules, list(SERIES), reference, month), rules)
+
+
+def headline(cards, n=3):
+    """``n`` cards for the overview: the top card of each severity first, then the next best."""
+    top = cards.drop_duplicates('Severity')
+    return pd.concat([top, cards.drop(top.index)]).head(n).sort_index().reset_index(drop=True)
@@ -0,0 +1,134 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Finished jobs stay visible (for status polling) this many seconds
+KEEP_SECONDS = 600
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    """Handle on one scheduled computation.
+
+    The job function receives the handle as its first argument and reports
+    through ``update()``, which also raises Cancelled once ``cancel()`` has
+    been called; that is where long-running work notices cancellation.
+    """
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.status = 'queued'
+        self.progress = None
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def update(self, progress=None, message=None):
+        if progress is not None:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish('cancelled')
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Result of the job; re-raises its error, or Cancelled."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f'job {self.id} still {self.status}')
+        if self.status == 'failed':
+            raise self.error
+        if self.status == 'cancelled':
+            raise Cancelled()
+        return self.result
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+        self._done.set()
+
+
+class JobScheduler:
+    """Thread pools running keyed jobs for every session of the app.
+
+    Submitting a key that already has a queued or running job returns that
+    job instead of starting another, so any number of sessions asking for
+    the same refresh or table share one computation. Work that must leave
+    the process (exports) is handed to a process pool from inside a job;
+    those jobs hold their thread while they wait on it, so they run on
+    their own pool through ``submit_export()`` and sessions blocked on a
+    table never queue behind them.
+    """
+
+    def __init__(self, workers=4, export_workers=2):
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='job')
+        self.export_pool = ThreadPoolExecutor(export_workers, thread_name_prefix='export')
+        self.jobs = {}
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        return self._submit(self.pool, key, fn, args, kwargs)
+
+    def submit_export(self, key, fn, *args, **kwargs):
+        return self._submit(self.export_pool, key, fn, args, kwargs)
+
+    def _submit(self, pool, key, fn, args, kwargs):
+        with self.lock:
+            job = self.active.get(key)
+            if job is not None and not job.done() and not job.cancelled:
+                return job
+            self._prune()
+            job = Job(key)
+            self.jobs[job.id] = job
+            self.active[key] = job
+            job.future = pool.submit(self._run, job, fn, args, kwargs)
+            return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            if job.cancelled:
+                raise Cancelled()
+            job.status = 'running'
+            job.started = time.time()
+            job.result = fn(job, *args, **kwargs)
+            status = 'done'
+        except Cancelled:
+            status = 'cancelled'
+        except Exception as e:
+            job.error = e
+            status = 'failed'
+        with self.lock:
+            if self.active.get(job.key) is job:
+                del self.active[job.key]
+        job._finish(status)
+
+    def _prune(self):
+        horizon = time.time() - KEEP_SECONDS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done() and job.finished < horizon]:
+            del self.jobs[job_id]
@@ -0,0 +1,191 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from aggregation import TERM_CATEGORIES, ratio
+
+
+def total(cells, column=None):
+    """Sum of a Summary cell array over the period's months."""
+    return ('total', cells, column)
+
+
+def average(cells, column=None):
+    """Mean month-end value of a Summary cell array over the period."""
+    return ('average', cells, column)
+
+
+def closing(cells, column=None):
+    """Value of a Summary cell array at the period's last month."""
+    return ('closing', cells, column)
+
+
+def reference_value(table, column, row=None):
+    """A reference table value: the row labelled ``row``, else the latest row
+    (and the one before it for the comparison period)."""
+    return ('reference', table, column, row)
+
+
+class Metric:
+    """A KPI declared as a formula over named inputs.
+
+    ``inputs`` maps names to total(), average(), closing() or
+    reference_value() specs; ``formula`` receives them as attributes of one
+    namespace, along with ``months``, the period length. ``compare`` picks
+    the comparison period: 'previous' (as many months just before), 'year'
+    (a year earlier) or None. ``delta`` is 'absolute' or 'relative' (percent
+    change) and ``better`` says which direction is good.
+    """
+
+    def __init__(self, name, formula, inputs, unit='%', decimals=1, compare='previous', delta='absolute',
+                 better='higher'):
+        self.name = name
+        self.formula = formula
+        self.inputs = inputs
+        self.unit = unit
+        self.decimals = decimals
+        self.compare = compare
+        self.delta = delta
+        self.better = better
+
+
+VOLUNTARY = TERM_CATEGORIES.index('Voluntary')
+
+
+def annual_rate(leavers, headcount, months):
+    return 100 * float(ratio(leavers, headcount)) * 12 / months
+
+
+REGISTRY = [
+    Metric('Total Employees', lambda p: p.headcount, {'headcount': closing('headcount')},
+           unit='employees', decimals=0, delta='relative'),
+    Metric('Turnover Rate', lambda p: annual_rate(p.leavers, p.headcount, p.months),
+           {'leavers': total('leavers'), 'headcount': average('headcount')}, better='lower'),
+    Metric('Voluntary Turnover', lambda p: annual_rate(p.leavers, p.headcount, p.months),
+           {'leavers': total('category', VOLUNTARY), 'headcount': average('headcount')}, better='lower'),
+    Metric('Retention Rate', lambda p: 100 - annual_rate(p.leavers, p.headcount, p.months),
+           {'leavers': total('leavers'), 'headcount': average('headcount')}),
+    Metric('90-Day Retention', lambda p: 100 * (1 - float(ratio(p.early_exits, p.hires))),
+           {'early_exits': total('early_exits'), 'hires': total('hires')}),
+    Metric('Avg Tenure', lambda p: float(ratio(p.tenure_sum, p.tenure_n)),
+           {'tenure_sum': closing('tenure_sum'), 'tenure_n': closing('tenure_n')}, unit='years'),
+    Metric('Hires', lambda p: p.hires, {'hires': total('hires')}, unit='hires', decimals=0, delta='relative'),
+    Metric('Time to Fill', lambda p: p.days, {'days': reference_value('recruitment_metrics', 'Time to Fill')},
+           unit='days', decimals=0, better='lower'),
+    Metric('Cost per Hire', lambda p: p.cost, {'cost': reference_value('recruitment_metrics', 'Cost per Hire')},
+           unit='$', decimals=0, better='lower'),
+    Metric('Offer Accept Rate', lambda p: 100 * float(ratio(p.accepted, p.offers)),
+           {'accepted': reference_value('recruitment_funnel', 'Count', 'Accepted'),
+            'offers': reference_value('recruitment_funnel', 'Count', 'Offer')}, decimals=0, compare=None),
+    Metric('Engagement', lambda p: p.score, {'score': reference_value('engagement_trend', 'Overall')}, decimals=0),
+]
+METRICS = {metric.name: metric for metric in REGISTRY}
+
+
+def evaluate(summary, reference, departments=None, start=None, end=None, names=None):
+    """Current and comparison values of the registered metrics for a filter selection.
+
+    Every Summary input of every metric, for every period any of them
+    needs, comes out of one grouped reduction: the columns are stacked and
+    summed over the selected departments once for the months from the
+    earliest comparison period to the reporting month, and period totals
+    are differences of the cumulative sum. Periods follow
+    tables_from_summary() (``start`` to ``end``, by default the trailing
+    twelve months, never before the selection's first active month); a
+    comparison period reaching before that has no value.
+
+    Returns one row per metric with Value, Previous, Delta, Unit and
+    Better, and the time spent in its own reductions and formula in
+    ``Compute ms``; ``attrs['scan_ms']`` holds the shared pass.
+    """
+    metrics = REGISTRY if names is None else [METRICS[name] for name in names]
+    hi = summary.n_months - 1 if end is None else summary.month_position(end)
+    lo = max(hi - 11, 0) if start is None else min(summary.month_position(start), hi)
+
+    # The shared scan: headcount and leavers (for the first active month)
+    # plus every distinct cell column the metrics read
+    started = time.perf_counter()
+    columns = [('headcount', None), ('leavers', None)]
+    for metric in metrics:
+        for spec in metric.inputs.values():
+            if spec[0] != 'reference' and spec[1:] not in columns:
+                columns.append(spec[1:])
+    span_from = max(lo - max(hi + 1 - lo, 12), 0)
+    codes = summary.department_codes(departments)
+    block = np.stack([getattr(summary, cells)[codes, span_from:hi + 1] if column is None
+                      else getattr(summary, cells)[codes, span_from:hi + 1, column]
+                      for cells, column in columns], axis=-1)
+    monthly = block.sum(axis=0, dtype=np.float64)
+    cumulative = np.vstack([np.zeros((1, len(columns))), np.cumsum(monthly, axis=0)])
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    active = np.flatnonzero(monthly[:, 0] + monthly[:, 1])
+    first = span_from + int(active[0]) if len(active) else hi
+    lo = max(lo, first)
+    months = hi + 1 - lo
+    windows = {'current': (lo, hi), 'previous': (lo - months, lo - 1), 'year': (lo - 12, hi - 12)}
+
+    def value(spec, period):
+        if spec[0] == 'reference':
+            _, table, column, row = spec
+            df = reference[table]
+            if row is not None:
+                return float(df.loc[df.iloc[:, 0] == row, column].iloc[0])
+            # Months without a value (e.g. no requisition filled) are skipped
+            values = df[column].dropna()
+            offset = 1 if period == 'current' else 2
+            return float(values.iloc[-offset]) if len(values) >= offset else None
+        a, b = windows[period]
+        if a < first:
+            return None
+        i = columns.index(spec[1:])
+        a, b = a - span_from, b - span_from
+        if spec[0] == 'total':
+            return cumulative[b + 1, i] - cumulative[a, i]
+        if spec[0] == 'average':
+            return (cumulative[b + 1, i] - cumulative[a, i]) / (b + 1 - a)
+        return monthly[b, i]
+
+    def compute(metric, period):
+        values = {name: value(spec, period) for name, spec in metric.inputs.items()}
+        if any(v is None for v in values.values()):
+            return np.nan
+        return float(metric.formula(SimpleNamespace(months=months, **values)))
+
+    rows = []
+    for metric in metrics:
+        started = time.perf_counter()
+        current = compute(metric, 'current')
+        previous = compute(metric, metric.compare) if metric.compare else np.nan
+        if metric.delta == 'relative':
+            delta = (current - previous) / previous * 100 if previous else np.nan
+        else:
+            delta = current - previous
+        rows.append({'Metric': metric.name, 'Value': round(current, metric.decimals),
+                     'Previous': round(previous, metric.decimals), 'Delta': round(delta, 1),
+                     'Unit': metric.unit, 'Better': metric.better,
+                     'Compute ms': (time.perf_counter() - started) * 1000})
+    kpis = pd.DataFrame(rows)
+    kpis.attrs['scan_ms'] = scan_ms
+    return kpis
+
+
+def format_value(value, unit, decimals, sign=False):
+    text = f'{abs(value) if sign else value:,.{decimals}f}'
+    text = {'%': f'{text}%', '$': f'${text}', 'days': f'{text} days', 'years': f'{text} years'}.get(unit, text)
+    return ('-' if value < 0 else '+') + text if sign else text
+
+
+def display(row):
+    """(value, delta, delta_color) for st.metric from an evaluate() row."""
+    metric = METRICS[row['Metric']]
+    value = format_value(row['Value'], metric.unit, metric.decimals)
+    if pd.isna(row['Delta']):
+        delta = None
+    elif metric.delta == 'relative':
+        delta = f"{row['Delta']:+.1f}%"
+    else:
+        delta = format_value(row['Delta'], metric.unit, metric.decimals, sign=True)
+    return value, delta, 'inverse' if metric.better == 'lower' else 'normal'
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import month_ordinal, ratio
+
+ORG_LEVELS = ['Company', 'Division', 'Department', 'Team']
+# Departments missing from the org_structure reference table
+OTHER_DIVISION = 'Other'
+MEASURES = ['headcount', 'hires', 'leavers', 'salary_sum', 'salary_n', 'satisfaction_sum', 'satisfaction_n']
+
+
+def divisions_from(org_structure):
+    """Department -> division mapping from the org_structure reference table."""
+    return dict(zip(org_structure['Department'], org_structure['Division']))
+
+
+class OrgCube:
+    """Monthly sums at every level of the org tree: company, division, department, team.
+
+    Each level keeps a (nodes, months, MEASURES) array holding headcount,
+    hires, leavers and the salary and satisfaction sums and counts of every
+    node, so drilling down or rolling up only reads a block of rows. Like
+    Summary, snapshot rows can be added or retracted later, and every level
+    is updated from the rows themselves. Teams are keyed by (department,
+    team); employees without a team form a team named after their
+    department.
+    """
+
+    def __init__(self, snapshot, divisions=None):
+        bounds = month_ordinal([snapshot['month'].min(), snapshot['month'].max()])
+        self.first_month = int(bounds[0])
+        self.n_months = int(bounds[1]) - self.first_month + 1
+        self.divisions = dict(divisions or {})
+        # Per level: node paths (tuples of names below the company), their
+        # rows, each node's parent row one level up, and the cells
+        self.paths = {level: [] for level in ORG_LEVELS}
+        self.rows = {level: {} for level in ORG_LEVELS}
+        self.parent = {level: [] for level in ORG_LEVELS}
+        self.cells = {level: np.zeros((0, self.n_months, len(MEASURES))) for level in ORG_LEVELS}
+        self._node(0, ())
+        self.add(snapshot)
+
+    def add(self, rows, sign=1):
+        """Add (or with ``sign=-1`` retract) snapshot rows at every level."""
+        if not len(rows):
+            return
+        month = month_ordinal(rows['month']) - self.first_month
+        if month.min() < 0:
+            raise ValueError('rows precede the first month of the cube')
+        if month.max() >= self.n_months:
+            self._grow(int(month.max()) + 1 - self.n_months)
+        department = rows['department'].astype(object)
+        team = rows['team'].astype(object).fillna(department)
+        inverse, keys = pd.factorize(pd.MultiIndex.from_arrays([department, team]))
+        codes = np.array([self._team(department, team) for department, team in keys], dtype=np.int64)[inverse]
+        self._fit()
+
+        staying = ~rows['terminated'].to_numpy()
+        salary = rows['salary'].to_numpy(dtype=np.float64)
+        satisfaction = rows['satisfaction'].to_numpy(dtype=np.float64)
+        paid = staying & ~np.isnan(salary)
+        rated = staying & ~np.isnan(satisfaction)
+        values = [staying, rows['hired'].to_numpy(), rows['terminated'].to_numpy(),
+                  np.where(paid, salary, 0), paid, np.where(rated, satisfaction, 0), rated]
+
+        # From the teams up, each level's rows are the parents of the one below
+        for level in reversed(ORG_LEVELS):
+            cells = self.cells[level]
+            cell = codes * self.n_months + month
+            for k, weights in enumerate(values):
+                sums = np.bincount(cell, weights=weights, minlength=cells.shape[0] * self.n_months)
+                cells[:, :, k] += sign * sums.reshape(cells.shape[:2])
+            codes = np.asarray(self.parent[level], dtype=np.int64)[codes]
+
+    def set_divisions(self, divisions):
+        """Regroup departments under new divisions, rebuilding the division level."""
+        divisions = dict(divisions)
+        if divisions == self.divisions:
+            return
+        self.divisions = divisions
+        departments = [path[-1] for path in self.paths['Department']]
+        for level in ('Division', 'Department'):
+            self.paths[level], self.rows[level], self.parent[level] = [], {}, []
+        self.cells['Division'] = self.cells['Division'][:0]
+        # Departments are re-added in their old order, so their rows and cells stay put
+        for department in departments:
+            self._department(department)
+        self.paths['Team'] = [self.paths['Department'][parent] + path[-1:]
+                              for parent, path in zip(self.parent['Team'], self.paths['Team'])]
+        self.rows['Team'] = {path: i for i, path in enumerate(self.paths['Team'])}
+        self._fit()
+        np.add.at(self.cells['Division'], np.asarray(self.parent['Department'], dtype=np.int64),
+                  self.cells['Department'])
+
+    def month_position(self, value):
+        position = month_ordinal([pd.Timestamp(value)])[0] - self.first_month
+        return int(np.clip(position, 0, self.n_months - 1))
+
+    def children(self, path=(), start=None, end=None):
+        """One row per unit directly under ``path`` (a tuple of names from the division down).
+
+        Headcount, average salary and satisfaction are as of ``end`` (by
+        default the latest month); hires, terminations and the annualised
+        turnover rate cover ``start`` to ``end``, by default the trailing
+        twelve months.
+        """
+        depth = len(path)
+        if depth >= len(ORG_LEVELS) - 1:
+            return self._frame(ORG_LEVELS[-1], np.zeros(0, dtype=np.int64), start, end)
+        level, below = ORG_LEVELS[depth], ORG_LEVELS[depth + 1]
+        row = self.rows[level].get(tuple(path))
+        if row is None:
+            raise KeyError(f'no {level.lower()} {" / ".join(path)!r}')
+        return self._frame(below, np.flatnonzero(np.asarray(self.parent[below]) == row), start, end)
+
+    def _frame(self, level, rows, start, end):
+        last = self.n_months - 1 if end is None else self.month_position(end)
+        first = max(last - 11, 0) if start is None else min(self.month_position(start), last)
+        block = self.cells[level][rows, first:last + 1]
+        totals = block.sum(axis=1)
+        at_end = block[:, -1]
+        index = {name: k for k, name in enumerate(MEASURES)}
+        headcount = at_end[:, index['headcount']]
+        average = block[:, :, index['headcount']].mean(axis=1)
+        leavers = totals[:, index['leavers']]
+        df = pd.DataFrame({
+            'Unit': [self.paths[level][row][-1] for row in rows],
+            'Level': level,
+            'Headcount': headcount.astype(np.int64),
+            'Hires': totals[:, index['hires']].astype(np.int64),
+            'Terminations': leavers.astype(np.int64),
+            'Turnover Rate': (ratio(leavers, average) * 12 / (last + 1 - first) * 100).round(1),
+            'Avg Salary': ratio(at_end[:, index['salary_sum']], at_end[:, index['salary_n']]).round(0),
+            'Satisfaction': ratio(at_end[:, index['satisfaction_sum']], at_end[:, index['satisfaction_n']]).round(1),
+        })
+        active = (headcount > 0) | (leavers > 0)
+        return df[active].sort_values('Headcount', ascending=False, kind='stable').reset_index(drop=True)
+
+    def _team(self, department, team):
+        parent = self._department(department)
+        return self._node(3, self.paths['Department'][parent] + (team,), parent)
+
+    def _department(self, department):
+        division = self._node(1, (self.divisions.get(department, OTHER_DIVISION),), 0)
+        return self._node(2, self.paths['Division'][division] + (department,), division)
+
+    def _node(self, depth, path, parent=0):
+        level = ORG_LEVELS[depth]
+        row = self.rows[level].get(path)
+        if row is None:
+            row = self.rows[level][path] = len(self.paths[level])
+            self.paths[level].append(path)
+            self.parent[level].append(parent)
+        return row
+
+    def _fit(self):
+        # Zero cells for nodes added since the last call
+        for level in ORG_LEVELS:
+            cells = self.cells[level]
+            missing = len(self.paths[level]) - cells.shape[0]
+            if missing:
+                self.cells[level] = np.concatenate([cells, np.zeros((missing,) + cells.shape[1:])])
+
+    def _grow(self, months):
+        for level in ORG_LEVELS:
+            cells = self.cells[level]
+            self.cells[level] = np.concatenate([cells, np.zeros((cells.shape[0], months, cells.shape[2]))], axis=1)
+        self.n_months += months
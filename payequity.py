@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import month_ordinal, ratio
+from orgchart import OTHER_DIVISION
+
+# Relative accuracy of the salary sketches: a quantile read from one is
+# within this fraction of a salary actually at that rank
+SKETCH_ACCURACY = 0.01
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+# Salaries outside this range count in the first or last bucket
+MIN_PAY, MAX_PAY = 5_000, 5_000_000
+FIRST_BUCKET = int(np.ceil(np.log(MIN_PAY) / np.log(GAMMA)))
+BUCKETS = int(np.ceil(np.log(MAX_PAY) / np.log(GAMMA))) - FIRST_BUCKET + 1
+PERCENTILES = [10, 25, 50, 75, 90]
+UNLEVELLED = 'Unlevelled'
+UNKNOWN_GENDER = 'Unknown'
+# Dashboard label -> attribute departments are rolled up to
+PAY_GROUPS = {'Department': 'department', 'Division': 'division'}
+
+
+def pay_bucket(salary):
+    index = np.ceil(np.log(salary) / np.log(GAMMA)).astype(np.int64) - FIRST_BUCKET
+    return np.clip(index, 0, BUCKETS - 1)
+
+
+def bucket_value(index):
+    # The point of each bucket equidistant, relatively, from its edges
+    return 2 * GAMMA ** (np.asarray(index) + FIRST_BUCKET) / (GAMMA + 1)
+
+
+def quantiles(counts, percentiles=PERCENTILES):
+    """Percentiles of each row of bucket ``counts``; NaN for empty rows."""
+    counts = np.asarray(counts)
+    cumulative = np.cumsum(counts, axis=-1)
+    n = cumulative[..., -1:]
+    rank = np.asarray(percentiles) / 100 * np.maximum(n - 1, 0)
+    index = (cumulative[..., None, :] <= rank[..., None]).sum(axis=-1)
+    return np.where(n > 0, bucket_value(np.minimum(index, BUCKETS - 1)), np.nan)
+
+
+class PaySketch:
+    """Monthly salary sketches per (department, job level, gender).
+
+    Each key keeps a histogram over log-spaced buckets GAMMA apart, so any
+    percentile read from it is within SKETCH_ACCURACY of the true salary,
+    and log-salary moments (count, sum, sum of squares) for the pay-gap
+    regression. Both are plain counts and sums: sketches for a division, a
+    level or the whole company are the sums of their keys' sketches,
+    without going back to salaries, and rows can be added or retracted
+    later like Summary's.
+    """
+
+    def __init__(self, snapshot):
+        bounds = month_ordinal([snapshot['month'].min(), snapshot['month'].max()])
+        self.first_month = int(bounds[0])
+        self.n_months = int(bounds[1]) - self.first_month + 1
+        self.keys = {}
+        self.attributes = pd.DataFrame({'department': [], 'level': [], 'gender': []}, dtype=object)
+        self.counts = np.zeros((0, self.n_months, BUCKETS), dtype=np.int32)
+        self.moments = np.zeros((0, self.n_months, 3))
+        self.add(snapshot)
+
+    def add(self, rows, sign=1):
+        """Add (or with ``sign=-1`` retract) the salaries of snapshot rows."""
+        if not len(rows):
+            return
+        salary = rows['salary'].to_numpy(dtype=np.float64)
+        paid = ~rows['terminated'].to_numpy() & (salary > 0)
+        if not paid.any():
+            return
+        rows, salary = rows[paid], salary[paid]
+        month = month_ordinal(rows['month']) - self.first_month
+        if month.min() < 0:
+            raise ValueError('rows precede the first month of the sketch')
+        if month.max() >= self.n_months:
+            self._grow(int(month.max()) + 1 - self.n_months)
+        inverse, found = pd.factorize(pd.MultiIndex.from_arrays([
+            rows['department'].astype(object), rows['level'].astype(object).fillna(UNLEVELLED),
+            rows['gender'].astype(object).fillna(UNKNOWN_GENDER)]))
+        codes = np.array([self._key(key) for key in found], dtype=np.int64)[inverse]
+        self._fit()
+
+        # Each batch touches few cells, so add the distinct ones in place
+        # rather than bincounting over the whole array
+        cell = codes * self.n_months + month
+        touched, count = np.unique(cell * BUCKETS + pay_bucket(salary), return_counts=True)
+        self.counts.reshape(-1)[touched] += (sign * count).astype(np.int32)
+        log_pay = np.log(salary)
+        cells, position = np.unique(cell, return_inverse=True)
+        moments = self.moments.reshape(-1, 3)
+        for k, weights in enumerate([None, log_pay, log_pay ** 2]):
+            moments[cells, k] += sign * np.bincount(position, weights=weights, minlength=len(cells))
+
+    def month_position(self, value):
+        position = month_ordinal([pd.Timestamp(value)])[0] - self.first_month
+        return int(np.clip(position, 0, self.n_months - 1))
+
+    def merged(self, by, departments=None, end=None, divisions=None):
+        """Sketches as of ``end`` merged over every attribute not in ``by``.
+
+        ``by`` names attributes of the keys: department, level, gender, and
+        division (looked up in ``divisions``). Returns the group labels, one
+        column per attribute, their bucket counts and their log-pay moments.
+        """
+        month = self.n_months - 1 if end is None else self.month_position(end)
+        attributes = self.attributes.assign(division=self.attributes['department'].map(
+            lambda department: (divisions or {}).get(department, OTHER_DIVISION)))
+        keep = np.ones(len(attributes), dtype=bool)
+        if departments is not None:
+            keep = attributes['department'].isin(list(departments)).to_numpy()
+        rows = np.flatnonzero(keep & (self.moments[:, month, 0] > 0))
+        selected = attributes.iloc[rows][list(by)]
+        codes, labels = pd.factorize(pd.MultiIndex.from_frame(selected), sort=True)
+        counts = np.zeros((len(labels), BUCKETS), dtype=np.int64)
+        moments = np.zeros((len(labels), 3))
+        np.add.at(counts, codes, self.counts[rows, month])
+        np.add.at(moments, codes, self.moments[rows, month])
+        return pd.DataFrame(list(labels), columns=list(by)), counts, moments
+
+    def _key(self, key):
+        row = self.keys.get(key)
+        if row is None:
+            row = self.keys[key] = len(self.keys)
+        return row
+
+    def _fit(self):
+        # Zero cells for keys added since the last call
+        missing = len(self.keys) - len(self.counts)
+        if missing:
+            new = pd.DataFrame(list(self.keys)[-missing:], columns=self.attributes.columns, dtype=object)
+            self.attributes = pd.concat([self.attributes, new], ignore_index=True)
+            self.counts = np.concatenate([self.counts, np.zeros((missing,) + self.counts.shape[1:], np.int32)])
+            self.moments = np.concatenate([self.moments, np.zeros((missing,) + self.moments.shape[1:])])
+
+    def _grow(self, months):
+        self.counts = np.concatenate([self.counts, np.zeros((len(self.counts), months, BUCKETS), np.int32)], axis=1)
+        self.moments = np.concatenate([self.moments, np.zeros((len(self.moments), months, 3))], axis=1)
+        self.n_months += months
+
+
+def pay_distribution(sketch, by='department', level=None, departments=None, end=None, divisions=None):
+    """Salary percentiles per ``by`` (department or division) and gender, for one job level or all."""
+    labels, counts, moments = sketch.merged(['level', by, 'gender'] if level else [by, 'gender'],
+                                            departments, end, divisions)
+    if level:
+        chosen = (labels['level'] == level).to_numpy()
+        labels, counts, moments = labels[chosen].drop(columns='level'), counts[chosen], moments[chosen]
+    values = quantiles(counts)
+    df = pd.DataFrame({
+        'Group': labels[by].to_numpy(),
+        'Gender': labels['gender'].to_numpy(),
+        'Employees': moments[:, 0].astype(np.int64),
+    })
+    for p, column in zip(PERCENTILES, values.T):
+        df[f'P{p}'] = column.round(-2)
+    return df.reset_index(drop=True)
+
+
+def compa_ratios(sketch, bands, departments=None, end=None):
+    """Median compa-ratio and the share paid outside the band, per job level and gender.
+
+    ``bands`` is the pay_bands reference table (Level, Band Min, Band Max);
+    the compa-ratio is salary over the band midpoint. Levels without a band
+    are left out.
+    """
+    labels, counts, moments = sketch.merged(['level', 'gender'], departments, end)
+    bands = bands.set_index('Level').reindex(labels['level'])
+    has_band = bands['Band Min'].notna().to_numpy()
+    labels, counts, moments, bands = labels[has_band], counts[has_band], moments[has_band], bands[has_band]
+    low, high = bands['Band Min'].to_numpy(np.float64), bands['Band Max'].to_numpy(np.float64)
+    # Employees in buckets before each one
+    before = np.pad(np.cumsum(counts, axis=1), [(0, 0), (1, 0)])
+    n = moments[:, 0]
+    rows = np.arange(len(counts))
+    below = before[rows, pay_bucket(low)]
+    above = n - before[rows, pay_bucket(high) + 1]
+    median = quantiles(counts, [50])[:, 0]
+    df = pd.DataFrame({
+        'Level': labels['level'].to_numpy(),
+        'Gender': labels['gender'].to_numpy(),
+        'Employees': n.astype(np.int64),
+        'Median Salary': median.round(-2),
+        'Compa-Ratio': ratio(median, (low + high) / 2).round(2),
+        'Below Band': (ratio(below, n) * 100).round(1),
+        'Above Band': (ratio(above, n) * 100).round(1),
+    })
+    order = {level: k for k, level in enumerate(bands.index.unique())}
+    return df.sort_values('Level', key=lambda level: level.map(order), kind='stable').reset_index(drop=True)
+
+
+def pay_gap(sketch, departments=None, end=None):
+    """Raw and adjusted gender pay gaps against the largest gender group.
+
+    The adjusted gap is the gender coefficient of a regression of log
+    salary on gender, department and job level. Those regressors are
+    constant within a sketch key, so weighted least squares over the keys'
+    mean log pay, weighted by headcount, gives the same coefficients as
+    regressing every employee, and the moments give the residual variance
+    for the 95% interval. Gaps are percent of the reference group's pay;
+    negative means paid less.
+    """
+    labels, _, moments = sketch.merged(['department', 'level', 'gender'], departments, end)
+    n, total, squares = moments.T
+    employees = pd.Series(n).groupby(labels['gender'].to_numpy()).sum()
+    reference = employees.idxmax() if len(employees) else None
+    others = [gender for gender in employees.index if gender != reference]
+    if not others:
+        return pd.DataFrame(columns=['Gender', 'Employees', 'Raw Gap', 'Adjusted Gap', 'CI Low', 'CI High'])
+
+    mean = total / n
+    dummies = [pd.get_dummies(labels[column], drop_first=True, dtype=np.float64)
+               for column in ('department', 'level')]
+    gender = pd.DataFrame({other: (labels['gender'] == other).to_numpy(np.float64) for other in others})
+    design = np.column_stack([np.ones(len(labels)), gender] + [d.to_numpy() for d in dummies])
+    weight = np.sqrt(n)
+    coefficients, _, rank, _ = np.linalg.lstsq(design * weight[:, None], mean * weight, rcond=None)
+    residual = (squares - total * mean).sum() + (n * (mean - design @ coefficients) ** 2).sum()
+    variance = residual / max(n.sum() - rank, 1)
+    covariance = variance * np.linalg.pinv(design.T @ (design * n[:, None]))
+
+    by_gender = pd.Series(total).groupby(labels['gender'].to_numpy()).sum() / employees
+    estimate = coefficients[1:1 + len(others)]
+    error = 1.96 * np.sqrt(np.diag(covariance)[1:1 + len(others)])
+    return pd.DataFrame({
+        'Gender': others,
+        'Employees': employees[others].to_numpy().astype(np.int64),
+        'Raw Gap': (np.expm1(by_gender[others].to_numpy() - by_gender[reference]) * 100).round(1),
+        'Adjusted Gap': (np.expm1(estimate) * 100).round(1),
+        'CI Low': (np.expm1(estimate - error) * 100).round(1),
+        'CI High': (np.expm1(estimate + error) * 100).round(1),
+    }).assign(Reference=reference)
+
+
+def pay_tables(sketch, bands, by='department', level=None, departments=None, end=None, divisions=None):
+    """Salary percentiles, compa-ratios and gender pay gaps for one dashboard view."""
+    return (pay_distribution(sketch, by, level, departments, end, divisions),
+            compa_ratios(sketch, bands, departments, end),
+            pay_gap(sketch, departments, end))
@@ -0,0 +1,138 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+# Set HR_PROFILE=1 to profile every rerun of every session; spans are
+# appended to HR_PROFILE_LOG as JSON lines
+PROFILE_ENV = 'HR_PROFILE'
+PROFILE_LOG = os.environ.get('HR_PROFILE_LOG') or os.path.join(os.environ.get('HR_DATA_DIR', 'data'),
+                                                               'profile.jsonl')
+
+_current = contextvars.ContextVar('span', default=None)
+_log_lock = threading.Lock()
+
+
+def enabled_by_env():
+    return os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def annotate(**attrs):
+    """Set attributes on the innermost open span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+def count(name, n=1):
+    """Add ``n`` to a counter on the innermost open span, if any."""
+    span = _current.get()
+    if span is not None:
+        span.attrs[name] = span.attrs.get(name, 0) + n
+
+
+class Span:
+    def __init__(self, profiler, name, attrs):
+        self.profiler = profiler
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.depth = 0
+        self.start = self.end = None
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self.depth = 0 if self.parent is None else self.parent.depth + 1
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.end = time.perf_counter()
+        _current.reset(self._token)
+        self.profiler.spans.append(self)
+
+    @property
+    def ms(self):
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+
+class _Off:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        pass
+
+
+_OFF = _Off()
+
+
+class Profiler:
+    """Timed spans of one script run.
+
+    ``span(name)`` times a block on the monotonic clock and nests under the
+    enclosing span; ``section(name)`` closes the previous top-level section
+    and opens the next, for timing a linear script without re-indenting it.
+    annotate() and count() attach attributes (cache hits and misses, payload
+    bytes) to whichever span is open. A disabled profiler hands out a shared
+    no-op context, so instrumented code costs nothing by default.
+    """
+
+    def __init__(self, enabled=False, session=None):
+        self.enabled = enabled
+        self.session = session
+        self.run = uuid.uuid4().hex[:12]
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._section = None
+        # A previous run on this thread may have stopped (st.rerun, st.stop)
+        # with spans still open
+        _current.set(None)
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return _OFF
+        return Span(self, name, attrs)
+
+    def section(self, name, **attrs):
+        if not self.enabled:
+            return
+        self.finish()
+        self._section = self.span(name, **attrs)
+        self._section.__enter__()
+
+    def finish(self):
+        if self._section is not None:
+            self._section.__exit__(None, None, None)
+            self._section = None
+
+    def frame(self):
+        """Spans in start order: name, depth, parent, start and duration in ms, attributes."""
+        spans = sorted(self.spans, key=lambda span: span.start)
+        return pd.DataFrame({
+            'Span': [span.name for span in spans],
+            'Depth': [span.depth for span in spans],
+            'Parent': [span.parent.name if span.parent else None for span in spans],
+            'Start ms': [(span.start - self.origin) * 1000 for span in spans],
+            'Duration ms': [span.ms for span in spans],
+            'Attributes': [span.attrs for span in spans],
+        })
+
+    def write(self, path=PROFILE_LOG):
+        """Append this run's spans to ``path``, one JSON object per line."""
+        if not self.spans:
+            return
+        when = time.time()
+        lines = [json.dumps({'ts': when, 'session': self.session, 'run': self.run, 'span': span.name,
+                             'parent': span.parent.name if span.parent else None, 'depth': span.depth,
+                             'start_ms': round((span.start - self.origin) * 1000, 3),
+                             'ms': round(span.ms, 3), **span.attrs}, default=str)
+                 for span in sorted(self.spans, key=lambda span: span.start)]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with _log_lock, open(path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import month_ordinal, month_start, ratio
+
+# Funnel stages in order: ATS stage name -> dashboard label
+STAGES = {'applied': 'Applications', 'phone_screen': 'Phone Screen', 'interview': 'Interview', 'offer': 'Offer',
+          'accepted': 'Accepted'}
+STAGE_LABELS = list(STAGES.values())
+HIRED = len(STAGES) - 1
+# Stages that take a candidate out of the funnel without a hire
+EXITS = ['rejected', 'withdrawn', 'declined']
+EXITED = len(STAGES)
+OPENED = 'opened'
+# Days in a stage and times to fill are counted per day up to a year;
+# longer ones share the last bucket
+MAX_DAYS = 365
+UNKNOWN_SOURCE = 'Unknown'
+REQUISITION_COLUMNS = ['department', 'opened', 'filled', 'cost'] + STAGE_LABELS
+
+
+def stage_codes(stages):
+    # Funnel position of each ATS stage name, EXITED for exits, -1 otherwise
+    codes = {**{name: k for k, name in enumerate(STAGES)}, **{name: EXITED for name in EXITS}}
+    stages = pd.Categorical(stages)
+    lookup = np.array([codes.get(str(name).lower(), -1) for name in stages.categories] + [-1], dtype=np.int64)
+    return lookup[stages.codes]
+
+
+def day_percentiles(counts, percentiles):
+    """Percentiles of per-day histograms (rows of ``counts``) in days; NaN for empty rows."""
+    cumulative = np.cumsum(counts, axis=-1)
+    n = cumulative[..., -1:]
+    rank = np.ceil(np.asarray(percentiles) / 100 * n)
+    days = (cumulative[..., None, :] < np.maximum(rank, 1)[..., None]).sum(axis=-1)
+    return np.where(n > 0, days, np.nan)
+
+
+class FunnelSummary:
+    """Recruiting funnel cells per (month, department) from ATS stage events.
+
+    Each cell counts candidates entering every stage, applications and
+    accepted offers by source, recruiting cost, and per-day histograms of
+    the time candidates spent in each stage (by the month they left it) and
+    of time to fill (by the month of the first accepted offer). Filtering
+    the dashboard only sums cells. Between batches it keeps the latest
+    stage of every candidate still in the funnel, so a stage's duration is
+    known when the candidate's next event arrives, and one row per
+    requisition. A candidate's events are expected in date order across
+    batches, which reading the store month by month provides.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.months = np.zeros(0, dtype=np.int64)
+        self.departments = np.zeros(0, dtype=object)
+        self.sources = pd.Index([UNKNOWN_SOURCE], dtype=object)
+        self.entered = np.zeros((0, len(STAGES)), dtype=np.int64)
+        self.stage_days = np.zeros((0, HIRED, MAX_DAYS + 1), dtype=np.int32)
+        self.fill_days = np.zeros((0, MAX_DAYS + 1), dtype=np.int32)
+        self.cost = np.zeros(0)
+        self.applied = np.zeros((0, 1), dtype=np.int64)
+        self.hired = np.zeros((0, 1), dtype=np.int64)
+        self.candidates = pd.DataFrame(
+            {'stage': np.zeros(0, np.int64), 'day': np.zeros(0, np.int64), 'source': np.zeros(0, np.int64)},
+            index=pd.MultiIndex.from_arrays([np.zeros(0, np.int64)] * 2, names=['requisition_id', 'candidate_id']))
+        self.requisitions = pd.DataFrame({
+            'department': pd.Series(dtype=object), 'opened': pd.Series(dtype='datetime64[ns]'),
+            'filled': pd.Series(dtype='datetime64[ns]'), 'cost': pd.Series(dtype=np.float64),
+            **{label: pd.Series(dtype=np.int64) for label in STAGE_LABELS}})
+        self.requisitions.index.name = 'requisition_id'
+
+    def __len__(self):
+        return int(self.entered.sum())
+
+    def add(self, events):
+        """Fold in a DataFrame of ATS events (APPLICATION_COLUMN_TYPES columns)."""
+        events = events[events['requisition_id'].notna().to_numpy()]
+        if not len(events):
+            return
+        code = stage_codes(events['stage'])
+        day = pd.to_datetime(events['event_date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        department = events['department'].astype(object).to_numpy()
+        requisition = events['requisition_id'].to_numpy(np.int64)
+        cell = self._cells(day, department)
+        self._requisitions(events, code, day, department, requisition, cell)
+
+        candidate = (code >= 0) & events['candidate_id'].notna().to_numpy()
+        if not candidate.any():
+            return
+        events, code, day, cell = events[candidate], code[candidate], day[candidate], cell[candidate]
+        source = np.full(len(events), -1, dtype=np.int64)
+        named = events['source'].notna().to_numpy()
+        if named.any():
+            names = events['source'].astype(object).to_numpy()[named]
+            self.sources = self.sources.append(pd.Index(pd.unique(names)).difference(self.sources))
+            source[named] = self.sources.get_indexer(names)
+            self._fit()
+        new = pd.DataFrame({'stage': code, 'day': day, 'source': source, 'cell': cell},
+                           index=pd.MultiIndex.from_arrays(
+                               [requisition[candidate], events['candidate_id'].to_numpy(np.int64)],
+                               names=['requisition_id', 'candidate_id']))
+
+        # Each candidate's new events after its state from earlier batches,
+        # in date and then funnel order
+        prior = self.candidates[self.candidates.index.isin(new.index.unique())].assign(cell=-1)
+        rows = pd.concat([prior, new])
+        keys = rows.index
+        req, cand = keys.get_level_values(0).to_numpy(), keys.get_level_values(1).to_numpy()
+        order = np.lexsort((rows['stage'].to_numpy(), rows['day'].to_numpy(), cand, req))
+        req, cand = req[order], cand[order]
+        stage, day = rows['stage'].to_numpy()[order], rows['day'].to_numpy()[order]
+        source, cell = rows['source'].to_numpy()[order], rows['cell'].to_numpy()[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (req[1:] != req[:-1]) | (cand[1:] != cand[:-1])
+        last = np.roll(first, -1)
+        # A candidate's source is the latest one given on or before each row
+        given = np.where((source >= 0) | first, np.arange(len(order)), 0)
+        source = source[np.maximum.accumulate(given)]
+        source = np.where(source >= 0, source, 0)
+        fresh = cell >= 0
+
+        # Time in the previous stage, ended by this event
+        ended = fresh & ~first
+        ended[ended] = np.roll(stage, 1)[ended] < HIRED
+        previous = np.roll(stage, 1)[ended]
+        days = np.clip(day[ended] - np.roll(day, 1)[ended], 0, MAX_DAYS)
+        np.add.at(self.stage_days, (cell[ended], previous, days), 1)
+
+        reached = fresh & (stage < EXITED)
+        np.add.at(self.entered, (cell[reached], stage[reached]), 1)
+        np.add.at(self.applied, (cell[fresh & (stage == 0)], source[fresh & (stage == 0)]), 1)
+        np.add.at(self.hired, (cell[fresh & (stage == HIRED)], source[fresh & (stage == HIRED)]), 1)
+        self._stage_counts(req[reached], stage[reached])
+        self._fills(req[fresh & (stage == HIRED)], day[fresh & (stage == HIRED)], cell[fresh & (stage == HIRED)])
+
+        # Candidates still in the funnel carry their latest stage forward
+        open_rows = last & (stage < HIRED)
+        state = pd.DataFrame({'stage': stage[open_rows], 'day': day[open_rows], 'source': source[open_rows]},
+                             index=pd.MultiIndex.from_arrays([req[open_rows], cand[open_rows]],
+                                                             names=['requisition_id', 'candidate_id']))
+        self.candidates = pd.concat([self.candidates[~self.candidates.index.isin(new.index.unique())], state])
+
+    def _cells(self, day, department):
+        month = day.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        names, codes = np.unique(department.astype(str), return_inverse=True)
+        pairs, pair = np.unique(month * len(names) + codes, return_inverse=True)
+        rows = np.array([self._cell(p // len(names), names[p % len(names)]) for p in pairs], dtype=np.int64)
+        self._fit()
+        return rows[pair]
+
+    def _cell(self, month, department):
+        key = (int(month), department)
+        row = self.cells.get(key)
+        if row is None:
+            row = self.cells[key] = len(self.cells)
+        return row
+
+    def _fit(self):
+        # Zero cells for (month, department) pairs and sources added since the last call
+        missing = len(self.cells) - len(self.entered)
+        if missing:
+            new = list(self.cells)[-missing:]
+            self.months = np.concatenate([self.months, [month for month, _ in new]])
+            self.departments = np.concatenate([self.departments, np.array([d for _, d in new], dtype=object)])
+            for name in ['entered', 'stage_days', 'fill_days', 'cost', 'applied', 'hired']:
+                cells = getattr(self, name)
+                setattr(self, name, np.concatenate([cells, np.zeros((missing,) + cells.shape[1:], cells.dtype)]))
+        grow = len(self.sources) - self.applied.shape[1]
+        if grow > 0:
+            self.applied = np.pad(self.applied, [(0, 0), (0, grow)])
+            self.hired = np.pad(self.hired, [(0, 0), (0, grow)])
+
+    def _requisitions(self, events, code, day, department, requisition, cell):
+        # Opening dates, departments and costs of the requisitions in a batch
+        known = pd.Index(np.unique(requisition)).difference(self.requisitions.index)
+        if len(known):
+            first = pd.Series(department, index=requisition).groupby(level=0).first()
+            new = pd.DataFrame({'department': first[known].to_numpy(), 'opened': pd.NaT, 'filled': pd.NaT,
+                                'cost': 0.0, **{label: 0 for label in STAGE_LABELS}},
+                               index=known.rename('requisition_id'))
+            self.requisitions = pd.concat([self.requisitions, new.astype(self.requisitions.dtypes.to_dict())])
+        opened = events['stage'].astype(object).to_numpy() == OPENED
+        if opened.any():
+            dates = pd.Series(day[opened].astype('datetime64[D]'), index=requisition[opened]).groupby(level=0).min()
+            current = self.requisitions.loc[dates.index, 'opened']
+            self.requisitions.loc[dates.index, 'opened'] = current.where(current < dates, dates.astype('datetime64[ns]'))
+        cost = events['cost'].to_numpy(np.float64, na_value=np.nan)
+        spent = ~np.isnan(cost)
+        if spent.any():
+            np.add.at(self.cost, cell[spent], cost[spent])
+            by_requisition = pd.Series(cost[spent], index=requisition[spent]).groupby(level=0).sum()
+            self.requisitions.loc[by_requisition.index, 'cost'] += by_requisition
+
+    def _stage_counts(self, requisition, stage):
+        counts = np.zeros((len(self.requisitions), len(STAGES)), dtype=np.int64)
+        np.add.at(counts, (self.requisitions.index.get_indexer(requisition), stage), 1)
+        self.requisitions[STAGE_LABELS] += counts
+
+    def _fills(self, requisition, day, cell):
+        # A requisition is filled by its first accepted offer
+        if not len(requisition):
+            return
+        first = pd.DataFrame({'day': day, 'cell': cell}, index=requisition).sort_values('day').groupby(level=0).first()
+        first = first[self.requisitions.loc[first.index, 'filled'].isna().to_numpy()]
+        filled = first['day'].to_numpy().astype('datetime64[D]').astype('datetime64[ns]')
+        self.requisitions.loc[first.index, 'filled'] = filled
+        opened = self.requisitions.loc[first.index, 'opened'].to_numpy()
+        known = ~np.isnat(opened)
+        days = np.clip((filled[known] - opened[known]).astype('timedelta64[D]').astype(np.int64), 0, MAX_DAYS)
+        np.add.at(self.fill_days, (first['cell'].to_numpy()[known], days), 1)
+
+
+def funnel_tables(funnel, departments=None, start=None, end=None):
+    """Funnel, monthly recruiting metrics, stage timing, source yield and requisitions for one dashboard view.
+
+    The funnel and the monthly metrics match the recruitment_funnel and
+    recruitment_metrics reference tables, plus a Conversion column (percent
+    of the previous stage). Time to Fill is the median days from opening to
+    the first accepted offer of requisitions filled that month.
+    Requisitions are those open at some point between ``start`` and
+    ``end``, longest open first.
+    """
+    lo = month_ordinal([pd.Timestamp(start)])[0] if start is not None else funnel.months.min(initial=0)
+    hi = month_ordinal([pd.Timestamp(end)])[0] if end is not None else funnel.months.max(initial=0)
+    selected = (funnel.months >= lo) & (funnel.months <= hi)
+    if departments is not None:
+        selected &= np.isin(funnel.departments, list(departments))
+    rows = np.flatnonzero(selected)
+
+    count = funnel.entered[rows].sum(axis=0)
+    recruitment_funnel = pd.DataFrame({
+        'Stage': STAGE_LABELS,
+        'Count': count,
+        'Conversion': np.concatenate([[np.nan], ratio(count[1:], count[:-1]) * 100]).round(1),
+    })
+
+    months, month = np.unique(funnel.months[rows], return_inverse=True)
+    entered = np.zeros((len(months), len(STAGES)), dtype=np.int64)
+    fills = np.zeros((len(months), MAX_DAYS + 1), dtype=np.int64)
+    np.add.at(entered, month, funnel.entered[rows])
+    np.add.at(fills, month, funnel.fill_days[rows])
+    cost = np.bincount(month, weights=funnel.cost[rows], minlength=len(months))
+    recruitment_metrics = pd.DataFrame({
+        'Month': pd.DatetimeIndex(month_start(months)).strftime('%b %Y'),
+        'Applications': entered[:, 0],
+        'Hires': entered[:, HIRED],
+        'Time to Fill': day_percentiles(fills, [50])[:, 0],
+        'Cost per Hire': np.where(entered[:, HIRED] > 0, ratio(cost, entered[:, HIRED]), np.nan).round(0),
+    })
+
+    durations = funnel.stage_days[rows].sum(axis=0, dtype=np.int64)
+    timing = day_percentiles(durations, [50, 90])
+    stage_timing = pd.DataFrame({
+        'Stage': STAGE_LABELS[:HIRED],
+        'Median Days': timing[:, 0],
+        'P90 Days': timing[:, 1],
+        'Candidates': durations.sum(axis=1),
+    })
+
+    applied, hired = funnel.applied[rows].sum(axis=0), funnel.hired[rows].sum(axis=0)
+    source_yield = pd.DataFrame({
+        'Source': funnel.sources.to_numpy(),
+        'Applications': applied,
+        'Hires': hired,
+        'Yield': (ratio(hired, applied) * 100).round(2),
+        'Share of Hires': (ratio(hired, hired.sum()) * 100).round(1),
+    })[(applied > 0) | (hired > 0)].sort_values('Hires', ascending=False, kind='stable').reset_index(drop=True)
+
+    requisitions = funnel.requisitions
+    first, last = month_start([lo])[0], month_start([hi + 1])[0] - np.timedelta64(1, 'D')
+    keep = ~(requisitions['opened'] > last).to_numpy() & ~(requisitions['filled'] < first).to_numpy()
+    if departments is not None:
+        keep &= requisitions['department'].isin(list(departments)).to_numpy()
+    requisitions = requisitions[keep]
+    until = requisitions['filled'].where(requisitions['filled'] <= last, last)
+    requisitions = requisitions.assign(**{'Days Open': (until - requisitions['opened']).dt.days})
+    requisitions = requisitions.reset_index().rename(columns={
+        'requisition_id': 'Requisition', 'department': 'Department', 'opened': 'Opened', 'filled': 'Filled',
+        'cost': 'Cost'})
+    requisitions = requisitions.sort_values(['Days Open', 'Requisition'], ascending=[False, True], kind='stable',
+                                            na_position='last')
+    return (recruitment_funnel, recruitment_metrics, stage_timing, source_yield,
+            requisitions.reset_index(drop=True))
+
+
+def funnel_reference(reference, funnel, departments=None, start=None, end=None):
+    """``reference`` with the recruitment tables taken from ATS events once there are any."""
+    if not len(funnel):
+        return reference
+    recruitment_funnel, recruitment_metrics, *_ = funnel_tables(funnel, departments, start, end)
+    return {**reference, 'recruitment_funnel': recruitment_funnel, 'recruitment_metrics': recruitment_metrics}
@@ -0,0 +1,177 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregation import TENURE_EDGES, bucket, ratio
+
+# Additive log-odds of leaving within a year. The department term is the
+# logit of its trailing-twelve-month turnover; employees then move off it by
+# tenure band, rating (index 0 = unrated), satisfaction and pay against the
+# department's market salary.
+TENURE_RISK = np.array([0.9, 0.4, 0.0, -0.2, -0.4], dtype=np.float32)
+RATING_RISK = np.array([0.0, 0.7, 0.35, 0.0, -0.1, 0.15], dtype=np.float32)
+SATISFACTION_RISK = np.float32(-0.5)  # per point above 4
+PAY_RISK = np.float32(2.0)  # per unit of log(market / salary)
+
+RISK_LEVELS = ['Low', 'Medium', 'High', 'Critical']
+RISK_EDGES = [0.10, 0.20, 0.35]
+BATCH = 1 << 18
+
+
+def log_pay(values):
+    """float32 log of a salary, NaN where it is missing or not positive."""
+    values = np.asarray(values, dtype=np.float32)
+    with np.errstate(invalid='ignore'):
+        return np.log(np.where(values > 0, values, np.nan)).astype(np.float32)
+
+
+def employee_logit(rows):
+    """Employee part of the risk log-odds, in float32 batches of BATCH rows.
+
+    Pay is left out: it is scored against the department's market salary
+    in ``RiskScores.scores``.
+    """
+    out = np.empty(len(rows), dtype=np.float32)
+    tenure = rows['tenure'].to_numpy(np.float32)
+    rating = rows['rating'].to_numpy()
+    satisfaction = rows['satisfaction'].to_numpy(np.float32)
+    for lo in range(0, len(rows), BATCH):
+        part = slice(lo, lo + BATCH)
+        sat = np.nan_to_num(satisfaction[part] - 4, nan=0)
+        out[part] = (TENURE_RISK[bucket(TENURE_EDGES, tenure[part])]
+                     + RATING_RISK[np.clip(rating[part], 0, 5)]
+                     + SATISFACTION_RISK * sat)
+    return out
+
+
+class RiskScores:
+    """Per-employee attrition risk kept in step with an IncrementalSummary.
+
+    The employee part of each score depends only on that employee's latest
+    row, so after a refresh only the employees the batch touched are
+    rescored; the department part is a handful of numbers recomputed per
+    view and broadcast on read.
+    """
+
+    def __init__(self):
+        self.frame = pd.DataFrame({
+            'department': pd.Series([], dtype='category'),
+            'tenure_band': pd.Series([], dtype=np.int8),
+            'rating': pd.Series([], dtype=np.int8),
+            'logit': pd.Series([], dtype=np.float32),
+            'log_salary': pd.Series([], dtype=np.float32),
+        }, index=pd.Index([], dtype=np.int64, name='employee_id'))
+        self.generation = -1
+        self.lock = threading.Lock()
+
+    def update(self, live):
+        """Rescore the employees changed since the last update; returns how many."""
+        # The summary's lock first, the order app.py's callers take them in
+        with live.lock, self.lock:
+            changed = live.changed_since(self.generation)
+            rows = live.latest(changed)
+            scored = self._score(rows[~rows['terminated']])
+            if changed is None:
+                self.frame = scored
+            elif len(changed):
+                kept = self.frame.drop(changed, errors='ignore')
+                departments = kept['department'].cat.categories.union(scored['department'].cat.categories)
+                self.frame = pd.concat([kept.astype({'department': pd.CategoricalDtype(departments)}),
+                                        scored.astype({'department': pd.CategoricalDtype(departments)})])
+            self.generation = live.generation
+            return len(rows)
+
+    def _score(self, rows):
+        return pd.DataFrame({
+            'department': rows['department'].astype('category'),
+            'tenure_band': bucket(TENURE_EDGES, rows['tenure'].to_numpy(np.float32)).astype(np.int8),
+            'rating': rows['rating'].to_numpy(np.int8),
+            'logit': employee_logit(rows),
+            'log_salary': log_pay(rows['salary'].to_numpy(np.float32)),
+        }, index=rows.index)
+
+    def scores(self, department_logit, market):
+        """Probability of leaving within a year, float32, aligned with ``frame``.
+
+        ``market`` is the log market salary per department; the pay term
+        is PAY_RISK * log(market / salary) and zero where either is missing.
+        """
+        department = self.frame['department']
+        codes = department.cat.codes.to_numpy()
+        shift = department_logit.reindex(department.cat.categories).to_numpy(np.float32)
+        market = market.reindex(department.cat.categories).to_numpy(np.float32)
+        pay = np.nan_to_num(market[codes] - self.frame['log_salary'].to_numpy(), nan=0)
+        logit = self.frame['logit'].to_numpy() + shift[codes] + PAY_RISK * pay
+        return (1 / (1 + np.exp(-logit))).astype(np.float32)
+
+
+def reporting_month(summary, end=None):
+    return summary.n_months - 1 if end is None else summary.month_position(end)
+
+
+def department_logit(summary, end=None):
+    """Department part of the risk log-odds at the reporting month."""
+    last = reporting_month(summary, end)
+    year = slice(max(last - 11, 0), last + 1)
+    leavers = summary.leavers[:, year].sum(axis=1)
+    headcount = summary.headcount[:, year].mean(axis=1)
+    turnover = np.clip(ratio(leavers, headcount) * 12 / (year.stop - year.start), 0.01, 0.9)
+    return pd.Series(np.log(turnover / (1 - turnover)), index=summary.departments)
+
+
+def market_pay(summary, compensation_trend, end=None):
+    """Log market salary per department at the reporting month, NaN without salary data.
+
+    Market pay for a department is its average salary scaled by the latest
+    market-to-company ratio in compensation_trend.
+    """
+    last = reporting_month(summary, end)
+    market = compensation_trend.dropna(subset=['Avg Salary', 'Market Rate'])
+    market_ratio = (market['Market Rate'] / market['Avg Salary']).iloc[-1] if len(market) else 1.0
+    salary = ratio(summary.salary_sum[:, last], summary.salary_n[:, last]) * market_ratio
+    return pd.Series(log_pay(salary), index=summary.departments)
+
+
+def risk_tables(risk, summary, compensation_trend, departments=None, end=None):
+    """Risk distribution by department and the segments behind the recommendations.
+
+    ``risk_distribution`` counts current employees per department and risk
+    level. ``risk_segments`` has the riskiest department, first-year hires
+    and top performers (rating 4+) with their size, mean risk and number at
+    High or Critical risk.
+    """
+    with risk.lock:
+        frame = risk.frame
+        score = risk.scores(department_logit(summary, end), market_pay(summary, compensation_trend, end))
+    if departments is not None:
+        keep = frame['department'].isin(departments).to_numpy()
+        frame, score = frame[keep], score[keep]
+    if not len(frame):
+        return None
+    level = bucket(RISK_EDGES, score)
+    high = level >= RISK_LEVELS.index('High')
+    names = frame['department'].cat.categories
+    codes = frame['department'].cat.codes.to_numpy().astype(np.int64)
+
+    counts = np.bincount(codes * len(RISK_LEVELS) + level, minlength=len(names) * len(RISK_LEVELS))
+    counts = counts.reshape(len(names), len(RISK_LEVELS))
+    present = counts.sum(axis=1) > 0
+    risk_distribution = pd.DataFrame(counts[present], index=pd.Index(names[present], name='Department'),
+                                     columns=RISK_LEVELS).reset_index().melt(
+        id_vars='Department', var_name='Risk Level', value_name='Employees')
+
+    mean_risk = ratio(np.bincount(codes, weights=score, minlength=len(names)), counts.sum(axis=1))
+    riskiest = int(np.argmax(np.where(present, mean_risk, -1)))
+    segments = {
+        f'{names[riskiest]} Dept': codes == riskiest,
+        'First Year': frame['tenure_band'].to_numpy() == 0,
+        'Top Performers': frame['rating'].to_numpy() >= 4,
+    }
+    risk_segments = pd.DataFrame({
+        'Segment': list(segments),
+        'Employees': [int(mask.sum()) for mask in segments.values()],
+        'Avg Risk': [round(float(score[mask].mean()) * 100, 1) if mask.any() else 0.0 for mask in segments.values()],
+        'High Risk': [int((high & mask).sum()) for mask in segments.values()],
+    })
+    return risk_distribution, risk_segments
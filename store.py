@@ -0,0 +1,452 @@
+import os
+import shutil
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Columns we type explicitly when parsing HRIS exports. Anything else in the
+# CSV (names, emails, managers, ...) is kept as-is and simply never projected.
+EVENT_COLUMN_TYPES = {
+    'employee_id': pa.int64(),
+    'event_date': pa.date32(),
+    'event_type': pa.string(),
+    'department': pa.string(),
+    'team': pa.string(),
+    'level': pa.string(),  # job level, matching the pay_bands reference table
+    'salary': pa.float64(),
+    'gender': pa.string(),
+    'birth_date': pa.date32(),
+    'rating': pa.int8(),
+    'satisfaction': pa.float32(),
+    'category': pa.string(),
+    'reason': pa.string(),
+    'source': pa.string(),  # recruitment source, on hire events
+    'fte': pa.float32(),  # full-time equivalent, on hires and hours changes; none means full time
+}
+
+# Engagement survey responses, one row per respondent per question. The
+# respondent id is the survey tool's anonymous token, never an employee id;
+# scores are 1-5 Likert answers (0-10 for the recommend question).
+RESPONSE_COLUMN_TYPES = {
+    'respondent_id': pa.int64(),
+    'response_date': pa.date32(),
+    'department': pa.string(),
+    'question': pa.string(),
+    'score': pa.int8(),
+}
+
+# Applicant tracking (ATS) stage events, one row per candidate per stage
+# reached, plus an 'opened' row (no candidate) when a requisition opens.
+# Source and cost (ad spend, agency fees, ...) are optional.
+APPLICATION_COLUMN_TYPES = {
+    'requisition_id': pa.int64(),
+    'candidate_id': pa.int64(),
+    'event_date': pa.date32(),
+    'stage': pa.string(),
+    'department': pa.string(),
+    'source': pa.string(),
+    'cost': pa.float64(),
+}
+
+# Low-cardinality string columns stored dictionary-encoded. Department is
+# left a plain string column: Parquet still dictionary-encodes its pages,
+# and pyarrow only prunes row groups by the statistics of plain columns.
+DICTIONARY_COLUMNS = ['event_type', 'level', 'gender', 'category', 'reason', 'source', 'question', 'stage']
+# Rows per row group; batches are sorted by department, so a department
+# filter skips the row groups whose min/max statistics exclude it
+ROW_GROUP_ROWS = 1 << 16
+
+EVENT_TYPES = ['hire', 'termination', 'transfer', 'salary_change', 'review']
+
+PARTITIONING = ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+# The same layout with the partition values read back dictionary-encoded
+DICTIONARY_PARTITIONING = ds.partitioning(
+    pa.schema([('month', pa.dictionary(pa.int32(), pa.string()))]),
+    flavor='hive',
+    dictionaries='infer'
+)
+# Stores written before department moved into the files were partitioned
+# by it too, a file per month x department x batch; compact() rewrites them
+LEGACY_PARTITIONING = ds.partitioning(
+    pa.schema([('month', pa.string()), ('department', pa.string())]),
+    flavor='hive'
+)
+AREAS = ['events', 'responses', 'applications']
+# Written by compact(); holds a fresh token each time files are rewritten
+COMPACTED_FILE = 'COMPACTED'
+
+
+class EventStore:
+    """Columnar store of HRIS events, partitioned by month.
+
+    Layout under ``root``::
+
+        events/month=2024-01/part-*.parquet
+        responses/month=2024-03/part-*.parquet
+        applications/month=2024-01/part-*.parquet
+        reference/<name>.parquet
+
+    Each ingested batch adds a file per month it spans, sorted by
+    department so department filters prune row groups within it.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.events_path = os.path.join(root, 'events')
+        self.responses_path = os.path.join(root, 'responses')
+        self.applications_path = os.path.join(root, 'applications')
+        self.reference_path = os.path.join(root, 'reference')
+
+    def is_empty(self):
+        return not os.path.isdir(self.events_path) or not os.listdir(self.events_path)
+
+    def ingest_csv(self, path, block_size=64 << 20):
+        return self._ingest_csv(path, EVENT_COLUMN_TYPES, self.ingest_table, block_size)
+
+    def ingest_responses_csv(self, path, block_size=64 << 20):
+        return self._ingest_csv(path, RESPONSE_COLUMN_TYPES, self.ingest_responses, block_size)
+
+    def ingest_applications_csv(self, path, block_size=64 << 20):
+        return self._ingest_csv(path, APPLICATION_COLUMN_TYPES, self.ingest_applications, block_size)
+
+    def _ingest_csv(self, path, column_types, ingest, block_size):
+        # Stream the export in blocks so a multi-GB CSV never sits in memory
+        convert_options = pacsv.ConvertOptions(
+            column_types=column_types,
+            strings_can_be_null=True
+        )
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            convert_options=convert_options
+        )
+        rows = 0
+        for batch in reader:
+            rows += ingest(pa.Table.from_batches([batch]))
+        return rows
+
+    def ingest_table(self, table):
+        # An Arrow table of events with (a subset of) EVENT_COLUMN_TYPES columns
+        return self._write(self._prepare_batch(table), self.events_path)
+
+    def ingest_responses(self, table):
+        # An Arrow table of survey responses with RESPONSE_COLUMN_TYPES columns
+        table = conform(table, RESPONSE_COLUMN_TYPES)
+        return self._write(self._prepare_batch(table, 'response_date'), self.responses_path)
+
+    def ingest_applications(self, table):
+        # An Arrow table of ATS stage events with APPLICATION_COLUMN_TYPES columns
+        table = conform(table, APPLICATION_COLUMN_TYPES)
+        return self._write(self._prepare_batch(table), self.applications_path)
+
+    def _write(self, table, path):
+        ds.write_dataset(
+            table,
+            path,
+            format='parquet',
+            partitioning=PARTITIONING,
+            basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            max_rows_per_group=ROW_GROUP_ROWS
+        )
+        return table.num_rows
+
+    def _prepare_batch(self, table, date_column='event_date'):
+        month = pc.strftime(pc.cast(table[date_column], pa.timestamp('s')), format='%Y-%m')
+        table = table.append_column('month', month)
+        keys = [('month', 'ascending')]
+        if 'department' in table.column_names:
+            department = pc.fill_null(pc.cast(table['department'], pa.string()), 'Unassigned')
+            table = table.set_column(table.schema.get_field_index('department'), 'department', department)
+            keys.append(('department', 'ascending'))
+        # A stable sort, so events of one day keep their export order
+        return encode(table.sort_by(keys))
+
+    def dataset(self):
+        return ds.dataset(self.events_path, format='parquet', partitioning=PARTITIONING)
+
+    def read(self, columns=None, start=None, end=None, departments=None, event_types=None):
+        # start/end are inclusive 'YYYY-MM' month keys; month filters prune
+        # whole partitions before any file is opened, department filters the
+        # row groups within them
+        expr = self._expression(start, end, departments, event_types)
+        table = self.dataset().to_table(columns=columns, filter=expr)
+        return table.to_pandas()
+
+    def batches(self, columns=None, start=None, end=None, departments=None, event_types=None,
+                batch_size=64 << 10):
+        # Same filters as read(), streamed as DataFrames of at most batch_size
+        # rows so a large extract never has to fit in memory at once
+        expr = self._expression(start, end, departments, event_types)
+        scanner = self.dataset().scanner(columns=columns, filter=expr, batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def _expression(self, start, end, departments, event_types):
+        expr = None
+        for part in self._filters(start, end, departments, event_types):
+            expr = part if expr is None else expr & part
+        return expr
+
+    def _filters(self, start, end, departments, event_types):
+        if start is not None:
+            yield ds.field('month') >= month_key(start)
+        if end is not None:
+            yield ds.field('month') <= month_key(end)
+        if departments is not None:
+            yield ds.field('department').isin(list(departments))
+        if event_types is not None:
+            yield ds.field('event_type').isin(list(event_types))
+
+    def files(self):
+        if self.is_empty():
+            return []
+        return sorted(self.dataset().files)
+
+    def read_files(self, files, columns=None):
+        # Read specific part files, e.g. the ones ingested since a refresh.
+        # Event columns some files lack (older exports had no team) read as null
+        dataset = ds.dataset(list(files), format='parquet', partitioning=PARTITIONING,
+                             partition_base_dir=self.events_path)
+        missing = [name for name in columns or [] if name not in dataset.schema.names]
+        if missing:
+            schema = pa.schema(list(dataset.schema) + [pa.field(name, EVENT_COLUMN_TYPES[name]) for name in missing])
+            dataset = ds.dataset(list(files), schema=schema, format='parquet', partitioning=PARTITIONING,
+                                 partition_base_dir=self.events_path)
+        return dataset.to_table(columns=columns).to_pandas()
+
+    def response_files(self):
+        return area_files(self.responses_path)
+
+    def response_batches(self, files, batch_size=1 << 20):
+        # Responses in the given part files as DataFrames of at most
+        # batch_size rows; question and department come back categorical
+        return area_batches(self.responses_path, files, list(RESPONSE_COLUMN_TYPES), batch_size)
+
+    def application_files(self):
+        return area_files(self.applications_path)
+
+    def application_batches(self, files, batch_size=1 << 20):
+        # ATS events in the given part files, as response_batches() does
+        return area_batches(self.applications_path, files, list(APPLICATION_COLUMN_TYPES), batch_size)
+
+    def legacy_layout(self):
+        # Whether any area still has month=.../department=... directories
+        for area in AREAS:
+            path = os.path.join(self.root, area)
+            for month in os.listdir(path) if os.path.isdir(path) else []:
+                month = os.path.join(path, month)
+                if os.path.isdir(month) and any(name.startswith('department=') for name in os.listdir(month)):
+                    return True
+        return False
+
+    def compact(self, min_files=2):
+        """Rewrite each month partition of at least ``min_files`` files (or in the old layout) as one.
+
+        With ``min_files=None`` only months in the old layout are rewritten.
+
+        A month's new file is written aside and swapped in with two renames,
+        so readers see either the old files or the new one. Part file names
+        change, so anything that tracks them (incremental.py) must rebuild:
+        the COMPACTED file gets a new token whenever something was
+        rewritten. Returns the number of months rewritten.
+        """
+        lock = os.path.join(self.root, COMPACTED_FILE + '.lock')
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL))
+                break
+            except FileExistsError:
+                time.sleep(0.5)  # another process is compacting
+        try:
+            rewritten = sum(self._compact_area(area, min_files) for area in AREAS)
+            if rewritten:
+                with open(os.path.join(self.root, COMPACTED_FILE), 'w') as f:
+                    f.write(uuid.uuid4().hex)
+            return rewritten
+        finally:
+            os.remove(lock)
+
+    def _compact_area(self, area, min_files):
+        path = os.path.join(self.root, area)
+        if not os.path.isdir(path):
+            return 0
+        staging, retired = os.path.join(path, '_compact'), os.path.join(path, '_retired')
+        # Left by an interrupted compaction: the old files are still whole
+        shutil.rmtree(staging, ignore_errors=True)
+        for name in os.listdir(retired) if os.path.isdir(retired) else []:
+            if not os.path.exists(os.path.join(path, name)):
+                os.rename(os.path.join(retired, name), os.path.join(path, name))
+        shutil.rmtree(retired, ignore_errors=True)
+        rewritten = 0
+        for name in sorted(os.listdir(path)):
+            month = os.path.join(path, name)
+            if not name.startswith('month=') or not os.path.isdir(month):
+                continue
+            legacy = [entry.path for entry in os.scandir(month) if entry.name.startswith('department=')]
+            files = sorted(entry.path for entry in os.scandir(month) if entry.name.endswith('.parquet'))
+            if not legacy and (min_files is None or len(files) < min_files):
+                continue
+            tables = [ds.dataset(files, format='parquet', partitioning=PARTITIONING,
+                                 partition_base_dir=path).to_table()] if files else []
+            legacy = sorted(os.path.join(department, name) for department in legacy
+                            for name in os.listdir(department) if name.endswith('.parquet'))
+            if legacy:
+                tables.append(ds.dataset(legacy, format='parquet', partitioning=LEGACY_PARTITIONING,
+                                         partition_base_dir=path).to_table())
+            if not tables:
+                continue
+            table = pa.concat_tables([unify(table) for table in tables], promote_options='default')
+            if 'department' in table.column_names:
+                table = table.sort_by([('department', 'ascending')])
+            self._write(encode(table), staging)
+            os.makedirs(retired, exist_ok=True)
+            os.rename(month, os.path.join(retired, name))
+            os.rename(os.path.join(staging, name), month)
+            rewritten += 1
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(retired, ignore_errors=True)
+        return rewritten
+
+    def compacted(self):
+        # Token of the last compaction that rewrote files ('' if none has)
+        try:
+            with open(os.path.join(self.root, COMPACTED_FILE)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ''
+
+    def months(self):
+        if self.is_empty():
+            return []
+        return sorted(
+            name.split('=', 1)[1]
+            for name in os.listdir(self.events_path)
+            if name.startswith('month=')
+        )
+
+    def write_reference(self, name, df):
+        os.makedirs(self.reference_path, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                       os.path.join(self.reference_path, f'{name}.parquet'))
+
+    def read_reference(self, name, default=None):
+        path = os.path.join(self.reference_path, f'{name}.parquet')
+        if not os.path.exists(path):
+            return default
+        return pq.read_table(path).to_pandas()
+
+
+def conform(table, column_types):
+    # Columns in schema order and type; optional ones an export lacks are null
+    for name, kind in column_types.items():
+        if name not in table.column_names:
+            table = table.append_column(name, pa.nulls(table.num_rows, kind))
+    return table.select(list(column_types)).cast(pa.schema(column_types))
+
+
+def encode(table):
+    for name in DICTIONARY_COLUMNS:
+        if name in table.column_names:
+            i = table.schema.get_field_index(name)
+            table = table.set_column(i, name, pc.dictionary_encode(table[name]))
+    return table
+
+
+def unify(table):
+    # Dictionary columns decoded and department a plain string, so tables
+    # from different batches and layouts concatenate
+    columns = [pc.cast(table[name], table.schema.field(name).type.value_type)
+               if pa.types.is_dictionary(table.schema.field(name).type) else table[name]
+               for name in table.column_names]
+    return pa.table(columns, names=table.column_names)
+
+
+def area_files(path):
+    # Part files of one month partitioned area of the store
+    if not os.path.isdir(path) or not os.listdir(path):
+        return []
+    return sorted(ds.dataset(path, format='parquet', partitioning=PARTITIONING).files)
+
+
+def changed_files(path, listing):
+    """Part files in the directories under ``path`` that changed since ``listing`` was taken.
+
+    ``listing`` maps each directory to its mtime and subdirectories when it
+    was last listed, and is updated in place. Adding a part file changes
+    its directory's mtime, so unchanged partitions are only stat'ed, never
+    listed: a refresh costs a stat per partition rather than a listing of
+    every file in the store. Callers drop the files they already know.
+    """
+    files = []
+    now = time.time_ns()
+    pending = [path]
+    while pending:
+        directory = pending.pop()
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        seen = listing.get(directory)
+        if seen is not None and seen[0] == mtime:
+            subdirectories = seen[1]
+        else:
+            subdirectories = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # compact() stages files under _compact/ and _retired/
+                        if not entry.name.startswith(('.', '_')):
+                            subdirectories.append(entry.name)
+                    elif entry.name.endswith('.parquet') and not entry.name.startswith(('.', '_')):
+                        files.append(entry.path)
+            # Some filesystems keep mtimes to the second; a directory written
+            # to that recently is listed again next time
+            listing[directory] = (mtime if now - mtime > 2_000_000_000 else None, subdirectories)
+        pending.extend(os.path.join(directory, name) for name in subdirectories)
+    return sorted(files)
+
+
+def area_batches(path, files, columns, batch_size):
+    dataset = ds.dataset(list(files), format='parquet', partitioning=DICTIONARY_PARTITIONING, partition_base_dir=path)
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def month_key(value):
+    if isinstance(value, str) and len(value) == 7:
+        return value
+    return pd.Timestamp(value).strftime('%Y-%m')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Ingest HRIS event exports into the Parquet store')
+    parser.add_argument('csv', nargs='*', help='HRIS event export(s) to ingest')
+    parser.add_argument('--root', default=os.environ.get('HR_DATA_DIR', 'data'), help='store directory')
+    kind = parser.add_mutually_exclusive_group()
+    kind.add_argument('--responses', action='store_true', help='the files are engagement survey responses')
+    kind.add_argument('--applications', action='store_true', help='the files are ATS stage events')
+    parser.add_argument('--compact', action='store_true',
+                        help='then merge each month\'s part files into one (running dashboards rebuild their summary)')
+    args = parser.parse_args()
+
+    store = EventStore(args.root)
+    for path in args.csv:
+        if args.responses:
+            print(f'{path}: {store.ingest_responses_csv(path):,} responses')
+        elif args.applications:
+            print(f'{path}: {store.ingest_applications_csv(path):,} ATS events')
+        else:
+            print(f'{path}: {store.ingest_csv(path):,} events')
+    if args.compact:
+        print(f'compacted {store.compact():,} month partitions')
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from aggregation import month_ordinal, month_start, ratio
+
+# Answers are 1-5 Likert scores, or 0-10 for the recommend question
+SCORES = 11
+LIKERT_POINTS = 5
+# Likert answers at or above this are favourable, at or below UNFAVORABLE unfavourable
+FAVORABLE, UNFAVORABLE = 4, 2
+# The dimension of the "would you recommend working here" question, scored 0-10
+ENPS = 'eNPS'
+PROMOTER, DETRACTOR = 9, 6
+# Results for fewer respondents than this are never shown
+MIN_GROUP_SIZE = 5
+# Dimensions charted in the Engagement Breakdown, next to Overall
+TREND_DIMENSIONS = ['Recognition', 'Growth', 'Work-Life']
+
+
+class SurveySummary:
+    """Answer histograms per (month, department, question) of engagement surveys.
+
+    Each cell counts the answers at every score, so means, favourability
+    and eNPS for any set of departments and months are sums of cells, and
+    new response files are folded in by adding their counts. Respondents
+    are counted once per (month, department); a respondent's answers are
+    expected to arrive in one export.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.months = np.zeros(0, dtype=np.int64)
+        self.departments = np.zeros(0, dtype=object)
+        self.questions = pd.Index([], dtype=object)
+        self.counts = np.zeros((0, 0, SCORES), dtype=np.int64)
+        self.respondents = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return int(self.respondents.sum())
+
+    def add(self, batches):
+        """Count response DataFrames (RESPONSE_COLUMN_TYPES columns), e.g. EventStore.response_batches().
+
+        A respondent is counted once across all the batches of one call.
+        """
+        seen = []
+        for responses in batches:
+            score = responses['score'].to_numpy(dtype=np.float64, na_value=np.nan)
+            valid = (score >= 0) & (score < SCORES) & responses['question'].notna().to_numpy()
+            if not valid.any():
+                continue
+            responses, score = responses[valid], score[valid].astype(np.int64)
+            month = month_ordinal(responses['response_date'])
+            department = pd.Categorical(responses['department'].astype('category'))
+            question = pd.Categorical(responses['question'].astype('category'))
+
+            # Distinct (month, department) pairs are few; key them on ordinals
+            # and category codes rather than the strings
+            names = department.categories.astype(object)
+            pairs, pair = np.unique(month * len(names) + department.codes, return_inverse=True)
+            cell = np.array([self._cell(p // len(names), names[p % len(names)]) for p in pairs], np.int64)[pair]
+            self.questions = self.questions.append(question.categories.difference(self.questions).astype(object))
+            codes = self.questions.get_indexer(question.categories)[question.codes]
+            self._fit()
+
+            shape = self.counts.shape
+            flat = (cell * shape[1] + codes) * SCORES + score
+            self.counts += np.bincount(flat, minlength=np.prod(shape)).reshape(shape)
+            seen.append(pd.DataFrame({'cell': cell, 'id': responses['respondent_id'].to_numpy()}).drop_duplicates())
+        if seen:
+            cells = pd.concat(seen).drop_duplicates()['cell'].to_numpy()
+            self.respondents += np.bincount(cells, minlength=len(self.respondents))
+
+    def _cell(self, month, department):
+        key = (int(month), department)
+        row = self.cells.get(key)
+        if row is None:
+            row = self.cells[key] = len(self.cells)
+        return row
+
+    def _fit(self):
+        # Zero counts for cells and questions added since the last call
+        missing = len(self.cells) - len(self.counts)
+        if missing:
+            new = list(self.cells)[-missing:]
+            self.months = np.concatenate([self.months, [month for month, _ in new]])
+            self.departments = np.concatenate([self.departments, np.array([d for _, d in new], dtype=object)])
+            self.counts = np.concatenate([self.counts, np.zeros((missing,) + self.counts.shape[1:], np.int64)])
+            self.respondents = np.concatenate([self.respondents, np.zeros(missing, np.int64)])
+        if len(self.questions) > self.counts.shape[1]:
+            grow = len(self.questions) - self.counts.shape[1]
+            self.counts = np.concatenate([self.counts, np.zeros((len(self.counts), grow, SCORES), np.int64)], axis=1)
+
+    def reportable(self):
+        """Cells with enough respondents to report on.
+
+        Suppressed cells are left out of every total as well as every
+        breakdown, so a small department's answers can't be recovered by
+        subtracting one total from another.
+        """
+        return self.respondents >= MIN_GROUP_SIZE
+
+
+def dimension_counts(surveys, questions):
+    """Answer counts per cell and dimension, Overall first and eNPS last.
+
+    ``questions`` is the survey_questions reference table (Question,
+    Dimension). Overall covers every Likert question; questions the table
+    doesn't list are left out. Returns the dimension names and a (cells,
+    dimensions, SCORES) array.
+    """
+    dimension = questions.set_index('Question')['Dimension'].reindex(surveys.questions).to_numpy()
+    names = ['Overall'] + [name for name in questions['Dimension'].unique() if name != ENPS] + [ENPS]
+    likert = pd.notna(dimension) & (dimension != ENPS)
+    member = np.array([likert] + [dimension == name for name in names[1:]], dtype=np.int64)
+    return names, np.einsum('dq,cqs->cds', member.reshape(len(names), -1), surveys.counts)
+
+
+def likert_index(counts):
+    # Mean Likert answer rescaled to 0-100
+    n = counts.sum(axis=-1)
+    mean = ratio((counts * np.arange(SCORES)).sum(axis=-1), n)
+    return np.where(n > 0, (mean - 1) / (LIKERT_POINTS - 1) * 100, np.nan)
+
+
+def enps(counts):
+    # Percent promoters, passives and detractors, and their net score
+    n = counts.sum(axis=-1)
+    promoters = ratio(counts[..., PROMOTER:].sum(axis=-1), n) * 100
+    detractors = ratio(counts[..., :DETRACTOR + 1].sum(axis=-1), n) * 100
+    return promoters, 100 - promoters - detractors, detractors, promoters - detractors
+
+
+def survey_tables(surveys, summary, questions, departments=None, start=None, end=None):
+    """Engagement trend, favourability, eNPS and response rates for one dashboard view.
+
+    Only survey months between ``start`` and ``end`` and reportable cells
+    (see SurveySummary.reportable) count. The trend matches the
+    engagement_trend reference table (Month, Overall and TREND_DIMENSIONS,
+    0-100); favourability is for the latest survey month in the range.
+    Response rates divide respondents by the department's headcount that
+    month; they are shown for every department, and Reported says whether
+    its answers are.
+    """
+    lo = month_ordinal([pd.Timestamp(start)])[0] if start is not None else np.iinfo(np.int64).min
+    hi = month_ordinal([pd.Timestamp(end)])[0] if end is not None else np.iinfo(np.int64).max
+    selected = (surveys.months >= lo) & (surveys.months <= hi)
+    if departments is not None:
+        selected &= np.isin(surveys.departments, list(departments))
+    reportable = selected & surveys.reportable()
+    months, month = np.unique(surveys.months[reportable], return_inverse=True)
+    labels = pd.DatetimeIndex(month_start(months)).strftime('%b %Y')
+
+    names, cells = dimension_counts(surveys, questions)
+    counts = np.zeros((len(months),) + cells.shape[1:], dtype=np.int64)
+    np.add.at(counts, month, cells[reportable])
+    index = likert_index(counts[:, :-1])
+    engagement = pd.DataFrame({'Month': labels})
+    for column in ['Overall'] + TREND_DIMENSIONS:
+        engagement[column] = index[:, names.index(column)].round(1) if column in names else np.nan
+    engagement['Respondents'] = np.bincount(month, weights=surveys.respondents[reportable],
+                                            minlength=len(months)).astype(np.int64)
+
+    promoters, passives, detractors, net = enps(counts[:, -1])
+    net_promoter = pd.DataFrame({'Month': labels, 'Promoters': promoters.round(1), 'Passives': passives.round(1),
+                                 'Detractors': detractors.round(1), 'eNPS': net.round(0)})
+    net_promoter = net_promoter[counts[:, -1].sum(axis=1) > 0].reset_index(drop=True)
+
+    latest = counts[-1, :-1] if len(months) else np.zeros((len(names) - 1, SCORES), dtype=np.int64)
+    n = latest.sum(axis=1)
+    favorability = pd.DataFrame({
+        'Dimension': names[:-1],
+        'Favorable': (ratio(latest[:, FAVORABLE:].sum(axis=1), n) * 100).round(1),
+        'Neutral': (ratio(latest[:, UNFAVORABLE + 1:FAVORABLE].sum(axis=1), n) * 100).round(1),
+        'Unfavorable': (ratio(latest[:, :UNFAVORABLE + 1].sum(axis=1), n) * 100).round(1),
+        'Answers': n,
+    })[n > 0].reset_index(drop=True)
+
+    # Response rates for the latest survey month, over every selected
+    # department on staff then, suppressed and silent ones included
+    last = surveys.months[selected].max() if selected.any() else None
+    rows = np.flatnonzero(selected & (surveys.months == last))
+    respondents = pd.Series(surveys.respondents[rows], index=surveys.departments[rows])
+    position = int(last - summary.first_month) if last is not None else -1
+    invited = pd.Series(0, index=summary.departments, dtype=np.int64)
+    if 0 <= position < summary.n_months:
+        invited[:] = summary.headcount[:, position]
+    if departments is not None:
+        invited = invited[invited.index.isin(list(departments))]
+    department = invited.index[invited > 0].union(respondents.index)
+    invited, respondents = invited.reindex(department, fill_value=0), respondents.reindex(department, fill_value=0)
+    response_rate = pd.DataFrame({
+        'Department': department.to_numpy(dtype=object),
+        'Invited': invited.to_numpy(np.int64),
+        'Respondents': respondents.to_numpy(np.int64),
+        'Response Rate': (ratio(respondents.to_numpy(), invited.to_numpy()) * 100).round(1),
+        'Reported': respondents.to_numpy() >= MIN_GROUP_SIZE,
+    })
+    return engagement, favorability, net_promoter, response_rate
+
+
+def survey_reference(reference, surveys, summary, departments=None, start=None, end=None):
+    """``reference`` with engagement_trend taken from the survey responses once there are any."""
+    if not len(surveys):
+        return reference
+    engagement = survey_tables(surveys, summary, reference['survey_questions'], departments, start, end)[0]
+    return {**reference, 'engagement_trend': engagement}
@@ -0,0 +1,381 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from aggregation import REFERENCE_DEFAULTS, SNAPSHOT_COLUMNS, TERM_CATEGORIES, expand_intervals, month_ordinal, month_start
+from store import EVENT_COLUMN_TYPES
+
+# Department mix, monthly attrition, salary and satisfaction profile
+DEPARTMENTS = {
+    'Engineering': (0.34, 0.008, 98000, 4.2),
+    'Sales': (0.22, 0.014, 75000, 3.8),
+    'Marketing': (0.13, 0.011, 72000, 4.0),
+    'HR': (0.06, 0.007, 68000, 4.5),
+    'Finance': (0.09, 0.008, 82000, 4.1),
+    'Operations': (0.16, 0.012, 65000, 3.9),
+}
+GENDERS = (['Male', 'Female', 'Non-binary'], [0.58, 0.40, 0.02])
+RATINGS = [0.02, 0.08, 0.40, 0.35, 0.15]  # P(rating = 1..5)
+CATEGORY_WEIGHTS = [0.60, 0.23, 0.10, 0.07]
+REASONS = (['Better Compensation', 'Career Growth', 'Work-Life Balance', 'Management Issues', 'Relocation', 'Other'],
+           [0.33, 0.28, 0.17, 0.11, 0.06, 0.05])
+# Job level mix and pay relative to the department's base salary
+LEVELS = (['Associate', 'Professional', 'Senior', 'Lead', 'Manager', 'Director'],
+          [0.20, 0.30, 0.25, 0.12, 0.10, 0.03], [0.72, 0.88, 1.05, 1.22, 1.30, 1.70])
+SOURCES = (['Referral', 'Careers Site', 'LinkedIn', 'Job Board', 'Agency'], [0.25, 0.20, 0.25, 0.20, 0.10])
+# Contracted hours as a fraction of full time
+FTE = ([1.0, 0.8, 0.6, 0.5], [0.88, 0.06, 0.03, 0.03])
+# Survey answers relative to satisfaction, per dimension
+DIMENSION_OFFSETS = {'Recognition': -0.3, 'Growth': 0.0, 'Work-Life': 0.2}
+# Odds of passing each funnel stage (applied -> screen -> interview -> offer
+# -> accepted), mean days spent in each, and how each source's candidates
+# fare against those odds
+STAGE_PASS = [0.35, 0.45, 0.35, 0.85]
+STAGE_DAYS = [6, 8, 10, 4]
+SOURCE_QUALITY = [1.6, 1.0, 0.9, 0.7, 1.3]
+OTHER_OFFERS = 0.15
+AD_SPEND = (300, 2500)
+AGENCY_FEE = 12000
+HISTORY_MONTHS = 180
+# Roughly this many employees per team
+TEAM_SIZE = 12
+
+
+def synthetic_snapshot(employees=300, months=24, seed=0, end='2025-08', growth=0.01):
+    """Seeded employee-month snapshot with roughly ``employees`` on the books at ``end``."""
+    rng = np.random.default_rng(seed)
+    names = list(DEPARTMENTS)
+    share, attrition, base_salary, satisfaction = (np.array(v) for v in zip(*DEPARTMENTS.values()))
+
+    last = month_ordinal([pd.Timestamp(end)])[0]
+    first = last - months + 1
+    span = HISTORY_MONTHS + months
+
+    # Hire intensity grows by ``growth`` a month. With monthly attrition p the
+    # headcount settles near hires / (p + growth), which sizes the hire rate.
+    weights = (1 + growth) ** np.arange(span)
+    hires_at_end = employees * share / share.sum() * (attrition + growth)
+    n = rng.poisson(hires_at_end.sum() * weights.sum() / weights[-1])
+    start = last - span + 1 + rng.choice(span, size=n, p=weights / weights.sum())
+    dept = rng.choice(len(names), size=n, p=hires_at_end / hires_at_end.sum())
+    duration = rng.geometric(attrition[dept]) - 1
+    term = start + duration
+    keep = term >= first
+    start, dept, term = start[keep], dept[keep], term[keep]
+    n = len(start)
+    terminated = term <= last
+
+    owner, month = expand_intervals(np.maximum(start, first), np.minimum(term, last))
+    hire_age = rng.uniform(20, 58, n)
+    tenure = ((month - start[owner]) / 12).astype('float32')
+    salary = base_salary[dept] * rng.lognormal(0, 0.15, n)
+    category = rng.choice(len(TERM_CATEGORIES), size=n, p=CATEGORY_WEIGHTS)
+    reason = rng.choice(len(REASONS[0]), size=n, p=REASONS[1])
+    leaving = terminated[owner] & (month == term[owner])
+
+    snapshot = pd.DataFrame({
+        'month': month_start(month),
+        'employee_id': np.arange(n)[owner],
+        'department': pd.Categorical.from_codes(dept[owner], names),
+        'gender': pd.Categorical.from_codes(rng.choice(3, size=n, p=GENDERS[1])[owner], GENDERS[0]),
+        'age': (hire_age[owner] + tenure).astype('float32'),
+        'tenure': tenure,
+        'salary': (salary[owner] * 1.03 ** tenure).round(0),
+        'rating': (rng.choice(5, size=n, p=RATINGS) + 1).astype('int8')[owner],
+        'satisfaction': np.clip(rng.normal(satisfaction[dept], 0.5), 1, 5).round(1).astype('float32')[owner],
+        'hired': month == start[owner],
+        'terminated': leaving,
+        'term_category': pd.Categorical.from_codes(np.where(leaving, category[owner], -1), TERM_CATEGORIES),
+        'term_reason': pd.Categorical.from_codes(np.where(leaving, reason[owner], -1), REASONS[0]),
+    })
+    # Drawn last so the other columns don't depend on the team layout
+    labels, first_team, teams = team_layout(names, share / share.sum(), max(employees // TEAM_SIZE, len(names)))
+    team = first_team[dept] + rng.integers(0, teams[dept])
+    snapshot['team'] = pd.Categorical.from_codes(team[owner], labels)
+    snapshot['source'] = pd.Categorical.from_codes(rng.choice(len(SOURCES[0]), size=n, p=SOURCES[1])[owner],
+                                                   SOURCES[0])
+    level = rng.choice(len(LEVELS[0]), size=n, p=LEVELS[1])
+    snapshot['level'] = pd.Categorical.from_codes(level[owner], LEVELS[0])
+    snapshot['salary'] = (snapshot['salary'] * np.array(LEVELS[2])[level[owner]]).round(0)
+    return snapshot[SNAPSHOT_COLUMNS].sort_values(['month', 'employee_id'], kind='stable').reset_index(drop=True)
+
+
+def synthetic_responses(summary, questions, seed=0, every=3, response_rate=(0.55, 0.9), last=None):
+    """Seeded pulse-survey responses for the workforce in ``summary``.
+
+    A survey runs every ``every`` months (the last month of each quarter by
+    default); ``last`` keeps only the latest surveys. Each department
+    answers at a rate drawn from ``response_rate`` and its answers follow
+    its average satisfaction.
+    """
+    rng = np.random.default_rng(seed)
+    months = np.flatnonzero((summary.first_month + np.arange(summary.n_months) + 1) % every == 0)
+    months = months[-last:] if last else months
+    headcount = summary.headcount[:, months]
+    satisfaction = np.where(summary.satisfaction_n[:, months] > 0, summary.satisfaction_sum[:, months]
+                            / np.maximum(summary.satisfaction_n[:, months], 1), 4.0)
+    rate = rng.uniform(*response_rate, size=(len(summary.departments), 1))
+    answered = rng.binomial(headcount, rate)
+    cell = np.repeat(np.arange(answered.size), answered.reshape(-1))
+    department, month = np.divmod(cell, len(months))
+    mood = satisfaction.reshape(-1)[cell] + rng.normal(0, 0.7, len(cell))
+
+    dimension = questions['Dimension'].to_numpy()
+    offset = np.array([DIMENSION_OFFSETS.get(name, 0.0) for name in dimension])
+    likert = np.clip(np.round(mood[:, None] + offset + rng.normal(0, 0.6, (len(cell), len(dimension)))), 1, 5)
+    recommend = np.clip(np.round((mood[:, None] - 1) * 2.5 + rng.normal(0, 1.5, (len(cell), 1))), 0, 10)
+    score = np.where(dimension == 'eNPS', recommend, likert)
+    return pd.DataFrame({
+        'respondent_id': np.repeat(rng.permutation(len(cell)), len(dimension)),
+        'response_date': np.repeat(month_start(summary.first_month + months[month]) + np.timedelta64(14, 'D'),
+                                   len(dimension)),
+        'department': pd.Categorical.from_codes(np.repeat(department, len(dimension)), summary.departments),
+        'question': pd.Categorical(np.tile(questions['Question'].to_numpy(), len(cell))),
+        'score': score.reshape(-1).astype(np.int8),
+    })
+
+
+def synthetic_applications(summary, seed=0, applicants=25, last=None):
+    """Seeded ATS events behind the hires in ``summary``.
+
+    Every hire fills one requisition of its department, opened with some
+    advertising spend a few weeks before the hire accepts. About
+    ``applicants`` other candidates apply to each and pass each stage with
+    STAGE_PASS odds scaled by their source's SOURCE_QUALITY, until they are
+    rejected, withdraw or decline an offer; agency hires carry a fee.
+    ``last`` keeps only requisitions filled in the latest months or still
+    open, and events after the summary's last month are left out.
+    """
+    rng = np.random.default_rng(seed)
+    # Requisitions filled in the two months after the summary are still open at its end
+    hires = np.concatenate([summary.hires, np.repeat(summary.hires[:, -1:], 2, axis=1)], axis=1)
+    months = np.arange(hires.shape[1])[-(last + 2):] if last else np.arange(hires.shape[1])
+    hires = hires[:, months]
+    req = np.repeat(np.arange(hires.size), hires.reshape(-1))
+    department, month = np.divmod(req, len(months))
+    fill = month_start(summary.first_month + months[month]).astype('datetime64[D]') + rng.integers(0, 28, len(req)).astype('timedelta64[D]')
+
+    # The hire comes first among each requisition's candidates
+    counts = 1 + rng.poisson(applicants, len(req))
+    owner = np.repeat(np.arange(len(req)), counts)
+    hired = np.zeros(len(owner), dtype=bool)
+    hired[np.cumsum(counts) - counts] = True
+    quality = np.array(SOURCE_QUALITY)
+    share = np.array(SOURCES[1])
+    source = np.where(hired, rng.choice(len(quality), len(owner), p=share * quality / (share * quality).sum()),
+                      rng.choice(len(quality), len(owner), p=share))
+    odds = np.minimum(np.array(STAGE_PASS) * quality[source][:, None], 0.95)
+    # Most requisitions make one offer, to their hire
+    odds[:, -2] *= np.where(hired, 1, OTHER_OFFERS)
+    reach = np.cumprod(rng.random((len(owner), len(STAGE_PASS))) < odds, axis=1).sum(axis=1)
+    reach = np.where(hired, len(STAGE_PASS), np.minimum(reach, len(STAGE_PASS) - 1))
+
+    # Days from applying to entering each stage and, one more gap on, to leaving
+    gaps = rng.gamma(2.0, np.array(STAGE_DAYS + [STAGE_DAYS[-1]]) / 2.0, (len(owner), len(STAGE_DAYS) + 1))
+    entered = np.concatenate([np.zeros((len(owner), 1)), np.cumsum(gaps, axis=1)], axis=1).round().astype(np.int64)
+    # The hire accepts on the fill date; the requisition opens up to two
+    # weeks before its hire applies, and the others apply while it is open
+    start = fill - entered[hired, len(STAGE_PASS)].astype('timedelta64[D]')
+    opened = start - rng.integers(1, 15, len(req)).astype('timedelta64[D]')
+    window = (fill - opened).astype(np.int64)
+    applied = opened[owner] + np.where(hired, (start - opened)[owner].astype(np.int64),
+                                       rng.integers(0, np.maximum(window[owner], 1))).astype('timedelta64[D]')
+
+    stages = ['applied', 'phone_screen', 'interview', 'offer', 'accepted']
+    slot = np.arange(len(stages) + 1)
+    valid = np.column_stack([slot[None, :-1] <= reach[:, None], ~hired])
+    day = np.column_stack([entered[:, :-1], entered[np.arange(len(owner)), reach + 1]])
+    exit_name = np.where(reach == len(STAGE_PASS) - 1, 'declined',
+                         np.where(rng.random(len(owner)) < 0.8, 'rejected', 'withdrawn'))
+    name = np.column_stack([np.broadcast_to(np.array(stages, dtype=object), (len(owner), len(stages))),
+                            exit_name.astype(object)])
+    candidate, column = np.nonzero(valid)
+    events = pd.DataFrame({
+        'requisition_id': owner[candidate] + 1,
+        'candidate_id': candidate + 1,
+        'event_date': applied[candidate] + day[candidate, column].astype('timedelta64[D]'),
+        'stage': name[candidate, column],
+        'department': summary.departments[department[owner[candidate]]],
+        'source': np.where(column == 0, np.array(SOURCES[0], dtype=object)[source[candidate]], None),
+        'cost': np.where((column == len(STAGE_PASS)) & (source[candidate] == SOURCES[0].index('Agency')),
+                         float(AGENCY_FEE), np.nan),
+    })
+    openings = pd.DataFrame({
+        'requisition_id': np.arange(len(req)) + 1,
+        'candidate_id': None,
+        'event_date': opened,
+        'stage': 'opened',
+        'department': summary.departments[department],
+        'source': None,
+        'cost': rng.uniform(*AD_SPEND, len(req)).round(0),
+    })
+    events = pd.concat([openings, events], ignore_index=True)
+    events = events[events['event_date'] < month_start(summary.first_month + summary.n_months)]
+    events = events.astype({'candidate_id': 'Int64', 'stage': 'category', 'department': 'category',
+                            'source': 'category'})
+    return events.sort_values('event_date', kind='stable').reset_index(drop=True)
+
+
+def team_layout(names, share, total):
+    """Team labels for about ``total`` teams split over departments by headcount share.
+
+    Returns the labels and, per department, the position of its first team
+    and its number of teams (at least one).
+    """
+    teams = np.maximum(np.round(np.asarray(share) * total), 1).astype(np.int64)
+    first_team = np.cumsum(teams) - teams
+    labels = [f'{name} Team {k + 1}' for name, count in zip(names, teams) for k in range(count)]
+    return labels, first_team, teams
+
+
+def department_names(departments):
+    return list(DEPARTMENTS)[:departments] + [f'Department {i + 1:03d}' for i in range(len(DEPARTMENTS), departments)]
+
+
+def org_structure(departments):
+    """The org_structure reference table (department -> division) for ``departments`` departments.
+
+    The named departments keep their default divisions; generated ones are
+    spread over about sqrt(n) numbered divisions.
+    """
+    known = REFERENCE_DEFAULTS['org_structure']().set_index('Department')['Division']
+    names = department_names(departments)
+    divisions = max(int(np.sqrt(len(names) - len(known))), 1) if len(names) > len(known) else 1
+    return pd.DataFrame({
+        'Department': names,
+        'Division': [known.get(name, f'Division {i % divisions + 1}') for i, name in enumerate(names)],
+    })
+
+
+def department_profiles(departments, rng):
+    """Name, headcount share, monthly attrition, base salary and satisfaction of ``departments`` departments."""
+    names = department_names(departments)
+    known = np.array(list(DEPARTMENTS.values()))[:departments]
+    extra = departments - len(known)
+    share = np.concatenate([known[:, 0], rng.lognormal(np.log(0.05), 0.5, extra)])
+    attrition = np.concatenate([known[:, 1], rng.uniform(0.006, 0.016, extra)])
+    base_salary = np.concatenate([known[:, 2], rng.lognormal(np.log(75000), 0.2, extra).round(-3)])
+    satisfaction = np.concatenate([known[:, 3], rng.uniform(3.6, 4.5, extra)])
+    return np.array(names, dtype=object), share / share.sum(), attrition, base_salary, satisfaction
+
+
+def synthetic_events(employees=10_000, departments=6, years=5, seed=0, end='2025-08', chunk=250_000, teams=None):
+    """Seeded HRIS event log for ``employees`` people over ``years`` years, as Arrow tables of ``chunk`` employees.
+
+    A third of the workforce is on the books when the window opens, the
+    rest are hired during it. Tenure is geometric in each department's
+    monthly attrition, everyone gets an anniversary raise and a March
+    review each year, and a few transfer once (to a team of the new
+    department). Hires carry a team, a job level that scales their pay, a
+    recruitment source and an FTE. ``teams`` defaults to one per TEAM_SIZE employees,
+    at most 3,000. The tables have the store's event columns and can go
+    straight to EventStore.ingest_table(); org_structure() gives the
+    matching divisions.
+    """
+    names, share, attrition, base_salary, satisfaction = department_profiles(departments, np.random.default_rng(seed))
+    if teams is None:
+        teams = min(max(employees // TEAM_SIZE, departments), 3000)
+    labels, first_team, team_count = team_layout(names, share, teams)
+    labels = np.array(labels, dtype=object)
+    last = np.datetime64(pd.Timestamp(end) + pd.offsets.MonthEnd(0), 'D')
+    first = last - int(years * 365.25) + 1
+    span = (last - first).astype(np.int64) + 1
+
+    for lo in range(0, employees, chunk):
+        rng = np.random.default_rng([seed, lo])
+        n = min(chunk, employees - lo)
+        ids = np.arange(lo, lo + n)
+        dept = rng.choice(departments, size=n, p=share)
+        incumbent = rng.random(n) < 1 / 3
+        hire = np.where(incumbent, first - rng.integers(1, 3650, n), first + rng.integers(0, span, n))
+        hire = hire.astype('datetime64[D]')
+        # Geometric tenure counted from whichever is later, hire or the window opening
+        stay = (rng.geometric(attrition[dept]) - 1) * 30 + rng.integers(0, 30, n)
+        term = np.maximum(hire, first) + stay
+        leaves = term <= last
+        until = np.where(leaves, term, last)
+        birth = hire - (rng.uniform(20, 58, n) * 365.25).astype('timedelta64[D]')
+        salary = base_salary[dept] * rng.lognormal(0, 0.15, n)
+        level = np.random.default_rng([seed, lo, 3]).choice(len(LEVELS[0]), size=n, p=LEVELS[1])
+        salary *= np.array(LEVELS[2])[level]
+
+        # One transfer for ~4% of those who stay at least a year
+        moving = (rng.random(n) < 0.04) & (until - np.maximum(hire, first) > 365)
+        moved = np.maximum(hire, first) + 180 + (rng.random(n) * np.maximum((until - np.maximum(hire, first)).astype(int)
+                                                                            - 180, 1)).astype(int)
+        new_dept = np.where(moving, (dept + rng.integers(1, max(departments, 2), n)) % departments, dept)
+        # Teams come from their own stream so the rest of the log doesn't depend on them
+        team_rng = np.random.default_rng([seed, lo, 1])
+        team = first_team[dept] + team_rng.integers(0, team_count[dept])
+        new_team = np.where(moving, first_team[new_dept] + team_rng.integers(0, team_count[new_dept]), team)
+
+        def department_on(owner, dates):
+            return names[np.where(moving[owner] & (dates >= moved[owner]), new_dept[owner], dept[owner])]
+
+        def team_on(owner, dates):
+            return labels[np.where(moving[owner] & (dates >= moved[owner]), new_team[owner], team[owner])]
+
+        source = np.array(SOURCES[0], dtype=object)[
+            np.random.default_rng([seed, lo, 2]).choice(len(SOURCES[0]), size=n, p=SOURCES[1])]
+        fte = np.random.default_rng([seed, lo, 4]).choice(FTE[0], size=n, p=FTE[1])
+
+        parts = [event_table('hire', ids, hire, department=names[dept], team=labels[team],
+                             level=np.array(LEVELS[0], dtype=object)[level], source=source, fte=fte,
+                             salary=salary.round(0),
+                             gender=np.array(GENDERS[0], dtype=object)[rng.choice(3, size=n, p=GENDERS[1])],
+                             birth_date=birth,
+                             satisfaction=np.clip(rng.normal(satisfaction[dept], 0.5), 1, 5).round(1))]
+
+        quit = np.flatnonzero(leaves)
+        parts.append(event_table(
+            'termination', ids[quit], term[quit], department=department_on(quit, term[quit]),
+            team=team_on(quit, term[quit]),
+            category=np.array(TERM_CATEGORIES, dtype=object)[rng.choice(4, size=len(quit), p=CATEGORY_WEIGHTS)],
+            reason=np.array(REASONS[0], dtype=object)[rng.choice(len(REASONS[0]), size=len(quit), p=REASONS[1])]))
+
+        move = np.flatnonzero(moving)
+        parts.append(event_table('transfer', ids[move], moved[move], department=names[new_dept[move]],
+                                 team=labels[new_team[move]]))
+
+        # Anniversary raises inside the window
+        tenure_days = (until - hire).astype(int)
+        k_lo = np.maximum(np.ceil((first - hire).astype(int) / 365.25), 1).astype(np.int64)
+        k_hi = np.floor(tenure_days / 365.25).astype(np.int64)
+        has = np.flatnonzero(k_hi >= k_lo)
+        owner, k = expand_intervals(k_lo[has], k_hi[has])
+        owner = has[owner]
+        dates = hire[owner] + (k * 365.25).astype('timedelta64[D]')
+        raised = salary[owner] * 1.03 ** k * rng.lognormal(0, 0.02, len(k))
+        parts.append(event_table('salary_change', ids[owner], dates, department=department_on(owner, dates),
+                                 team=team_on(owner, dates), salary=raised.round(0)))
+
+        # March reviews while employed
+        year_lo = np.maximum(hire, first).astype('datetime64[Y]').astype(np.int64)
+        year_hi = until.astype('datetime64[Y]').astype(np.int64)
+        owner, year = expand_intervals(year_lo, year_hi)
+        dates = (year.astype('datetime64[Y]').astype('datetime64[M]') + 2).astype('datetime64[D]') \
+            + rng.integers(0, 28, len(year))
+        ok = (dates > hire[owner]) & (dates <= until[owner]) & (dates >= first)
+        owner, dates = owner[ok], dates[ok]
+        parts.append(event_table('review', ids[owner], dates, department=department_on(owner, dates),
+                                 team=team_on(owner, dates), rating=(rng.choice(5, size=len(owner), p=RATINGS) + 1),
+                                 satisfaction=np.clip(rng.normal(satisfaction[dept[owner]], 0.5), 1, 5).round(1)))
+        yield pa.concat_tables(parts)
+
+
+def event_table(event_type, ids, dates, **columns):
+    # Arrow table in the store's event schema; columns not given are null
+    n = len(ids)
+    arrays = {'employee_id': pa.array(ids, pa.int64()),
+              'event_date': pa.array(np.asarray(dates, dtype='datetime64[D]')),
+              'event_type': pa.array(np.full(n, event_type, dtype=object), pa.string())}
+    for name, kind in EVENT_COLUMN_TYPES.items():
+        if name in arrays:
+            continue
+        if name in columns:
+            values = columns[name]
+            arrays[name] = pa.array(np.asarray(values, dtype='datetime64[D]') if kind == pa.date32() else values,
+                                    kind)
+        else:
+            arrays[name] = pa.nulls(n, kind)
+    return pa.table(arrays)
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import SNAPSHOT_MONTHS, month_start  # noqa: E402
+from anomalies import FLAG_COLUMNS, AnomalyDetector  # noqa: E402
+from orgchart import OrgCube  # noqa: E402
+from synthetic import synthetic_snapshot  # noqa: E402
+
+
+def test_flags_older_than_the_dashboard_window_are_dropped():
+    cube = OrgCube(synthetic_snapshot(months=12, seed=2))
+    detector = AnomalyDetector(cube)
+    last = cube.first_month + cube.n_months - 1
+    # One flag a month for the last three years
+    months = month_start(last - np.arange(3 * SNAPSHOT_MONTHS // 2))
+    detector.flags = pd.DataFrame({column: 0.0 for column in FLAG_COLUMNS}, index=range(len(months)))
+    detector.flags['Month'] = months
+    detector.observe(cube, last)
+    kept = detector.flags['Month']
+    assert kept.min() == month_start([last - SNAPSHOT_MONTHS + 1])[0]
+    assert kept.isin(months).sum() == SNAPSHOT_MONTHS
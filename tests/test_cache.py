@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache  # noqa: E402
+from cache import DiskCache, RedisCache, ResultCache  # noqa: E402
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    store = DiskCache(str(tmp_path), max_bytes=1000)
+    for i in range(5):
+        store.set(f'k{i}', b'x' * 300)
+        os.utime(store._path(f'k{i}'), (i, os.stat(store._path(f'k{i}')).st_mtime))
+    assert store.get('k0') is None and store.get('k1') is None
+    assert bytes(store.get('k4')) == b'x' * 300
+    assert store.total == sum(entry.stat().st_size for entry in os.scandir(str(tmp_path)))
+
+
+def test_disk_cache_scans_only_when_due(tmp_path, monkeypatch):
+    store = DiskCache(str(tmp_path), max_bytes=10_000)
+    store.set('first', b'x' * 100)
+    scans = []
+    monkeypatch.setattr(store, '_evict', lambda: scans.append(1))
+    for i in range(20):
+        store.set(f'k{i}', b'x' * 100)
+    assert not scans and store.total == 2100
+    monkeypatch.setattr(cache, 'SCAN_SECONDS', 0)
+    store.set('late', b'x')
+    assert scans
+
+
+def test_redis_cache_round_trip_and_bound():
+    fakeredis = pytest.importorskip('fakeredis')
+    backend = RedisCache('redis://fake', max_bytes=4000, client=fakeredis.FakeRedis())
+    results = ResultCache(backend)
+    frame = pd.DataFrame({'Department': ['Sales', 'Finance'], 'Employees': [12, 7]})
+    results.put_frames('tables:v1', (frame,))
+    results.frames.clear()
+    pd.testing.assert_frame_equal(results.get_frames('tables:v1')[0], frame)
+
+    for i in range(10):
+        backend.set(f'blob{i}', b'x' * 1000)
+    assert int(backend.client.get(backend.total)) <= 4000
+    assert backend.get('blob0') is None
+    assert bytes(backend.get('blob9')) == b'x' * 1000
+
+
+def test_disk_cache_forgets_expired_entries(tmp_path):
+    store = DiskCache(str(tmp_path), max_bytes=10_000)
+    store.set('live', b'x' * 100)
+    store.set('stale', b'x' * 300, ttl=-1)
+    assert store.total == 400
+    assert store.get('stale') is None and store.total == 100
+
+
+def test_redis_cache_sweeps_expired_keys_before_evicting():
+    fakeredis = pytest.importorskip('fakeredis')
+    backend = RedisCache('redis://fake', max_bytes=4000, client=fakeredis.FakeRedis())
+    for i in range(3):
+        backend.set(f'blob{i}', b'x' * 1000)
+    # The two soon-to-expire keys are the most recently used
+    backend.get_many(['blob0', 'blob1'])
+    # What a TTL expiry does: the value goes, the bookkeeping stays
+    backend.client.delete(backend._key('blob0'), backend._key('blob1'))
+    backend.set('blob3', b'x' * 1000)
+    backend.set('blob4', b'x' * 1000)
+    assert int(backend.client.get(backend.total)) == 3000
+    assert bytes(backend.get('blob2')) == b'x' * 1000
+    assert backend.client.zcard(backend.lru) == backend.client.hlen(backend.sizes) == 3
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cohorts  # noqa: E402
+from aggregation import month_ordinal  # noqa: E402
+from cohorts import spells_frame, survival  # noqa: E402
+
+
+def test_survival_with_left_truncation_matches_hand_count(monkeypatch):
+    monkeypatch.setattr(cohorts, 'MIN_AT_RISK', 1)
+    hired = int(month_ordinal([pd.Timestamp('2024-01')])[0])
+    # Three hires seen from hire, two more only from month 3 (hired before
+    # the store began); exits at tenure 2, 5 and 4, the rest still employed
+    entry = [hired, hired, hired, hired + 3, hired + 3]
+    exit = [hired + 2, hired + 5, -1, hired + 4, -1]
+    spells = spells_frame(range(5), [hired] * 5, entry, exit, ['Sales'] * 5, ['Referral'] * 5)
+    curve = survival(spells, end='2024-07', horizon=6)
+    # At risk 3, 3, 3, 4, 4, 3, 2: S = 2/3 at t=2, then x 3/4 at t=4, x 2/3 at t=5
+    assert curve['At Risk'].tolist() == [3, 3, 3, 4, 4, 3, 2]
+    assert curve['Exits'].tolist() == [0, 0, 1, 0, 1, 1, 0]
+    np.testing.assert_allclose(curve['Retention'], np.round([100, 100, 200 / 3, 200 / 3, 50, 100 / 3, 100 / 3], 1))
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import figures  # noqa: E402
+from cache import DiskCache, ResultCache  # noqa: E402
+
+
+def test_cached_figure_hits_neither_build_nor_serialize(tmp_path, monkeypatch):
+    built = []
+
+    @figures.chart('Month', 'Employees')
+    def line(df):
+        built.append(1)
+        return go.Figure(go.Scatter(x=df['Month'], y=df['Employees'])).update_layout(height=321)
+
+    serialized = []
+    to_json = go.Figure.to_json
+    monkeypatch.setattr(go.Figure, 'to_json', lambda fig, *a, **k: serialized.append(1) or to_json(fig, *a, **k))
+    monkeypatch.setattr(figures, '_memo', figures.OrderedDict())
+    cache = ResultCache(DiskCache(str(tmp_path)))
+    df = pd.DataFrame({'Month': ['Jan', 'Feb'], 'Employees': [10, 12]})
+
+    text, height = figures.cached_figure(cache, line, df)
+    assert figures.cached_figure(cache, line, df) == (text, height)
+    assert height == 321 and built == [1] and serialized == [1]
+    # A fresh process finds the JSON in the shared cache
+    figures._memo.clear()
+    assert figures.cached_figure(cache, line, df) == (text, height)
+    assert built == [1] and serialized == [1]
+
+
+def test_downsampling_keeps_the_ends_within_budget():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 50) + np.random.default_rng(0).normal(0, 0.1, len(x))
+    picked = figures.lttb(x, y, 500)
+    assert len(picked) == 500 and picked[0] == 0 and picked[-1] == len(x) - 1
+    assert (np.diff(picked) > 0).all()
+    extremes = figures.min_max(y, 500)
+    assert len(extremes) <= 500 and (np.diff(extremes) > 0).all()
+    assert y.argmin() in extremes and y.argmax() in extremes
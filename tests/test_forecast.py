@@ -0,0 +1,20 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecast import holt_winters  # noqa: E402
+
+
+def linear(months):
+    return np.stack([100 + 2.5 * months, 400 - 1.0 * months, 50 + 0 * months])
+
+
+def test_holt_winters_recovers_a_linear_trend():
+    # Three years take the seasonal path, ten months Holt's linear trend
+    for length in (36, 10):
+        forecast, lower, upper = holt_winters(linear(np.arange(length)), horizon=6)
+        np.testing.assert_allclose(forecast, linear(np.arange(length, length + 6)), atol=1e-6)
+        assert (lower <= forecast + 1e-9).all() and (upper >= forecast - 1e-9).all()
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import EVENT_COLUMNS, Summary, build_snapshot, month_start  # noqa: E402
+from history import history_from_events  # noqa: E402
+from synthetic import synthetic_events  # noqa: E402
+
+
+def test_month_end_headcount_matches_summary():
+    events = pa.concat_tables(list(synthetic_events(employees=600, years=2, seed=4))).to_pandas()
+    events = events[[column for column in EVENT_COLUMNS if column in events]]
+    history = history_from_events(events)
+    summary = Summary(build_snapshot(events))
+    month_ends = month_start(summary.first_month + np.arange(1, summary.n_months + 1)) - np.timedelta64(1, 'D')
+    heads, _ = history.headcount(month_ends, summary.departments)
+    np.testing.assert_array_equal(heads.T, summary.headcount)
+    # members() is the same population as headcount() on any one day
+    last = month_ends[-1]
+    assert len(history.members(last)) == summary.headcount[:, -1].sum()
@@ -0,0 +1,74 @@
+"""Incremental refreshes against a full rebuild of the same event store.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import Summary  # noqa: E402
+from incremental import IncrementalSummary  # noqa: E402
+from store import EventStore  # noqa: E402
+from synthetic import synthetic_events  # noqa: E402
+
+
+def event_months(table):
+    return pc.strftime(pc.cast(table['event_date'], pa.timestamp('s')), format='%Y-%m').to_numpy(
+        zero_copy_only=False)
+
+
+def test_monthly_refresh_matches_rebuild(tmp_path):
+    table = pa.concat_tables(list(synthetic_events(employees=800, years=2, seed=3)))
+    month = event_months(table)
+    later = sorted(m for m in set(month) if m >= '2024-01')
+    store = EventStore(str(tmp_path))
+    store.ingest_table(table.filter(pa.array(month < later[0])))
+    live = IncrementalSummary.open(store)
+    for m in later:
+        store.ingest_table(table.filter(pa.array(month == m)))
+        live.refresh()
+
+    os.remove(os.path.join(str(tmp_path), 'state', 'summary.pkl'))
+    full = IncrementalSummary.open(EventStore(str(tmp_path)))
+    a, b = live.summary, full.summary
+    assert (a.first_month + a.n_months) == (b.first_month + b.n_months)
+    lo, hi = max(a.first_month, b.first_month), b.first_month + b.n_months
+    rows = a.departments.get_indexer(b.departments)
+    labels = {'gender': 'genders', 'reason': 'reasons'}
+    for name in Summary.COUNTS + Summary.SUMS:
+        x = getattr(a, name)[rows, lo - a.first_month:hi - a.first_month]
+        y = getattr(b, name)[:, lo - b.first_month:hi - b.first_month]
+        # Labels are numbered in the order each summary first saw them
+        if name in labels:
+            x = x[..., getattr(a, labels[name]).get_indexer(getattr(b, labels[name]))]
+        if name in Summary.SUMS:
+            np.testing.assert_allclose(x, y, rtol=1e-6, atol=1e-3, err_msg=name)
+        else:
+            np.testing.assert_array_equal(x, y, err_msg=name)
+
+
+def test_reopen_replays_journal(tmp_path, monkeypatch):
+    import incremental
+    monkeypatch.setattr(incremental, 'SNAPSHOT_EVERY', 5)
+    table = pa.concat_tables(list(synthetic_events(employees=300, years=2, seed=5)))
+    month = event_months(table)
+    later = sorted(m for m in set(month) if m >= '2024-01')
+    store = EventStore(str(tmp_path))
+    store.ingest_table(table.filter(pa.array(month < later[0])))
+    live = IncrementalSummary.open(store)
+    for m in later:
+        store.ingest_table(table.filter(pa.array(month == m)))
+        live.refresh()
+    journals = [name for name in os.listdir(os.path.join(str(tmp_path), 'state')) if name.endswith('.journal')]
+    assert len(journals) == 1
+
+    reopened = IncrementalSummary.open(EventStore(str(tmp_path)))
+    assert reopened.version == live.version
+    assert reopened.files == live.files
+    for name in Summary.COUNTS + Summary.SUMS:
+        np.testing.assert_array_equal(getattr(reopened.summary, name), getattr(live.summary, name), err_msg=name)
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insights import HISTORY, REGISTRY, SERIES, evaluate_rules, insight_cards, insights, trailing  # noqa: E402
+from orgchart import OrgCube  # noqa: E402
+from synthetic import synthetic_snapshot  # noqa: E402
+
+
+def test_trailing_needs_a_full_window():
+    monthly = np.ones((2, 14))
+    sums = trailing(monthly)
+    assert np.isnan(sums[:, :11]).all()
+    assert (sums[:, 11:] == 12).all()
+    assert np.isnan(trailing(np.ones((2, 5)))).all()
+
+
+def test_insights_in_the_first_year():
+    snapshot = synthetic_snapshot(months=8, seed=1)
+    cube = OrgCube(snapshot)
+    for end in [snapshot['month'].min(), snapshot['month'].max()]:
+        cards = insights(cube, None, end=end)
+        assert 'Turnover Rising' not in set(cards['Title'])
+
+
+def test_falling_series_reads_as_a_positive_drop():
+    units = pd.DataFrame({'Unit': ['Company'], 'Level': ['Company'], 'Department': [None], 'Parent': [-1]})
+    values = np.full((HISTORY, 1, len(SERIES)), np.nan)
+    values[:, 0, list(SERIES).index('Headcount')] = np.linspace(200, 100, HISTORY)
+    rule = next(rule for rule in REGISTRY if rule.title == 'Headcount Shrinking')
+    cards = insight_cards(evaluate_rules(units, values, [rule], month='June 2025'), [rule])
+    assert cards['Message'][0].startswith('Company shrank 19.6% over the last 6 months')
+
+
+def test_rising_series_reads_without_a_sign():
+    units = pd.DataFrame({'Unit': ['Company'], 'Level': ['Company'], 'Department': [None], 'Parent': [-1]})
+    values = np.full((HISTORY, 1, len(SERIES)), np.nan)
+    values[:, 0, list(SERIES).index('Headcount')] = 100
+    values[-6:, 0, list(SERIES).index('Turnover Rate')] = np.linspace(10, 20, 6)
+    rule = next(rule for rule in REGISTRY if rule.title == 'Turnover Rising')
+    cards = insight_cards(evaluate_rules(units, values, [rule], month='June 2025'), [rule])
+    assert cards['Message'][0].startswith('Company turnover rose 67% over the last 6 months')
@@ -0,0 +1,28 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobScheduler  # noqa: E402
+
+
+def test_exports_do_not_hold_up_jobs():
+    scheduler = JobScheduler(workers=1, export_workers=1)
+    release = threading.Event()
+    exports = [scheduler.submit_export(f'export-{i}', lambda job: release.wait(10)) for i in range(3)]
+    try:
+        assert scheduler.submit('tables', lambda job: 'ready').wait(timeout=5) == 'ready'
+        assert not any(job.done() for job in exports)
+    finally:
+        release.set()
+    assert all(job.wait(timeout=5) for job in exports)
+
+
+def test_same_key_shares_one_job():
+    scheduler = JobScheduler()
+    release = threading.Event()
+    first = scheduler.submit('refresh', lambda job: release.wait(10))
+    assert scheduler.submit('refresh', lambda job: None) is first
+    release.set()
+    assert first.wait(timeout=5)
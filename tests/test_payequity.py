@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payequity import PERCENTILES, SKETCH_ACCURACY, PaySketch, pay_gap, quantiles  # noqa: E402
+
+
+def employees(n, seed=0):
+    rng = np.random.default_rng(seed)
+    department = rng.choice(['Engineering', 'Support'], size=n, p=[0.5, 0.5])
+    gender = np.where(rng.random(n) < np.where(department == 'Engineering', 0.2, 0.7), 'Female', 'Male')
+    # Engineering pays twice as much; women earn 10% less than men in the same department and level
+    salary = rng.lognormal(np.log(60_000), 0.3, n) * np.where(department == 'Engineering', 2, 1)
+    salary *= np.where(gender == 'Female', 0.9, 1)
+    return pd.DataFrame({
+        'month': pd.Timestamp('2025-06-01'), 'department': department, 'level': 'L2', 'gender': gender,
+        'salary': salary.round(0), 'terminated': False,
+    })
+
+
+def test_sketch_quantiles_within_accuracy():
+    rows = employees(20_000)
+    # Everyone is L2, so the one level is the whole company
+    _, counts, _ = PaySketch(rows).merged(['level'])
+    # The sketch promises a salary actually at that rank, i.e. no interpolation
+    expected = np.percentile(rows['salary'], PERCENTILES, method='lower')
+    np.testing.assert_allclose(quantiles(counts)[0], expected, rtol=SKETCH_ACCURACY)
+
+
+def test_adjusted_pay_gap_controls_for_department():
+    gap = pay_gap(PaySketch(employees(20_000, seed=1))).set_index('Gender')
+    assert gap.loc['Female', 'Reference'] == 'Male'
+    assert abs(gap.loc['Female', 'Adjusted Gap'] + 10) < 1
+    assert gap.loc['Female', 'CI Low'] < gap.loc['Female', 'Adjusted Gap'] < gap.loc['Female', 'CI High']
+    # Women are mostly in the lower-paid department, so the raw gap is much wider
+    assert gap.loc['Female', 'Raw Gap'] < -30
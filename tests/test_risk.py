@@ -0,0 +1,33 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import Summary  # noqa: E402
+from risk import PAY_RISK, RiskScores, department_logit, employee_logit, market_pay  # noqa: E402
+from synthetic import synthetic_snapshot  # noqa: E402
+
+
+def test_missing_salary_scores_without_a_pay_term():
+    summary = Summary(synthetic_snapshot(months=14, seed=2))
+    paid, unpaid = summary.departments[:2]
+    summary.salary_sum[1, -1] = summary.salary_n[1, -1] = 0
+    compensation = pd.DataFrame({'Avg Salary': [80_000.0], 'Market Rate': [88_000.0]})
+    market = market_pay(summary, compensation)
+    assert np.isnan(market[unpaid]) and np.isfinite(market[paid])
+
+    rows = pd.DataFrame({
+        'department': [paid, paid, unpaid],
+        'tenure': [3.0, 3.0, 3.0],
+        'rating': [3, 3, 3],
+        'satisfaction': [4.0, 4.0, 4.0],
+        'salary': [np.exp(market[paid]) / np.e, np.nan, 90_000.0],
+    }, index=pd.Index([1, 2, 3], name='employee_id'))
+    risk = RiskScores()
+    risk.frame = risk._score(rows)
+    base = employee_logit(rows) + department_logit(summary).reindex(rows['department']).to_numpy()
+    expected = 1 / (1 + np.exp(-(base + [PAY_RISK, 0, 0])))
+    np.testing.assert_allclose(risk.scores(department_logit(summary), market), expected, rtol=1e-5)
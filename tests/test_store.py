@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from incremental import IncrementalSummary  # noqa: E402
+from store import LEGACY_PARTITIONING, EventStore  # noqa: E402
+from synthetic import synthetic_events  # noqa: E402
+
+
+def events(seed=2):
+    return pa.concat_tables(list(synthetic_events(employees=400, years=2, seed=seed)))
+
+
+def ordered(df):
+    return df.sort_values(['employee_id', 'event_date', 'event_type']).reset_index(drop=True)
+
+
+def test_department_filter_and_compaction(tmp_path):
+    store = EventStore(str(tmp_path))
+    table = events()
+    half = table.num_rows // 2
+    store.ingest_table(table.slice(0, half))
+    store.ingest_table(table.slice(half))
+    columns = ['employee_id', 'event_date', 'event_type', 'department']
+    everything = ordered(store.read(columns))
+    sales = ordered(store.read(columns, departments=['Sales']))
+    expected = everything[everything['department'] == 'Sales'].reset_index(drop=True)
+    assert len(sales) and sales.astype(object).equals(expected.astype(object))
+
+    files = len(store.files())
+    assert store.compact() > 0
+    assert len(store.files()) == len(store.months()) < files
+    assert store.compacted()
+    assert ordered(store.read(columns)).astype(object).equals(everything.astype(object))
+
+
+def test_legacy_layout_is_migrated(tmp_path):
+    table = events()
+    legacy = EventStore(str(tmp_path / 'legacy'))
+    ds.write_dataset(legacy._prepare_batch(table), legacy.events_path, format='parquet',
+                     partitioning=LEGACY_PARTITIONING, max_partitions=1 << 16)
+    current = EventStore(str(tmp_path / 'current'))
+    current.ingest_table(table)
+    assert legacy.legacy_layout() and not current.legacy_layout()
+
+    migrated = IncrementalSummary.open(legacy)
+    assert not legacy.legacy_layout()
+    rebuilt = IncrementalSummary.open(current)
+    rows = migrated.summary.departments.get_indexer(rebuilt.summary.departments)
+    np.testing.assert_array_equal(migrated.summary.headcount[rows], rebuilt.summary.headcount)
+    np.testing.assert_array_equal(migrated.summary.leavers[rows], rebuilt.summary.leavers)
@@ -0,0 +1,43 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregation import month_ordinal  # noqa: E402
+from surveys import ENPS, MIN_GROUP_SIZE, SurveySummary, survey_tables  # noqa: E402
+
+
+def responses(department, respondents, likert, recommend, first_id):
+    ids = np.repeat(np.arange(first_id, first_id + respondents), 2)
+    return pd.DataFrame({
+        'respondent_id': ids,
+        'response_date': pd.Timestamp('2025-06-15'),
+        'department': department,
+        'question': ['I feel recognised', 'Would you recommend working here?'] * respondents,
+        'score': [likert, recommend] * respondents,
+    })
+
+
+def test_small_groups_are_left_out_of_every_cut():
+    surveys = SurveySummary()
+    # Sales answers at the top of every scale; the small Legal team at the bottom
+    surveys.add([responses('Sales', MIN_GROUP_SIZE + 3, 5, 10, 0),
+                 responses('Legal', MIN_GROUP_SIZE - 1, 1, 0, 100)])
+    questions = pd.DataFrame({'Question': ['I feel recognised', 'Would you recommend working here?'],
+                              'Dimension': ['Recognition', ENPS]})
+    summary = SimpleNamespace(departments=pd.Index(['Legal', 'Sales']), headcount=np.array([[6], [10]]),
+                              first_month=int(month_ordinal([pd.Timestamp('2025-06')])[0]), n_months=1)
+    engagement, favorability, net_promoter, response_rate = survey_tables(surveys, summary, questions)
+
+    assert engagement[['Overall', 'Recognition']].iloc[0].tolist() == [100.0, 100.0]
+    assert engagement['Respondents'].tolist() == [MIN_GROUP_SIZE + 3]
+    assert (favorability['Favorable'] == 100).all() and (favorability['Answers'] == MIN_GROUP_SIZE + 3).all()
+    assert net_promoter['eNPS'].tolist() == [100]
+    # Response rates list Legal, but say its answers are not reported
+    rates = response_rate.set_index('Department')
+    assert rates.loc['Legal', 'Respondents'] == MIN_GROUP_SIZE - 1 and not rates.loc['Legal', 'Reported']
+    assert rates.loc['Sales', 'Reported']